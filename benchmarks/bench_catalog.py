@@ -0,0 +1,105 @@
+"""product-service catalog index (catalog.py): memory, build time and filtered listings.
+
+The index is built from 1M generated products, without a database, to
+measure its memory per product (`bytes_per_product`, as allocated according
+to tracemalloc), how long a worker takes to build it and how fast it answers
+filter + sort + top-N queries. The `endpoint_*` benchmarks then serve the
+same filtered listing through GET /api/products from a 100k product SQLite
+catalog, once with CATALOG_INDEX off (SQL) and once with it on.
+"""
+import logging
+import os
+import random
+import tempfile
+import tracemalloc
+from typing import Dict
+
+import fakeredis
+
+from harness import check, load_service, measure, scaled
+from bench_product import CATEGORIES, _product_rows
+
+logger = logging.getLogger(__name__)
+
+INDEX_SIZE = 1_000_000
+ENDPOINT_SIZE = 100_000
+RARE_CATEGORY = 'Collectibles'  # 0.5% of the products
+
+QUERIES = {
+    'category_by_price': {'category': 'Books', 'sort': 'price'},
+    'rare_category_by_stock': {'category': RARE_CATEGORY, 'sort': 'stock'},
+    'price_range_by_stock_desc': {'min_price': 100.0, 'max_price': 200.0, 'sort': 'stock', 'descending': True},
+    'in_stock_by_price_desc_page_10': {'in_stock': True, 'sort': 'price', 'descending': True, 'offset': 450},
+}
+
+
+def _rows(count: int, rng: random.Random):
+    return [(product_id, round(rng.uniform(10.0, 1000.0), 2), rng.randint(0, 100),
+             RARE_CATEGORY if rng.random() < 0.005 else rng.choice(CATEGORIES))
+            for product_id in range(1, count + 1)]
+
+
+def run_index(catalog, scale: float, size: int = INDEX_SIZE) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(1)
+    rows = _rows(size, rng)
+    results = {}
+
+    tracemalloc.start()
+    index = catalog.CatalogIndex.build(rows)
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del index
+
+    results[f'build_{size}'] = measure(lambda: catalog.CatalogIndex.build(rows), scaled(3, scale), warmup=0)
+    results[f'build_{size}'].update(products=size, bytes_per_product=allocated / size)
+    index = catalog.CatalogIndex.build(rows)
+    for name, options in QUERIES.items():
+        results[f'query_{name}'] = measure(lambda: index.query(limit=50, **options), scaled(200, scale))
+
+    def update():
+        product_id = rng.randint(1, size)
+        index.upsert(product_id, round(rng.uniform(10.0, 1000.0), 2), rng.randint(0, 100), rng.choice(CATEGORIES))
+    results['apply_update'] = measure(update, scaled(1000, scale))
+    return results
+
+
+def run_endpoint(service, scale: float, size: int = ENDPOINT_SIZE) -> Dict[str, Dict[str, float]]:
+    tmp = tempfile.TemporaryDirectory()
+    server = fakeredis.FakeServer()
+    apps = {
+        mode: service.create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp.name, 'products.db')}",
+            'JWT_SECRET_KEY': 'benchmark-secret-key-of-at-least-32-bytes',
+            'CATALOG_INDEX': mode == 'index',
+        }, redis_client=fakeredis.FakeRedis(server=server))
+        for mode in ('sql', 'index')
+    }
+    with apps['sql'].app_context():
+        service.db.create_all()
+        service.db.session.execute(service.Product.__table__.insert(), _product_rows(1, size, random.Random(1)))
+        service.db.session.commit()
+    with apps['index'].app_context():
+        service.catalog().rebuild()
+
+    results = {}
+    for mode, app in apps.items():
+        client = app.test_client()
+        # Page 3 of a category sorted by price; the products themselves come from the cache once warm
+        results[f'endpoint_{mode}_category_by_price_{size}'] = measure(
+            lambda: check(client.get('/api/products?category=Books&sort=price&limit=20&offset=40'), 200),
+            scaled(50, scale))
+    tmp.cleanup()
+    return results
+
+
+def run(root: str, scale: float = 1.0) -> Dict[str, Dict[str, float]]:
+    service = load_service(root, 'product-service')
+    try:
+        import catalog
+    except ImportError:
+        logger.warning(f"{root} has no catalog index, skipping the catalog benchmarks")
+        return {}
+    results = run_index(catalog, scale)
+    results.update(run_endpoint(service, scale))
+    return results
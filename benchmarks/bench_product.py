@@ -0,0 +1,93 @@
+"""product-service benchmarks: catalog listing, cached reads and cache-invalidating writes."""
+import os
+import random
+import tempfile
+from typing import Dict, List
+
+import fakeredis
+
+from harness import check, load_service, measure, scaled
+
+CATEGORIES = ["Electronics", "Clothing", "Books", "Home", "Sports", "Toys"]
+
+
+def _product_rows(start: int, count: int, rng: random.Random) -> List[Dict]:
+    return [{
+        'name': f"Product {i}",
+        'description': f"Description for product {i}",
+        'price': round(rng.uniform(10.0, 1000.0), 2),
+        'stock': rng.randint(0, 100),
+        'category': rng.choice(CATEGORIES),
+    } for i in range(start, start + count)]
+
+
+def run(root: str, sizes: List[int], scale: float = 1.0) -> Dict[str, Dict[str, float]]:
+    service = load_service(root, 'product-service')
+    db, Product = service.db, service.Product
+    tmp = tempfile.TemporaryDirectory()
+    config = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp.name, 'products.db')}",
+        'JWT_SECRET_KEY': 'benchmark-secret-key-of-at-least-32-bytes',
+    }
+    cache = fakeredis.FakeRedis()
+    if hasattr(service, 'create_app'):
+        app = service.create_app(config, redis_client=cache)
+    else:
+        # Trees from before the app factory, e.g. the base of a comparison run
+        app = service.app
+        app.config.update(config)
+        service.redis_client = cache
+    client = app.test_client()
+    rng = random.Random(1)
+    results = {}
+
+    with app.app_context():
+        db.create_all()
+        token = service.create_access_token(identity='benchmark')
+    auth = {'Authorization': f'Bearer {token}'}
+
+    rows = 0
+    for size in sorted(sizes):
+        with app.app_context():
+            db.session.execute(Product.__table__.insert(), _product_rows(rows + 1, size - rows, rng))
+            db.session.commit()
+        rows = size
+        iterations = scaled(max(3, min(30, 100000 // size)), scale)
+        results[f'get_products_{size}'] = measure(
+            lambda: check(client.get('/api/products'), 200), iterations, warmup=1)
+
+    product_id = rows // 2
+    url = f'/api/products/{product_id}'
+    results['get_product_miss'] = measure(
+        lambda: check(client.get(url), 200), scaled(500, scale),
+        before_each=lambda: cache.delete(f'product:{product_id}'))
+    check(client.get(url), 200)
+    results['get_product_hit'] = measure(lambda: check(client.get(url), 200), scaled(1000, scale))
+
+    def update():
+        check(client.put(url, json={'price': round(rng.uniform(10.0, 1000.0), 2)}, headers=auth), 200)
+    results['update_product'] = measure(
+        update, scaled(300, scale), before_each=lambda: check(client.get(url), 200))
+
+    # A hot product read right after each update: a cache miss unless writes store the product
+    def update_then_get(client):
+        check(client.put(url, json={'price': round(rng.uniform(10.0, 1000.0), 2)}, headers=auth), 200)
+        check(client.get(url), 200)
+    results['update_then_get_product'] = measure(lambda: update_then_get(client), scaled(300, scale))
+    if hasattr(service, 'cache_writer'):
+        write_through = service.create_app(dict(config, CACHE_WRITE_THROUGH=True), redis_client=cache).test_client()
+        results['update_then_get_product_write_through'] = measure(
+            lambda: update_then_get(write_through), scaled(300, scale))
+
+    created = []
+
+    def create():
+        response = check(client.post('/api/products', json=_product_rows(0, 1, rng)[0], headers=auth), 201)
+        created.append(response.get_json()['id'])
+    results['create_product'] = measure(create, scaled(300, scale))
+    results['delete_product'] = measure(
+        lambda: check(client.delete(f'/api/products/{created.pop()}', headers=auth), 204), scaled(300, scale))
+
+    tmp.cleanup()
+    return results
@@ -0,0 +1,156 @@
+"""product-service serving modes: the product reads under concurrent load, WSGI versus ASGI.
+
+Both modes serve the same SQLite catalog and share one fakeredis server:
+
+- wsgi: the Flask app, with requests handled by WEB_THREADS threads like one gthread worker
+- asgi: async_reads.create_asgi_app(), with requests handled as coroutines on one event
+  loop like one uvicorn worker
+
+`concurrency` clients send requests back to back, and a request's latency includes the
+time it waits for a free thread. Every cache command first waits `cache_latency` seconds
+(default 1ms) to stand in for the round trip to a real Redis server, which the in-process
+fake does not have; without it there is no I/O for the async mode to overlap and the
+comparison only measures framework overhead.
+"""
+import asyncio
+import gc
+import importlib
+import logging
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import fakeredis
+import httpx
+from fakeredis import aioredis
+
+from harness import check, load_service, scaled, summarize
+from bench_product import _product_rows
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SIZE = 2000
+WSGI_THREADS = 4  # gunicorn.conf.py's WEB_THREADS default
+
+
+class SlowRedis(fakeredis.FakeRedis):
+    latency = 0.0
+
+    def execute_command(self, *args, **options):
+        time.sleep(self.latency)
+        return super().execute_command(*args, **options)
+
+
+class SlowAsyncRedis(aioredis.FakeRedis):
+    latency = 0.0
+
+    async def execute_command(self, *args, **options):
+        await asyncio.sleep(self.latency)
+        return await super().execute_command(*args, **options)
+
+
+def _split(paths: List[str], concurrency: int) -> List[List[str]]:
+    return [paths[i::concurrency] for i in range(concurrency)]
+
+
+def _summarize(samples: List[float], elapsed: float, concurrency: int) -> Dict[str, float]:
+    summary = summarize(samples)
+    # Requests overlap, so throughput comes from the wall clock rather than the summed latencies
+    summary['ops_per_sec'] = len(samples) / elapsed
+    summary['concurrency'] = concurrency
+    return summary
+
+
+def run_wsgi(app, paths: List[str], concurrency: int, threads: int = WSGI_THREADS) -> Dict[str, float]:
+    def handle(path):
+        check(app.test_client().get(path), 200)
+
+    with ThreadPoolExecutor(threads) as server, ThreadPoolExecutor(concurrency) as clients:
+        def client(client_paths):
+            samples = []
+            for path in client_paths:
+                start = time.perf_counter()
+                server.submit(handle, path).result()
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        gc.collect()
+        start = time.perf_counter()
+        per_client = list(clients.map(client, _split(paths, concurrency)))
+        elapsed = time.perf_counter() - start
+    return _summarize([sample for samples in per_client for sample in samples], elapsed, concurrency)
+
+
+async def _run_asgi(app, paths: List[str], concurrency: int) -> Dict[str, float]:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark') as http:
+        async def client(client_paths):
+            samples = []
+            for path in client_paths:
+                start = time.perf_counter()
+                response = await http.get(path)
+                if response.status_code != 200:
+                    raise RuntimeError(f"GET {path} returned {response.status_code}, expected 200: "
+                                       f"{response.text[:200]}")
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        gc.collect()
+        start = time.perf_counter()
+        per_client = await asyncio.gather(*(client(client_paths) for client_paths in _split(paths, concurrency)))
+        elapsed = time.perf_counter() - start
+    return _summarize([sample for samples in per_client for sample in samples], elapsed, concurrency)
+
+
+def run_asgi(app, paths: List[str], concurrency: int) -> Dict[str, float]:
+    async def main():
+        # Opens the async engine and Redis client, like a uvicorn worker starting up
+        async with app.router.lifespan_context(app):
+            return await _run_asgi(app, paths, concurrency)
+    return asyncio.run(main())
+
+
+def run(root: str, scale: float = 1.0, concurrency: int = 100,
+        cache_latency: float = 0.001) -> Dict[str, Dict[str, float]]:
+    service = load_service(root, 'product-service')
+    try:
+        async_reads = importlib.import_module('async_reads')
+    except ImportError:
+        logger.warning(f"{root} has no ASGI serving mode, skipping the serving benchmarks")
+        return {}
+    db, Product = service.db, service.Product
+    tmp = tempfile.TemporaryDirectory()
+    server = fakeredis.FakeServer()
+    SlowRedis.latency = SlowAsyncRedis.latency = cache_latency
+    cache = SlowRedis(server=server)
+    app = service.create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp.name, 'products.db')}",
+        'JWT_SECRET_KEY': 'benchmark-secret-key-of-at-least-32-bytes',
+        'WARM_CACHE_PRODUCTS': 0,
+    }, redis_client=cache)
+    asgi_app = async_reads.create_asgi_app(app, redis_client=SlowAsyncRedis(server=server))
+
+    rng = random.Random(1)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Product.__table__.insert(), _product_rows(1, CATALOG_SIZE, rng))
+        db.session.commit()
+
+    requests = min(scaled(1000, scale), CATALOG_SIZE)
+    hot = [f'/api/products/{rng.randint(1, 100)}' for _ in range(requests)]
+    results = {}
+    for mode, runner, target in (('wsgi', run_wsgi, app), ('asgi', run_asgi, asgi_app)):
+        # Every product read once, so each request misses the cache and reads the database
+        cache.flushall()
+        cold = [f'/api/products/{product_id}' for product_id in rng.sample(range(1, CATALOG_SIZE + 1), requests)]
+        results[f'{mode}_get_product_miss'] = runner(target, cold, concurrency)
+        # The same 100 products over and over, served from the cache
+        for path in set(hot):
+            check(app.test_client().get(path), 200)
+        results[f'{mode}_get_product_hit'] = runner(target, hot, concurrency)
+
+    tmp.cleanup()
+    return results
@@ -0,0 +1,56 @@
+"""user-service benchmarks: registration, login and profile reads."""
+import itertools
+import os
+import tempfile
+from typing import Dict
+
+import fakeredis
+
+from harness import check, load_service, measure, scaled
+
+# bcrypt dominates register and login, so they get far fewer iterations
+AUTH_ITERATIONS = 20
+
+
+def run(root: str, scale: float = 1.0) -> Dict[str, Dict[str, float]]:
+    service = load_service(root, 'user-service')
+    app, db = service.app, service.db
+    tmp = tempfile.TemporaryDirectory()
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp.name, 'users.db')}",
+        JWT_SECRET_KEY='benchmark-secret-key-of-at-least-32-bytes',
+    )
+    service.redis_client = fakeredis.FakeRedis()
+    client = app.test_client()
+    results = {}
+
+    with app.app_context():
+        db.create_all()
+
+    ids = itertools.count(1)
+
+    def register():
+        i = next(ids)
+        check(client.post('/api/users/register', json={
+            'username': f'user{i}', 'email': f'user{i}@example.com', 'password': f'password{i}'}), 201)
+    results['register'] = measure(register, scaled(AUTH_ITERATIONS, scale), warmup=1)
+    results['register_duplicate'] = measure(
+        lambda: check(client.post('/api/users/register', json={
+            'username': 'user1', 'email': 'other@example.com', 'password': 'password1'}), 400),
+        scaled(500, scale))
+
+    login = {'username': 'user1', 'password': 'password1'}
+    results['login'] = measure(
+        lambda: check(client.post('/api/users/login', json=login), 200), scaled(AUTH_ITERATIONS, scale), warmup=1)
+    results['login_unknown_user'] = measure(
+        lambda: check(client.post('/api/users/login', json={'username': 'nobody', 'password': 'x'}), 401),
+        scaled(500, scale))
+
+    token = client.post('/api/users/login', json=login).get_json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    results['get_profile'] = measure(
+        lambda: check(client.get('/api/users/profile', headers=headers), 200), scaled(1000, scale))
+
+    tmp.cleanup()
+    return results
@@ -0,0 +1,74 @@
+"""Timing helpers shared by the service benchmarks."""
+import gc
+import importlib
+import math
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESULTS_VERSION = 1
+PERCENTILES = (50, 90, 99)
+
+
+def load_service(root: str, service: str) -> ModuleType:
+    """Import `<root>/<service>/app.py` as the `app` module
+
+    Both services are called `app` and register metrics on the default
+    Prometheus registry, so each process can only load one of them.
+    """
+    sys.path.insert(0, os.path.join(root, service))
+    return importlib.import_module('app')
+
+
+def check(response, status: int):
+    """Fail the benchmark instead of timing a broken endpoint"""
+    if response.status_code != status:
+        raise RuntimeError(f"{response.request.method} {response.request.path} returned "
+                           f"{response.status_code}, expected {status}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    total = sum(samples)
+    summary = {
+        'iterations': len(samples),
+        'mean_ms': total / len(samples) * 1000,
+        'min_ms': min(samples) * 1000,
+        'ops_per_sec': len(samples) / total if total else 0.0,
+    }
+    for q in PERCENTILES:
+        summary[f'p{q}_ms'] = percentile(samples, q) * 1000
+    return summary
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 3,
+            before_each: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Time `iterations` calls of `fn`; `before_each` runs untimed before every call"""
+    for _ in range(warmup):
+        if before_each:
+            before_each()
+        fn()
+    gc.collect()
+    samples = []
+    for _ in range(iterations):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def scaled(iterations: int, scale: float) -> int:
+    return max(1, int(iterations * scale))
@@ -0,0 +1,133 @@
+"""Offline benchmarks for the product-service and user-service hot paths.
+
+Each service runs in-process against a temporary SQLite database and an
+in-process fakeredis cache, so no Postgres, Redis or network is involved
+and results on the same machine are comparable between builds:
+
+    python benchmarks/run.py --out baseline.json
+    # ... change something ...
+    python benchmarks/run.py --out current.json --baseline baseline.json --threshold 15
+
+The exit code is 1 if any benchmark's median got slower than the baseline
+by more than the threshold. `--root` points the benchmarks at another
+checkout, which is how CI times the pull request's base commit.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from harness import REPO_ROOT, RESULTS_VERSION
+
+logger = logging.getLogger(__name__)
+
+SUITES = ('product', 'user', 'serving', 'catalog')
+DEFAULT_SIZES = '1000,10000,100000'
+
+
+def run_suite(suite: str, root: str, sizes: List[int], scale: float) -> Dict[str, Dict[str, float]]:
+    if suite == 'product':
+        import bench_product
+        return bench_product.run(root, sizes, scale)
+    if suite == 'serving':
+        import bench_serving
+        return bench_serving.run(root, scale)
+    if suite == 'catalog':
+        import bench_catalog
+        return bench_catalog.run(root, scale)
+    import bench_user
+    return bench_user.run(root, scale)
+
+
+def run_in_subprocess(suite: str, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Run one suite in a fresh interpreter, since each process can only import one service"""
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, f'{suite}.json')
+        command = [sys.executable, os.path.abspath(__file__), '--suite', suite, '--root', args.root,
+                   '--sizes', args.sizes, '--scale', str(args.scale), '--out', out, '--in-process']
+        # The services log to stderr; an older --root checkout may still print on every request, keep that quiet
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        with open(out) as f:
+            return json.load(f)['benchmarks']
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold_pct: float = 15.0) -> List[str]:
+    """Return a description of every benchmark whose median regressed beyond `threshold_pct`"""
+    regressions = []
+    factor = 1 + threshold_pct / 100
+    for name, base in sorted(baseline['benchmarks'].items()):
+        cur = current['benchmarks'].get(name)
+        if cur is None:
+            regressions.append(f"{name}: missing from current run")
+        elif cur['p50_ms'] > base['p50_ms'] * factor:
+            regressions.append(f"{name}: p50 {base['p50_ms']:.3f}ms -> {cur['p50_ms']:.3f}ms "
+                               f"({cur['p50_ms'] / base['p50_ms'] - 1:+.0%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the service hot paths against SQLite and fakeredis')
+    parser.add_argument('--suite', choices=SUITES, action='append',
+                        help='Suite to run, can be repeated (default: all)')
+    parser.add_argument('--root', default=REPO_ROOT, help='Checkout containing the services to benchmark')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='Catalog sizes for the listing benchmark')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply every iteration count by this')
+    parser.add_argument('--out', default=None, help='Write the results as JSON here')
+    parser.add_argument('--in-process', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--baseline', default=None, help='Results to compare against')
+    parser.add_argument('--threshold', type=float, default=15.0,
+                        help='Allowed slowdown of the median in percent (default: 15)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.in_process else logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+    args.root = os.path.abspath(args.root)
+    suites = args.suite or list(SUITES)
+
+    benchmarks = {}
+    if args.in_process:
+        sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+        benchmarks.update({f'{suites[0]}.{name}': result
+                           for name, result in run_suite(suites[0], args.root, sizes, args.scale).items()})
+    else:
+        for suite in suites:
+            logger.info(f"Running {suite} benchmarks")
+            benchmarks.update(run_in_subprocess(suite, args))
+
+    results = {
+        'version': RESULTS_VERSION,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'root': args.root,
+        'benchmarks': benchmarks,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.in_process:
+        return 0
+    for name, result in sorted(benchmarks.items()):
+        logger.info(f"{name}: p50 {result['p50_ms']:.3f}ms, p99 {result['p99_ms']:.3f}ms, "
+                    f"{result['ops_per_sec']:.1f} ops/s ({result['iterations']} iterations)")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(json.load(f), results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:g}%")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
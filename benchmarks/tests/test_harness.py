@@ -0,0 +1,37 @@
+import unittest
+import harness
+from run import compare_results
+
+
+def results(**p50s):
+    return {'benchmarks': {name: {'p50_ms': p50} for name, p50 in p50s.items()}}
+
+
+class TestHarness(unittest.TestCase):
+    def test_summarize(self):
+        summary = harness.summarize([i / 1000 for i in range(1, 101)])
+        self.assertEqual(summary['iterations'], 100)
+        self.assertAlmostEqual(summary['p50_ms'], 50.0)
+        self.assertAlmostEqual(summary['p99_ms'], 99.0)
+        self.assertAlmostEqual(summary['min_ms'], 1.0)
+        self.assertAlmostEqual(summary['mean_ms'], 50.5)
+
+    def test_measure_runs_setup_untimed(self):
+        calls = []
+        summary = harness.measure(lambda: calls.append('fn'), 5, warmup=1,
+                                  before_each=lambda: calls.append('setup'))
+        self.assertEqual(summary['iterations'], 5)
+        self.assertEqual(calls, ['setup', 'fn'] * 6)
+
+    def test_compare_results(self):
+        baseline = results(get_product_hit=1.0, login=250.0, get_profile=1.5)
+        current = results(get_product_hit=1.1, login=300.0)
+        self.assertEqual(compare_results(baseline, current, threshold_pct=15), [
+            'get_profile: missing from current run',
+            'login: p50 250.000ms -> 300.000ms (+20%)',
+        ])
+        self.assertEqual(compare_results(baseline, baseline), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import ast
+import collections
+import os
+import random
+import tempfile
+import unittest
+
+import bcrypt
+import fakeredis
+from sqlalchemy import create_engine, text
+
+import seed
+
+
+class TestSeed(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.products_db = f"sqlite:///{os.path.join(self.tmp.name, 'products.db')}"
+        self.users_db = f"sqlite:///{os.path.join(self.tmp.name, 'users.db')}"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rows(self, url, query):
+        engine = create_engine(url)
+        with engine.connect() as connection:
+            rows = connection.execute(text(query)).fetchall()
+        engine.dispose()
+        return rows
+
+    def test_products_are_reproducible_and_skewed(self):
+        first = list(seed.product_rows(2000, random.Random(1)))
+        self.assertEqual(first, list(seed.product_rows(2000, random.Random(1))))
+        categories = collections.Counter(row[4] for row in first)
+        self.assertEqual(categories.most_common(1)[0][0], seed.CATEGORIES[0][0])
+        self.assertGreater(categories[seed.CATEGORIES[0][0]], 4 * categories[seed.CATEGORIES[-1][0]])
+        self.assertTrue(all(round(row[2] % 1, 2) == 0.99 for row in first))
+        self.assertTrue(any(row[3] == 0 for row in first))
+
+    def test_seed_loads_and_appends(self):
+        counts = seed.seed(products=250, users=20, products_db=self.products_db, users_db=self.users_db,
+                           batch_size=100, bcrypt_rounds=4)
+        self.assertEqual(counts, {'products': 250, 'users': 20})
+        seed.seed(products=50, products_db=self.products_db)
+        self.assertEqual(self.rows(self.products_db, 'SELECT MAX(id), COUNT(*) FROM product'), [(300, 300)])
+        users = self.rows(self.users_db, 'SELECT username, password_hash FROM "user" ORDER BY id')
+        self.assertEqual(users[-1][0], 'user20')
+        self.assertEqual(len({password_hash for _, password_hash in users}), 1)
+        self.assertTrue(bcrypt.checkpw(b'password123', users[0][1]))
+
+        seed.seed(products=10, products_db=self.products_db, truncate=True, redis_client=fakeredis.FakeRedis())
+        self.assertEqual(self.rows(self.products_db, 'SELECT MIN(id), COUNT(*) FROM product'), [(1, 10)])
+
+    def test_truncate_clears_the_cache_of_the_old_products(self):
+        redis_client = fakeredis.FakeRedis()
+        seed.seed(products=20, products_db=self.products_db, redis_client=redis_client, warm=20)
+        redis_client.set('product:3:version', 2)
+        redis_client.xadd(seed.CHANGES_KEY, {'id': 3})
+        redis_client.set('session:1', 'kept')
+
+        counts = seed.seed(products=5, products_db=self.products_db, truncate=True, redis_client=redis_client,
+                           warm=5)
+        self.assertEqual(counts['uncached'], 22)
+        self.assertEqual(sorted(redis_client.keys()), sorted([b'session:1'] + [f'product:{i}'.encode()
+                                                                               for i in range(1, 6)]))
+        product = ast.literal_eval(redis_client.get('product:1').decode())
+        self.assertEqual(product['name'], self.rows(self.products_db, 'SELECT name FROM product WHERE id = 1')[0][0])
+
+    def test_truncate_without_redis_is_refused(self):
+        seed.seed(products=5, products_db=self.products_db)
+        with self.assertRaises(ValueError):
+            seed.seed(products=5, products_db=self.products_db, truncate=True)
+        self.assertEqual(self.rows(self.products_db, 'SELECT COUNT(*) FROM product'), [(5,)])
+        with self.assertRaises(SystemExit):
+            seed.main(['--products', '5', '--products-db', self.products_db, '--truncate'])
+        # Users have nothing cached
+        seed.seed(users=2, users_db=self.users_db, truncate=True, bcrypt_rounds=4)
+
+    def test_per_user_passwords(self):
+        seed.seed(users=3, users_db=self.users_db, bcrypt_rounds=4, per_user_passwords=True)
+        users = self.rows(self.users_db, 'SELECT username, password_hash FROM "user" ORDER BY id')
+        for i, (username, password_hash) in enumerate(users, start=1):
+            self.assertEqual(username, f'user{i}')
+            self.assertTrue(bcrypt.checkpw(f'password{i}'.encode(), password_hash))
+            self.assertEqual(bcrypt.gensalt(4)[:7], password_hash[:7])
+
+    def test_warms_cache(self):
+        redis_client = fakeredis.FakeRedis()
+        counts = seed.seed(products=30, products_db=self.products_db, redis_client=redis_client, warm=10)
+        self.assertEqual(counts['cached'], 10)
+        self.assertIsNone(redis_client.get('product:11'))
+        product = ast.literal_eval(redis_client.get('product:1').decode())
+        self.assertEqual(list(product), ['id', 'name', 'description', 'price', 'stock', 'category'])
+        self.assertLessEqual(redis_client.ttl('product:1'), seed.CACHE_TTL)
+
+
+if __name__ == '__main__':
+    unittest.main()
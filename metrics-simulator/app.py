@@ -1,5 +1,4 @@
 import requests
-import random
 import time
 import threading
 import logging
@@ -7,42 +6,27 @@ import os
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+import logs
+import recorder
+from exporter import start_exporter
+from http_client import HttpClient
+from report import ReportWriter, REPORT_PATH
+from stats import RUN_STATS
+from workload import (
+    USER_SERVICE_URL, PRODUCT_SERVICE_URL, MAX_USERS, LOAD_PERCENTAGE, ERROR_PERCENTAGE,
+    NUM_USERS, ERROR_RATE, SAMPLE_USERS, SAMPLE_PRODUCTS, SIMULATED_ERROR_DELAYS,
+    choose_simulated_error, user_payload, login_payload, product_payload, product_update_payload,
+    SIMULATOR_SEED, session_retry_delay, make_rng, rng, use_rng
 )
+
 logger = logging.getLogger(__name__)
 
-# Service URLs
-USER_SERVICE_URL = "http://user-service:5001/api/users"  # Updated to match actual endpoint
-PRODUCT_SERVICE_URL = "http://product-service:5002/api/products"  # Updated to match actual endpoint
-
-# Load configuration
-MAX_USERS = 100  # Maximum number of concurrent users at 100% load
-LOAD_PERCENTAGE = int(os.getenv('LOAD_PERCENTAGE', '50'))  # Default to 50% load
-ERROR_PERCENTAGE = int(os.getenv('ERROR_PERCENTAGE', '2'))  # Default to 2% error rate
-
-# Calculate actual values
-NUM_USERS = int((MAX_USERS * LOAD_PERCENTAGE) / 100)
-ERROR_RATE = ERROR_PERCENTAGE / 100  # Convert percentage to decimal
-
-# Sample data
-SAMPLE_USERS = [
-    {"username": f"user{i}", "email": f"user{i}@example.com", "password": "password123"}
-    for i in range(1, 101)  # Increased to 100 users
-]
-
-SAMPLE_PRODUCTS = [
-    {
-        "name": f"Product {i}",
-        "description": f"Description for product {i}",
-        "price": round(random.uniform(10.0, 1000.0), 2),
-        "stock": random.randint(0, 100),
-        "category": random.choice(["Electronics", "Clothing", "Books", "Home", "Sports", "Toys"])
-    }
-    for i in range(1, 51)  # Increased to 50 products
-]
+# Engine used to drive load: "threaded" (one OS thread per user), "async" (coroutine per user)
+# "open_loop" (fixed request rate per endpoint, see open_loop.py) or "scenario" (SCENARIO_FILE, see scenario.py)
+SIMULATOR_ENGINE = os.getenv('SIMULATOR_ENGINE', 'threaded')
+
+# Pooled keep-alive connections, timeouts, retries and circuit breakers shared by all users (see http_client.py)
+HTTP_CLIENT = HttpClient(observer=RUN_STATS)
 
 class UserSession:
     def __init__(self, user_id: int):
@@ -55,410 +39,390 @@ class UserSession:
     def register_user(self) -> bool:
         try:
             user_data = SAMPLE_USERS[self.user_id]
-            response = requests.post(f"{USER_SERVICE_URL}/register", json=user_data)
+            response = HTTP_CLIENT.request("register_user", "POST", f"{USER_SERVICE_URL}/register", json=user_data)
             if response.status_code == 201:
-                logger.info(f"User {self.user_id} registered successfully")
+                logger.info(f"User {self.user_id} registered successfully", extra=logs.sampled(user_id=self.user_id))
                 return True
             else:
-                logger.error(f"Failed to register user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to register user {self.user_id}: {response.text}")
                 return False
         except Exception as e:
-            logger.error(f"Error registering user {self.user_id}: {e}")
+            logger.debug(f"Error registering user {self.user_id}: {e}")
             return False
 
     def login(self) -> bool:
         try:
             user_data = SAMPLE_USERS[self.user_id]
-            response = requests.post(
-                f"{USER_SERVICE_URL}/login",
+            response = HTTP_CLIENT.request(
+                "login", "POST", f"{USER_SERVICE_URL}/login",
                 json={"username": user_data['username'], "password": user_data['password']}
             )
             if response.status_code == 200:
                 self.token = response.json().get('access_token')
-                logger.info(f"User {self.user_id} logged in successfully")
+                logger.info(f"User {self.user_id} logged in successfully", extra=logs.sampled(user_id=self.user_id))
                 return True
             else:
-                logger.error(f"Failed to login user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to login user {self.user_id}: {response.text}")
                 return False
         except Exception as e:
-            logger.error(f"Error logging in user {self.user_id}: {e}")
+            logger.debug(f"Error logging in user {self.user_id}: {e}")
             return False
 
     def get_profile(self) -> bool:
         if not self.token:
             return False
         try:
-            response = requests.get(
-                f"{USER_SERVICE_URL}/profile",
+            response = HTTP_CLIENT.request(
+                "get_user_profile", "GET", f"{USER_SERVICE_URL}/profile",
                 headers={"Authorization": f"Bearer {self.token}"}
             )
             if response.status_code == 200:
-                logger.info(f"User {self.user_id} retrieved profile successfully")
+                logger.info(f"User {self.user_id} retrieved profile successfully", extra=logs.sampled(user_id=self.user_id))
                 return True
             else:
-                logger.error(f"Failed to get profile for user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to get profile for user {self.user_id}: {response.text}")
                 return False
         except Exception as e:
-            logger.error(f"Error getting profile for user {self.user_id}: {e}")
+            logger.debug(f"Error getting profile for user {self.user_id}: {e}")
             return False
 
     def browse_products(self) -> Optional[List[Dict]]:
         try:
-            response = requests.get(f"{PRODUCT_SERVICE_URL}")
+            response = HTTP_CLIENT.request("get_products", "GET", f"{PRODUCT_SERVICE_URL}")
             if response.status_code == 200:
-                logger.info(f"User {self.user_id} browsed products successfully")
+                logger.info(f"User {self.user_id} browsed products successfully", extra=logs.sampled(user_id=self.user_id))
                 return response.json()
             else:
-                logger.error(f"Failed to browse products for user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to browse products for user {self.user_id}: {response.text}")
                 return None
         except Exception as e:
-            logger.error(f"Error browsing products for user {self.user_id}: {e}")
+            logger.debug(f"Error browsing products for user {self.user_id}: {e}")
             return None
 
     def create_product(self) -> bool:
         if not self.token:
             return False
         try:
-            product_data = random.choice(SAMPLE_PRODUCTS)
-            response = requests.post(
-                f"{PRODUCT_SERVICE_URL}",
+            product_data = rng().choice(SAMPLE_PRODUCTS)
+            response = HTTP_CLIENT.request(
+                "create_product", "POST", f"{PRODUCT_SERVICE_URL}",
                 headers={"Authorization": f"Bearer {self.token}"},
                 json=product_data
             )
             if response.status_code == 201:
                 self.registered_products.append(response.json())
-                logger.info(f"User {self.user_id} created product successfully")
+                logger.info(f"User {self.user_id} created product successfully", extra=logs.sampled(user_id=self.user_id))
                 return True
             else:
-                logger.error(f"Failed to create product for user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to create product for user {self.user_id}: {response.text}")
                 return False
         except Exception as e:
-            logger.error(f"Error creating product for user {self.user_id}: {e}")
+            logger.debug(f"Error creating product for user {self.user_id}: {e}")
             return False
 
     def update_product(self) -> bool:
         if not self.token or not self.registered_products:
             return False
         try:
-            product = random.choice(self.registered_products)
+            product = rng().choice(self.registered_products)
             update_data = {
                 "name": f"Updated {product['name']}",
-                "price": round(random.uniform(10.0, 1000.0), 2),
-                "stock": random.randint(0, 100),
+                "price": round(rng().uniform(10.0, 1000.0), 2),
+                "stock": rng().randint(0, 100),
                 "description": f"Updated description for product {product['id']}"
             }
-            response = requests.put(
-                f"{PRODUCT_SERVICE_URL}/{product['id']}",
+            response = HTTP_CLIENT.request(
+                "update_product", "PUT", f"{PRODUCT_SERVICE_URL}/{product['id']}",
                 headers={"Authorization": f"Bearer {self.token}"},
                 json=update_data
             )
             if response.status_code == 200:
-                logger.info(f"User {self.user_id} updated product successfully")
+                logger.info(f"User {self.user_id} updated product successfully", extra=logs.sampled(user_id=self.user_id))
                 return True
             else:
-                logger.error(f"Failed to update product for user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to update product for user {self.user_id}: {response.text}")
                 return False
         except Exception as e:
-            logger.error(f"Error updating product for user {self.user_id}: {e}")
+            logger.debug(f"Error updating product for user {self.user_id}: {e}")
             return False
 
     def delete_product(self) -> bool:
         if not self.token or not self.registered_products:
             return False
         try:
-            product = random.choice(self.registered_products)
-            response = requests.delete(
-                f"{PRODUCT_SERVICE_URL}/{product['id']}",
+            product = rng().choice(self.registered_products)
+            response = HTTP_CLIENT.request(
+                "delete_product", "DELETE", f"{PRODUCT_SERVICE_URL}/{product['id']}",
                 headers={"Authorization": f"Bearer {self.token}"}
             )
             if response.status_code == 204:
                 self.registered_products.remove(product)
-                logger.info(f"User {self.user_id} deleted product successfully")
+                logger.info(f"User {self.user_id} deleted product successfully", extra=logs.sampled(user_id=self.user_id))
                 return True
             else:
-                logger.error(f"Failed to delete product for user {self.user_id}: {response.text}")
+                logger.debug(f"Failed to delete product for user {self.user_id}: {response.text}")
                 return False
         except Exception as e:
-            logger.error(f"Error deleting product for user {self.user_id}: {e}")
+            logger.debug(f"Error deleting product for user {self.user_id}: {e}")
             return False
 
-def simulate_error() -> bool:
+def simulate_error(operation: str) -> bool:
     """Simulate random errors based on different scenarios and configured error rate"""
-    # Only simulate errors if random number is below the error rate
-    if random.random() > ERROR_RATE:
+    RUN_STATS.offer(operation)
+    error_type = choose_simulated_error()
+    if error_type is None:
         return False
-        
-    error_scenarios = [
-        (0.4, "rate_limit"),      # 40% of errors are rate limits
-        (0.3, "invalid_data"),    # 30% of errors are invalid data
-        (0.2, "server_error"),    # 20% of errors are server errors
-        (0.1, "timeout")          # 10% of errors are timeouts
-    ]
-    
-    for probability, error_type in error_scenarios:
-        if random.random() < probability:
-            if error_type == "rate_limit":
-                time.sleep(0.1)  # Simulate rate limiting
-                return True
-            elif error_type == "invalid_data":
-                return True
-            elif error_type == "server_error":
-                time.sleep(0.2)  # Simulate server processing
-                return True
-            elif error_type == "timeout":
-                time.sleep(2)  # Simulate timeout
-                return True
-    return False
+
+    RUN_STATS.count(operation, f"simulated_{error_type}")
+    time.sleep(SIMULATED_ERROR_DELAYS[error_type])
+    return True
+
+def _send(operation: str, method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request; HTTP_CLIENT records the latency and status of every attempt"""
+    if recorder.RECORDER is not None:
+        recorder.RECORDER.record(operation, method, url, kwargs)
+    return HTTP_CLIENT.request(operation, method, url, **kwargs)
 
 def register_user(user_id: int) -> Dict[str, Any]:
     """Register a new user with error simulation"""
-    if simulate_error():
-        logging.error(f"User {user_id}: Simulated error during registration")
+    if simulate_error("register_user"):
+        logging.debug(f"User {user_id}: Simulated error during registration")
         return None
         
-    user_data = {
-        "username": f"user{user_id}",
-        "email": f"user{user_id}@example.com",
-        "password": f"password{user_id}"
-    }
+    user_data = user_payload(user_id)
     
     try:
-        response = requests.post(f"{USER_SERVICE_URL}/register", json=user_data)
+        response = _send("register_user", "POST", f"{USER_SERVICE_URL}/register", json=user_data)
         if response.status_code == 201:
-            logging.info(f"User {user_id}: Registration successful")
+            logging.debug(f"User {user_id}: Registration successful")
             return response.json()
         else:
-            logging.error(f"User {user_id}: Registration failed with status {response.status_code}")
+            logging.debug(f"User {user_id}: Registration failed with status {response.status_code}")
             return None
     except requests.exceptions.RequestException as e:
-        logging.error(f"User {user_id}: Registration error - {str(e)}")
+        logging.debug(f"User {user_id}: Registration error - {str(e)}")
         return None
 
 def login_user(user_id: int) -> str:
     """Login user with error simulation"""
-    if simulate_error():
-        logging.error(f"User {user_id}: Simulated error during login")
+    if simulate_error("login"):
+        logging.debug(f"User {user_id}: Simulated error during login")
         return None
         
-    login_data = {
-        "username": f"user{user_id}",
-        "password": f"password{user_id}"
-    }
+    login_data = login_payload(user_id)
     
     try:
-        response = requests.post(f"{USER_SERVICE_URL}/login", json=login_data)
+        response = _send("login", "POST", f"{USER_SERVICE_URL}/login", json=login_data)
         if response.status_code == 200:
-            logging.info(f"User {user_id}: Login successful")
+            logging.debug(f"User {user_id}: Login successful")
             return response.json().get("access_token")
         else:
-            logging.error(f"User {user_id}: Login failed with status {response.status_code}")
+            logging.debug(f"User {user_id}: Login failed with status {response.status_code}")
             return None
     except requests.exceptions.RequestException as e:
-        logging.error(f"User {user_id}: Login error - {str(e)}")
+        logging.debug(f"User {user_id}: Login error - {str(e)}")
         return None
 
 def get_user_profile(user_id: int, token: str) -> Dict[str, Any]:
     """Get user profile with error simulation"""
-    if simulate_error():
-        logging.error(f"User {user_id}: Simulated error during profile retrieval")
+    if simulate_error("get_user_profile"):
+        logging.debug(f"User {user_id}: Simulated error during profile retrieval")
         return None
         
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.get(f"{USER_SERVICE_URL}/profile", headers=headers)
+        response = _send("get_user_profile", "GET", f"{USER_SERVICE_URL}/profile", headers=headers)
         if response.status_code == 200:
-            logging.info(f"User {user_id}: Profile retrieved successfully")
+            logging.debug(f"User {user_id}: Profile retrieved successfully")
             return response.json()
         else:
-            logging.error(f"User {user_id}: Profile retrieval failed with status {response.status_code}")
+            logging.debug(f"User {user_id}: Profile retrieval failed with status {response.status_code}")
             return None
     except requests.exceptions.RequestException as e:
-        logging.error(f"User {user_id}: Profile retrieval error - {str(e)}")
+        logging.debug(f"User {user_id}: Profile retrieval error - {str(e)}")
         return None
 
 def get_products(token: str) -> list:
     """Get products with error simulation"""
-    if simulate_error():
-        logging.error("Simulated error during product listing")
+    if simulate_error("get_products"):
+        logging.debug("Simulated error during product listing")
         return []
         
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.get(f"{PRODUCT_SERVICE_URL}", headers=headers)
+        response = _send("get_products", "GET", PRODUCT_SERVICE_URL, headers=headers)
         if response.status_code == 200:
-            logging.info("Products retrieved successfully")
+            logging.debug("Products retrieved successfully")
             return response.json()
         else:
-            logging.error(f"Product retrieval failed with status {response.status_code}")
+            logging.debug(f"Product retrieval failed with status {response.status_code}")
             return []
     except requests.exceptions.RequestException as e:
-        logging.error(f"Product retrieval error - {str(e)}")
+        logging.debug(f"Product retrieval error - {str(e)}")
         return []
 
 def create_product(token: str) -> Dict[str, Any]:
     """Create a product with error simulation"""
-    if simulate_error():
-        logging.error("Simulated error during product creation")
+    if simulate_error("create_product"):
+        logging.debug("Simulated error during product creation")
         return None
         
-    product_data = {
-        "name": f"Product {random.randint(1, 1000)}",
-        "description": f"Description for product {random.randint(1, 1000)}",
-        "price": round(random.uniform(10.0, 1000.0), 2),
-        "stock": random.randint(0, 100),
-        "category": random.choice(["Electronics", "Clothing", "Books", "Home", "Sports"])
-    }
+    product_data = product_payload()
     
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.post(f"{PRODUCT_SERVICE_URL}", json=product_data, headers=headers)
+        response = _send("create_product", "POST", PRODUCT_SERVICE_URL, json=product_data, headers=headers)
         if response.status_code == 201:
-            logging.info("Product created successfully")
+            logging.debug("Product created successfully")
             return response.json()
         else:
-            logging.error(f"Product creation failed with status {response.status_code}")
+            logging.debug(f"Product creation failed with status {response.status_code}")
             return None
     except requests.exceptions.RequestException as e:
-        logging.error(f"Product creation error - {str(e)}")
+        logging.debug(f"Product creation error - {str(e)}")
         return None
 
 def update_product(product_id: int, token: str) -> Dict[str, Any]:
     """Update a product with error simulation"""
-    if simulate_error():
-        logging.error(f"Simulated error during product update for ID {product_id}")
+    if simulate_error("update_product"):
+        logging.debug(f"Simulated error during product update for ID {product_id}")
         return None
         
-    update_data = {
-        "name": f"Updated Product {product_id}",
-        "price": round(random.uniform(10.0, 1000.0), 2),
-        "stock": random.randint(0, 100),
-        "description": f"Updated description for product {product_id}"
-    }
+    update_data = product_update_payload(product_id)
     
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.put(f"{PRODUCT_SERVICE_URL}/{product_id}", json=update_data, headers=headers)
+        response = _send("update_product", "PUT", f"{PRODUCT_SERVICE_URL}/{product_id}", json=update_data, headers=headers)
         if response.status_code == 200:
-            logging.info(f"Product {product_id} updated successfully")
+            logging.debug(f"Product {product_id} updated successfully")
             return response.json()
         else:
-            logging.error(f"Product update failed with status {response.status_code}")
+            logging.debug(f"Product update failed with status {response.status_code}")
             return None
     except requests.exceptions.RequestException as e:
-        logging.error(f"Product update error - {str(e)}")
+        logging.debug(f"Product update error - {str(e)}")
         return None
 
 def delete_product(product_id: int, token: str) -> bool:
     """Delete a product with error simulation"""
-    if simulate_error():
-        logging.error(f"Simulated error during product deletion for ID {product_id}")
+    if simulate_error("delete_product"):
+        logging.debug(f"Simulated error during product deletion for ID {product_id}")
         return False
         
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        response = requests.delete(f"{PRODUCT_SERVICE_URL}/{product_id}", headers=headers)
+        response = _send("delete_product", "DELETE", f"{PRODUCT_SERVICE_URL}/{product_id}", headers=headers)
         if response.status_code == 204:
-            logging.info(f"Product {product_id} deleted successfully")
+            logging.debug(f"Product {product_id} deleted successfully")
             return True
         else:
-            logging.error(f"Product deletion failed with status {response.status_code}")
+            logging.debug(f"Product deletion failed with status {response.status_code}")
             return False
     except requests.exceptions.RequestException as e:
-        logging.error(f"Product deletion error - {str(e)}")
+        logging.debug(f"Product deletion error - {str(e)}")
         return False
 
-def user_session(user_id: int):
+def user_session(user_id: int, *scope):
     """Simulate a user session with error simulation"""
+    use_rng(make_rng('threaded-user', *scope))
+    RUN_STATS.user_started()
+    try:
+        _run_user_session(user_id)
+    finally:
+        RUN_STATS.user_finished()
+
+def _run_user_session(user_id: int):
     max_retries = 3
     retry_count = 0
-    retry_delays = [2, 5, 10]  # Increasing delays between retries: 2s, 5s, 10s
     
     while retry_count < max_retries:
         try:
             # Add initial delay before starting session (1-3 seconds)
-            time.sleep(random.uniform(1, 3))
+            time.sleep(rng().uniform(1, 3))
             
             # Register user (only if not already registered)
-            if random.random() < 0.3:  # 30% chance to try registration
+            if rng().random() < 0.3:  # 30% chance to try registration
                 user = register_user(user_id)
                 if not user:
-                    logging.warning(f"User {user_id}: Registration failed, will try login")
+                    logging.debug(f"User {user_id}: Registration failed, will try login")
                 else:
-                    logging.info(f"User {user_id}: Registration successful")
+                    logging.info(f"User {user_id}: Registration successful", extra=logs.sampled(user_id=user_id))
                 # Add delay after registration attempt (1-2 seconds)
-                time.sleep(random.uniform(1, 2))
+                time.sleep(rng().uniform(1, 2))
 
             # Login (will try even if registration failed)
             token = login_user(user_id)
             if not token:
-                logging.warning(f"User {user_id}: Login failed, retrying...")
+                logging.debug(f"User {user_id}: Login failed, retrying...")
                 retry_count += 1
-                time.sleep(retry_delays[min(retry_count - 1, len(retry_delays) - 1)])
+                time.sleep(session_retry_delay(retry_count))
                 continue
 
             # Add delay after successful login (2-4 seconds)
-            time.sleep(random.uniform(2, 4))
+            time.sleep(rng().uniform(2, 4))
 
             # Get user profile
             profile = get_user_profile(user_id, token)
             if not profile:
-                logging.warning(f"User {user_id}: Profile retrieval failed, continuing with other operations")
+                logging.debug(f"User {user_id}: Profile retrieval failed, continuing with other operations")
             # Add delay after profile retrieval (1-3 seconds)
-            time.sleep(random.uniform(1, 3))
+            time.sleep(rng().uniform(1, 3))
 
             # Get products
             products = get_products(token)
             if not products:
-                logging.warning(f"User {user_id}: Product listing failed, retrying...")
-                time.sleep(retry_delays[min(retry_count - 1, len(retry_delays) - 1)])
+                logging.debug(f"User {user_id}: Product listing failed, retrying...")
+                time.sleep(session_retry_delay(retry_count))
                 continue
             # Add delay after product listing (2-5 seconds)
-            time.sleep(random.uniform(2, 5))
+            time.sleep(rng().uniform(2, 5))
 
             # Create a product
             new_product = create_product(token)
             if not new_product:
-                logging.warning(f"User {user_id}: Product creation failed, retrying...")
-                time.sleep(retry_delays[min(retry_count - 1, len(retry_delays) - 1)])
+                logging.debug(f"User {user_id}: Product creation failed, retrying...")
+                time.sleep(session_retry_delay(retry_count))
                 continue
             # Add delay after product creation (3-6 seconds)
-            time.sleep(random.uniform(3, 6))
+            time.sleep(rng().uniform(3, 6))
 
             # Update the product if we have one
             if new_product:
                 updated_product = update_product(new_product["id"], token)
                 if not updated_product:
-                    logging.warning(f"User {user_id}: Product update failed for ID {new_product['id']}")
+                    logging.debug(f"User {user_id}: Product update failed for ID {new_product['id']}")
                 # Add delay after product update (2-4 seconds)
-                time.sleep(random.uniform(2, 4))
+                time.sleep(rng().uniform(2, 4))
 
             # Delete the product if we have one
             if new_product:
                 if not delete_product(new_product["id"], token):
-                    logging.warning(f"User {user_id}: Product deletion failed for ID {new_product['id']}")
+                    logging.debug(f"User {user_id}: Product deletion failed for ID {new_product['id']}")
                 # Add delay after product deletion (1-3 seconds)
-                time.sleep(random.uniform(1, 3))
+                time.sleep(rng().uniform(1, 3))
 
             # Successful session completed
-            logging.info(f"User {user_id}: Session completed successfully")
+            logging.info(f"User {user_id}: Session completed successfully", extra=logs.sampled(user_id=user_id))
             break
 
         except Exception as e:
             logging.error(f"User {user_id}: Unexpected error in session: {str(e)}")
             retry_count += 1
-            time.sleep(retry_delays[min(retry_count - 1, len(retry_delays) - 1)])
+            time.sleep(session_retry_delay(retry_count))
 
     if retry_count >= max_retries:
-        logging.error(f"User {user_id}: Session failed after {max_retries} retries")
+        logging.warning(f"User {user_id}: Session failed after {max_retries} retries")
 
     # Add a longer delay between sessions (5-15 seconds)
-    time.sleep(random.uniform(5, 15))
+    time.sleep(rng().uniform(5, 15))
 
 def start_simulation():
     """Start the simulation with the configured number of users"""
     logging.info(f"Starting metrics simulator with {LOAD_PERCENTAGE}% load and {ERROR_PERCENTAGE}% error rate")
     logging.info(f"Maximum concurrent users: {MAX_USERS}")
     
+    use_rng(make_rng('threaded'))
+    batch = 0
     while True:
         try:
             # Calculate number of active users based on load percentage
@@ -467,19 +431,20 @@ def start_simulation():
             # Create threads for each active user
             threads = []
             for i in range(active_users):
-                user_id = random.randint(1, 1000)
-                thread = threading.Thread(target=user_session, args=(user_id,))
+                user_id = rng().randint(1, 1000)
+                thread = threading.Thread(target=user_session, args=(user_id, batch, i))
                 threads.append(thread)
                 thread.start()
                 # Add a longer delay between thread starts (0.5-2 seconds)
-                time.sleep(random.uniform(0.5, 2))
+                time.sleep(rng().uniform(0.5, 2))
             
             # Wait for all threads to complete
             for thread in threads:
                 thread.join()
             
+            batch += 1
             # Add a longer delay between batches (10-20 seconds)
-            time.sleep(random.uniform(10, 20))
+            time.sleep(rng().uniform(10, 20))
             
         except KeyboardInterrupt:
             logging.info("Simulation stopped by user")
@@ -489,4 +454,40 @@ def start_simulation():
             time.sleep(10)  # Wait longer before retrying
 
 if __name__ == "__main__":
-    start_simulation() 
\ No newline at end of file
+    logs.configure('metrics-simulator')
+    start_exporter(RUN_STATS)
+
+    run_metadata = {
+        "engine": SIMULATOR_ENGINE,
+        "load_percentage": LOAD_PERCENTAGE,
+        "error_percentage": ERROR_PERCENTAGE,
+        "max_users": MAX_USERS,
+        "seed": SIMULATOR_SEED,
+    }
+
+    report_writer = None
+    # The scenario engine writes its own report, with the stages and saturation summary, when it ends
+    if REPORT_PATH and SIMULATOR_ENGINE != "scenario":
+        report_writer = ReportWriter(RUN_STATS, REPORT_PATH, metadata=run_metadata)
+        report_writer.start()
+
+    if recorder.RECORD_PATH:
+        recorder.start_recording(recorder.RECORD_PATH, metadata=run_metadata)
+
+    try:
+        if SIMULATOR_ENGINE == "async":
+            from engine import start_async_simulation
+            start_async_simulation()
+        elif SIMULATOR_ENGINE == "open_loop":
+            from open_loop import start_open_loop_simulation
+            start_open_loop_simulation()
+        elif SIMULATOR_ENGINE == "scenario":
+            from scenario import start_scenario_simulation
+            start_scenario_simulation(report_path=REPORT_PATH, metadata=run_metadata)
+        else:
+            start_simulation()
+    finally:
+        recorder.stop_recording()
+        if report_writer:
+            report_writer.stop()
+ 
\ No newline at end of file
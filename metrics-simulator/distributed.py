@@ -0,0 +1,244 @@
+"""Coordinator/worker mode for spreading simulator load over processes and hosts.
+
+One simulator process is limited by the GIL and by its single connection
+pool. The coordinator splits the target load (virtual users for the async
+engine, or per-endpoint rates for open-loop mode) across N workers, tells
+them all to start at the same wall-clock instant, and merges the latency
+histograms and counters they send back into one report.
+
+Workers can be local processes started by the coordinator, remote
+processes connecting over TCP, or both:
+
+    # 4 local worker processes, 60 second open-loop run
+    python distributed.py coordinator --workers 4 --local-workers 4 \\
+        --mode open_loop --duration 60 --report run.json
+
+    # Wait for 8 workers, 4 of them on another host
+    python distributed.py coordinator --workers 8 --local-workers 4 --listen 0.0.0.0:5100 ...
+    python distributed.py worker --coordinator coordinator-host:5100   # on the other host, x4
+
+Messages travel over multiprocessing.connection, authenticated with
+DISTRIBUTED_AUTHKEY. Remote hosts need synchronized clocks (NTP) for the
+synchronized start to hold.
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List, Optional, Tuple
+
+import logs
+from engine import run_simulation
+from open_loop import OPEN_LOOP_RATES, log_summary, parse_rates, run_open_loop
+from report import build_report, write_report
+from stats import RUN_STATS, RunStats
+from workload import NUM_USERS
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTED_AUTHKEY = os.getenv('DISTRIBUTED_AUTHKEY', 'shopnexus-simulator').encode()
+DISTRIBUTED_LISTEN = os.getenv('DISTRIBUTED_LISTEN', '127.0.0.1:5100')
+START_DELAY = 2.0  # Seconds between sending the start signal and the synchronized start
+CONNECT_TIMEOUT = 60.0  # Seconds a worker keeps retrying to reach the coordinator
+# Seconds the coordinator waits for all workers to connect before giving up
+DISTRIBUTED_WAIT_TIMEOUT = float(os.getenv('DISTRIBUTED_WAIT_TIMEOUT', '300'))
+
+Address = Tuple[str, int]
+
+
+def parse_address(value: str) -> Address:
+    host, _, port = value.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def split_load(plan: Dict[str, Any], workers: int) -> List[Dict[str, Any]]:
+    """Give every worker an equal share of the virtual users or request rates in `plan`"""
+    shares = []
+    for index in range(workers):
+        share = dict(plan, index=index, workers=workers)
+        if plan['mode'] == 'open_loop':
+            share['rates'] = {op: rate / workers for op, rate in plan['rates'].items()}
+        else:
+            base, extra = divmod(plan['num_users'], workers)
+            share['num_users'] = base + (1 if index < extra else 0)
+        shares.append(share)
+    return shares
+
+
+def run_share(share: Dict[str, Any]) -> RunStats:
+    """Run this worker's share of the load and return its stats"""
+    async def main():
+        delay = share['start_at'] - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        RUN_STATS.reset_clock()
+        if share['mode'] == 'open_loop':
+            await run_open_loop(share['rates'], share['duration'], stats=RUN_STATS,
+                                accounts=share.get('accounts', 20), share=share['index'])
+        else:
+            await run_simulation(share['num_users'], ramp_up=share.get('ramp_up', 0.0),
+                                 duration=share['duration'], share=share['index'])
+
+    asyncio.run(main())
+    return RUN_STATS
+
+
+def run_worker(address: Address, authkey: bytes = DISTRIBUTED_AUTHKEY):
+    """Connect to the coordinator, run the share it assigns and send back the stats"""
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            conn = Client(address, authkey=authkey)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    with conn:
+        conn.send({'type': 'hello', 'worker': f"{socket.gethostname()}:{os.getpid()}"})
+        share = conn.recv()
+        logger.info(f"Worker {share['index'] + 1}/{share['workers']} starting {share['mode']} share")
+        stats = run_share(share)
+        conn.send({'type': 'result', 'index': share['index'], 'stats': stats.snapshot()})
+
+
+def _local_worker(address: Address, authkey: bytes):
+    logs.configure('metrics-simulator')
+    run_worker(address, authkey)
+
+
+def accept_workers(listener: Listener, workers: int, processes: List[multiprocessing.Process],
+                   timeout: float) -> List[Any]:
+    """Connections of `workers` workers; raises RuntimeError if a local worker process exits
+    first, and TimeoutError if they haven't all connected within `timeout` seconds"""
+    accepted: queue.Queue = queue.Queue()
+
+    def accept():
+        # Listener.accept() can't time out, so it runs here; closing the listener ends it
+        try:
+            for _ in range(workers):
+                conn = listener.accept()
+                accepted.put((conn, conn.recv()))
+        except (OSError, EOFError):
+            pass
+
+    threading.Thread(target=accept, name='accept-workers', daemon=True).start()
+    deadline = time.monotonic() + timeout
+    connections = []
+    try:
+        while len(connections) < workers:
+            exited = [process for process in processes if process.exitcode is not None]
+            if exited:
+                raise RuntimeError(f"Local worker {exited[0].name} exited with code {exited[0].exitcode} "
+                                   f"before the run started")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Only {len(connections)} of {workers} workers connected "
+                                   f"within {timeout:g}s")
+            try:
+                conn, hello = accepted.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                continue
+            connections.append(conn)
+            logger.info(f"Worker {hello['worker']} connected ({len(connections)}/{workers})")
+    except Exception:
+        for conn in connections:
+            conn.close()
+        raise
+    return connections
+
+
+def run_coordinator(plan: Dict[str, Any], workers: int, local_workers: int = 0,
+                    listen: Address = parse_address(DISTRIBUTED_LISTEN),
+                    authkey: bytes = DISTRIBUTED_AUTHKEY,
+                    wait_timeout: float = DISTRIBUTED_WAIT_TIMEOUT) -> RunStats:
+    """Wait for `workers` workers (starting `local_workers` of them here), run `plan` and merge results"""
+    ctx = multiprocessing.get_context('spawn')
+    processes = []
+    with Listener(listen, authkey=authkey) as listener:
+        address = listener.address
+        for _ in range(local_workers):
+            process = ctx.Process(target=_local_worker, args=(address, authkey), daemon=True)
+            process.start()
+            processes.append(process)
+
+        logger.info(f"Coordinator on {address[0]}:{address[1]} waiting for {workers} workers")
+        try:
+            connections = accept_workers(listener, workers, processes, wait_timeout)
+        except Exception:
+            for process in processes:
+                process.terminate()
+            raise
+
+    start_at = time.time() + START_DELAY
+    for conn, share in zip(connections, split_load(dict(plan, start_at=start_at), workers)):
+        conn.send(share)
+
+    merged = RunStats()
+    try:
+        for conn in connections:
+            result = conn.recv()
+            merged.merge(result['stats'])
+            logger.info(f"Received results from worker {result['index'] + 1}/{workers}")
+    finally:
+        for conn in connections:
+            conn.close()
+        for process in processes:
+            process.join(timeout=10)
+    return merged
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Distributed load generation for the metrics simulator')
+    sub = parser.add_subparsers(dest='role', required=True)
+
+    coordinator = sub.add_parser('coordinator', help='Split load across workers and merge their results')
+    coordinator.add_argument('--workers', type=int, required=True, help='Total number of workers to wait for')
+    coordinator.add_argument('--local-workers', type=int, default=0,
+                             help='How many of the workers to start as local processes')
+    coordinator.add_argument('--listen', default=DISTRIBUTED_LISTEN, help='host:port to accept workers on')
+    coordinator.add_argument('--mode', choices=['open_loop', 'async'], default='open_loop')
+    coordinator.add_argument('--duration', type=float, required=True, help='Run length in seconds')
+    coordinator.add_argument('--rates', default=None, help='Total open-loop rates, as OPEN_LOOP_RATES')
+    coordinator.add_argument('--users', type=int, default=None, help='Total virtual users for the async engine')
+    coordinator.add_argument('--ramp-up', type=float, default=0.0, help='Seconds to start async users over')
+    coordinator.add_argument('--report', default=None, help='Write the merged report here (.json or .csv)')
+    coordinator.add_argument('--wait-timeout', type=float, default=DISTRIBUTED_WAIT_TIMEOUT,
+                             help='Seconds to wait for every worker to connect (default: DISTRIBUTED_WAIT_TIMEOUT)')
+
+    worker = sub.add_parser('worker', help='Connect to a coordinator and run the share it assigns')
+    worker.add_argument('--coordinator', required=True, help='host:port of the coordinator')
+
+    args = parser.parse_args(argv)
+    logs.configure('metrics-simulator')
+
+    if args.role == 'worker':
+        run_worker(parse_address(args.coordinator))
+        return 0
+
+    plan = {'mode': args.mode, 'duration': args.duration, 'ramp_up': args.ramp_up}
+    if args.mode == 'open_loop':
+        plan['rates'] = parse_rates(args.rates or OPEN_LOOP_RATES)
+    else:
+        plan['num_users'] = args.users if args.users is not None else NUM_USERS
+
+    stats = run_coordinator(plan, args.workers, args.local_workers, parse_address(args.listen),
+                            wait_timeout=args.wait_timeout)
+    log_summary(stats)
+    if args.report:
+        write_report(build_report(stats, {'engine': f"distributed-{args.mode}", 'workers': args.workers}),
+                     args.report)
+        logger.info(f"Merged report written to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
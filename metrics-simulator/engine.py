@@ -0,0 +1,301 @@
+"""Asyncio engine for the metrics simulator.
+
+Runs every virtual user as a coroutine on one event loop and sends all
+traffic through a single aiohttp session, so connections are pooled and
+kept alive between requests instead of being opened per call.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+import recorder
+from stats import RUN_STATS
+from workload import (
+    USER_SERVICE_URL, PRODUCT_SERVICE_URL, MAX_USERS, LOAD_PERCENTAGE, ERROR_PERCENTAGE,
+    NUM_USERS, SIMULATED_ERROR_DELAYS,
+    choose_simulated_error, user_payload, login_payload, product_payload, product_update_payload,
+    session_retry_delay, make_rng, rng, use_rng
+)
+
+logger = logging.getLogger(__name__)
+
+# Connection pool configuration
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '500'))  # Max open connections shared by all users
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '30'))  # Seconds an idle connection is kept
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '30'))  # Total seconds allowed per request
+
+# Seconds over which virtual users are started, so they don't all log in at once
+RAMP_UP_SECONDS = float(os.getenv('RAMP_UP_SECONDS', '60'))
+
+
+def create_http_session(pool_size: int = HTTP_POOL_SIZE) -> aiohttp.ClientSession:
+    """Create the pooled keep-alive session shared by every virtual user"""
+    connector = aiohttp.TCPConnector(
+        limit=pool_size,
+        limit_per_host=0,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=300
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+    )
+
+
+async def simulate_error(operation: str) -> bool:
+    """Simulate random errors without blocking the event loop"""
+    RUN_STATS.offer(operation)
+    error_type = choose_simulated_error()
+    if error_type is None:
+        return False
+
+    RUN_STATS.count(operation, f"simulated_{error_type}")
+    await asyncio.sleep(SIMULATED_ERROR_DELAYS[error_type])
+    return True
+
+
+async def _send(http: aiohttp.ClientSession, operation: str, method: str, url: str,
+                expected_status: int, **kwargs) -> Optional[Any]:
+    """Send a request, record its latency and return the decoded body, True for empty bodies,
+    or None on failure"""
+    if recorder.RECORDER is not None:
+        recorder.RECORDER.record(operation, method, url, kwargs)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        async with http.request(method, url, **kwargs) as response:
+            # Read the whole body so the connection goes back to the pool
+            body = await response.read()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        RUN_STATS.record(operation, loop.time() - start, type(e).__name__)
+        raise
+    RUN_STATS.record(operation, loop.time() - start, response.status)
+
+    if response.status != expected_status:
+        logger.debug(f"{method} {url} failed with status {response.status}")
+        return None
+    if response.status == 204:
+        return True
+    return json.loads(body)
+
+
+async def register_user(http: aiohttp.ClientSession, user_id: int) -> Optional[Dict[str, Any]]:
+    """Register a new user with error simulation"""
+    if await simulate_error("register_user"):
+        logger.debug(f"User {user_id}: Simulated error during registration")
+        return None
+
+    try:
+        return await _send(http, "register_user", "POST", f"{USER_SERVICE_URL}/register", 201,
+                           json=user_payload(user_id))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"User {user_id}: Registration error - {str(e)}")
+        return None
+
+
+async def login_user(http: aiohttp.ClientSession, user_id: int) -> Optional[str]:
+    """Login user with error simulation"""
+    if await simulate_error("login"):
+        logger.debug(f"User {user_id}: Simulated error during login")
+        return None
+
+    try:
+        body = await _send(http, "login", "POST", f"{USER_SERVICE_URL}/login", 200,
+                           json=login_payload(user_id))
+        return body.get("access_token") if body else None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"User {user_id}: Login error - {str(e)}")
+        return None
+
+
+async def get_user_profile(http: aiohttp.ClientSession, user_id: int,
+                           token: str) -> Optional[Dict[str, Any]]:
+    """Get user profile with error simulation"""
+    if await simulate_error("get_user_profile"):
+        logger.debug(f"User {user_id}: Simulated error during profile retrieval")
+        return None
+
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        return await _send(http, "get_user_profile", "GET", f"{USER_SERVICE_URL}/profile", 200,
+                           headers=headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"User {user_id}: Profile retrieval error - {str(e)}")
+        return None
+
+
+async def get_products(http: aiohttp.ClientSession, token: str) -> List[Dict[str, Any]]:
+    """Get products with error simulation"""
+    if await simulate_error("get_products"):
+        logger.debug("Simulated error during product listing")
+        return []
+
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        return await _send(http, "get_products", "GET", PRODUCT_SERVICE_URL, 200, headers=headers) or []
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Product retrieval error - {str(e)}")
+        return []
+
+
+async def create_product(http: aiohttp.ClientSession, token: str) -> Optional[Dict[str, Any]]:
+    """Create a product with error simulation"""
+    if await simulate_error("create_product"):
+        logger.debug("Simulated error during product creation")
+        return None
+
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        return await _send(http, "create_product", "POST", PRODUCT_SERVICE_URL, 201,
+                           json=product_payload(), headers=headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Product creation error - {str(e)}")
+        return None
+
+
+async def update_product(http: aiohttp.ClientSession, product_id: int,
+                         token: str) -> Optional[Dict[str, Any]]:
+    """Update a product with error simulation"""
+    if await simulate_error("update_product"):
+        logger.debug(f"Simulated error during product update for ID {product_id}")
+        return None
+
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        return await _send(http, "update_product", "PUT", f"{PRODUCT_SERVICE_URL}/{product_id}", 200,
+                           json=product_update_payload(product_id), headers=headers)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Product update error - {str(e)}")
+        return None
+
+
+async def delete_product(http: aiohttp.ClientSession, product_id: int, token: str) -> bool:
+    """Delete a product with error simulation"""
+    if await simulate_error("delete_product"):
+        logger.debug(f"Simulated error during product deletion for ID {product_id}")
+        return False
+
+    headers = {"Authorization": f"Bearer {token}"}
+    try:
+        return bool(await _send(http, "delete_product", "DELETE", f"{PRODUCT_SERVICE_URL}/{product_id}",
+                                204, headers=headers))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.debug(f"Product deletion error - {str(e)}")
+        return False
+
+
+async def user_session(http: aiohttp.ClientSession, user_id: int):
+    """Simulate a user session; same flow and pacing as app.user_session"""
+    max_retries = 3
+    retry_count = 0
+
+    while retry_count < max_retries:
+        try:
+            await asyncio.sleep(rng().uniform(1, 3))
+
+            # Register user (only if not already registered)
+            if rng().random() < 0.3:  # 30% chance to try registration
+                if not await register_user(http, user_id):
+                    logger.debug(f"User {user_id}: Registration failed, will try login")
+                await asyncio.sleep(rng().uniform(1, 2))
+
+            # Login (will try even if registration failed)
+            token = await login_user(http, user_id)
+            if not token:
+                retry_count += 1
+                await asyncio.sleep(session_retry_delay(retry_count))
+                continue
+            await asyncio.sleep(rng().uniform(2, 4))
+
+            if not await get_user_profile(http, user_id, token):
+                logger.debug(f"User {user_id}: Profile retrieval failed, continuing with other operations")
+            await asyncio.sleep(rng().uniform(1, 3))
+
+            products = await get_products(http, token)
+            if not products:
+                await asyncio.sleep(session_retry_delay(retry_count))
+                continue
+            await asyncio.sleep(rng().uniform(2, 5))
+
+            new_product = await create_product(http, token)
+            if not new_product:
+                await asyncio.sleep(session_retry_delay(retry_count))
+                continue
+            await asyncio.sleep(rng().uniform(3, 6))
+
+            if not await update_product(http, new_product["id"], token):
+                logger.debug(f"User {user_id}: Product update failed for ID {new_product['id']}")
+            await asyncio.sleep(rng().uniform(2, 4))
+
+            if not await delete_product(http, new_product["id"], token):
+                logger.debug(f"User {user_id}: Product deletion failed for ID {new_product['id']}")
+            await asyncio.sleep(rng().uniform(1, 3))
+
+            logger.debug(f"User {user_id}: Session completed successfully")
+            break
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"User {user_id}: Unexpected error in session: {str(e)}")
+            retry_count += 1
+            await asyncio.sleep(session_retry_delay(retry_count))
+
+    if retry_count >= max_retries:
+        logger.warning(f"User {user_id}: Session failed after {max_retries} retries")
+
+    # Add a longer delay between sessions (5-15 seconds)
+    await asyncio.sleep(rng().uniform(5, 15))
+
+
+async def virtual_user(http: aiohttp.ClientSession, index: int, start_delay: float,
+                       stop: Optional[asyncio.Event] = None, share: int = 0):
+    """Run back-to-back sessions as a random user until stopped; `share` is the distributed worker's index"""
+    use_rng(make_rng('async-user', share, index))
+    await asyncio.sleep(start_delay)
+    while stop is None or not stop.is_set():
+        RUN_STATS.user_started()
+        try:
+            await user_session(http, rng().randint(1, 1000))
+        finally:
+            RUN_STATS.user_finished()
+
+
+async def run_simulation(num_users: int = NUM_USERS, pool_size: int = HTTP_POOL_SIZE,
+                         ramp_up: float = RAMP_UP_SECONDS,
+                         duration: Optional[float] = None, share: int = 0):
+    """Keep num_users virtual users active, optionally for a fixed duration in seconds
+
+    `share` is the index of the distributed worker running them (see
+    distributed.py), so each worker's users make their own random choices.
+    """
+    stop = asyncio.Event()
+    async with create_http_session(pool_size) as http:
+        tasks = [
+            asyncio.create_task(virtual_user(http, i, ramp_up * i / max(num_users, 1), stop, share))
+            for i in range(num_users)
+        ]
+        try:
+            if duration is None:
+                await asyncio.gather(*tasks)
+            else:
+                await asyncio.sleep(duration)
+        finally:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def start_async_simulation():
+    """Start the asyncio simulation with the configured number of users"""
+    logger.info(f"Starting async metrics simulator with {LOAD_PERCENTAGE}% load and {ERROR_PERCENTAGE}% error rate")
+    logger.info(f"Concurrent virtual users: {NUM_USERS} of {MAX_USERS}, connection pool size: {HTTP_POOL_SIZE}")
+    try:
+        asyncio.run(run_simulation())
+    except KeyboardInterrupt:
+        logger.info("Simulation stopped by user")
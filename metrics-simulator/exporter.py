@@ -0,0 +1,84 @@
+"""Prometheus metrics for the metrics simulator itself.
+
+The services only report the server side of each request. These metrics
+are the client side: how many requests the simulator meant to send versus
+how many completed, what latency it observed per operation, how many
+virtual users are active, and which errors were simulated locally versus
+returned by the services. Latency buckets match prometheus_flask_exporter's
+defaults so client and server histograms can be plotted side by side.
+"""
+import logging
+import os
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from stats import RunStats, StatsListener, Status, is_error
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', '5003'))  # 0 disables the /metrics endpoint
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0,
+                   float('inf'))
+
+REQUESTS_OFFERED = Counter(
+    'simulator_requests_offered_total',
+    'Requests the simulator attempted or scheduled, including simulated errors',
+    ['operation']
+)
+REQUESTS_COMPLETED = Counter(
+    'simulator_requests_completed_total',
+    'Requests that reached the network and completed, by status code or client error',
+    ['operation', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'simulator_request_duration_seconds',
+    'Client-side request latency (from the scheduled send time in open-loop mode)',
+    ['operation'],
+    buckets=LATENCY_BUCKETS
+)
+ERRORS = Counter(
+    'simulator_errors_total',
+    'Failed requests; source is "simulated" for ERROR_PERCENTAGE errors and "real" otherwise',
+    ['operation', 'source', 'type']
+)
+ACTIVE_USERS = Gauge(
+    'simulator_active_virtual_users',
+    'Virtual users currently running a session'
+)
+TARGET_RATE = Gauge(
+    'simulator_target_request_rate',
+    'Configured open-loop request rate per operation (requests per second)',
+    ['operation']
+)
+
+
+class PrometheusListener(StatsListener):
+    """Mirrors RunStats events into the Prometheus metrics above"""
+
+    def offer(self, operation: str):
+        REQUESTS_OFFERED.labels(operation).inc()
+
+    def record(self, operation: str, latency: float, status: Status):
+        REQUESTS_COMPLETED.labels(operation, str(status)).inc()
+        REQUEST_LATENCY.labels(operation).observe(latency)
+        if is_error(status):
+            ERRORS.labels(operation, 'real', str(status)).inc()
+
+    def count(self, operation: str, status: Status):
+        status = str(status)
+        if status.startswith('simulated_'):
+            ERRORS.labels(operation, 'simulated', status[len('simulated_'):]).inc()
+        elif is_error(status):
+            ERRORS.labels(operation, 'real', status).inc()
+
+    def active_users(self, active: int):
+        ACTIVE_USERS.set(active)
+
+
+def start_exporter(stats: RunStats, port: int = METRICS_PORT):
+    """Attach the Prometheus listener to `stats` and serve /metrics on `port`"""
+    stats.add_listener(PrometheusListener())
+    if port:
+        start_http_server(port)
+        logger.info(f"Serving simulator metrics on :{port}/metrics")
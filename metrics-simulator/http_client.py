@@ -0,0 +1,212 @@
+"""Pooled HTTP client with timeouts, jittered retries and per-service circuit breakers.
+
+Used by the threaded engine, and meant for any service-to-service call:
+
+    client = HttpClient()
+    response = client.request('login', 'POST', f"{USER_SERVICE_URL}/login", json=credentials)
+
+- Pooling: one requests.Session whose adapter keeps up to HTTP_POOL_SIZE
+  keep-alive connections per host, shared by every thread.
+- Timeouts: every request gets a (connect, read) timeout, HTTP_CONNECT_TIMEOUT
+  and HTTP_READ_TIMEOUT unless HTTP_TIMEOUTS overrides it for the operation
+  ("get_products=1:15,login=1:5"), so a hung service cannot hold a thread forever.
+- Retries: idempotent requests (GET, HEAD, OPTIONS, PUT, DELETE) that fail with a
+  connection error, a timeout or a 502/503/504 are retried up to HTTP_RETRIES
+  times. Each retry waits a jittered exponential backoff_delay(), so callers
+  that failed together do not retry together.
+- Circuit breaking: every service (scheme://host:port) gets a CircuitBreaker.
+  After CIRCUIT_FAILURE_THRESHOLD failures in a row (connection errors,
+  timeouts, 5xx) it opens, and requests fail fast with CircuitOpenError for
+  CIRCUIT_RESET_TIMEOUT seconds. Then a single trial request is let through
+  (half-open): success closes the circuit, failure opens it again.
+
+Exported metrics:
+
+- http_client_circuit_state{service}: 0 closed, 1 half-open, 2 open
+- http_client_circuit_opened_total{service}: times the circuit opened
+- http_client_rejected_total{service}: requests refused by an open circuit
+- http_client_retries_total{service,operation}: attempts that were retried
+"""
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from prometheus_client import Counter, Gauge
+from requests.adapters import HTTPAdapter
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '500'))  # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))  # Seconds to open a connection
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))  # Seconds to wait for the response
+HTTP_TIMEOUTS = os.getenv('HTTP_TIMEOUTS', '')  # Per operation "connect:read" overrides
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))  # Extra attempts for idempotent requests
+HTTP_BACKOFF_BASE = float(os.getenv('HTTP_BACKOFF_BASE', '0.1'))  # Seconds, doubled on every retry
+HTTP_BACKOFF_MAX = float(os.getenv('HTTP_BACKOFF_MAX', '5'))  # Longest wait between retries
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))  # Failures in a row that open it
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', '30'))  # Seconds open before a trial request
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+Timeout = Tuple[float, float]
+
+CIRCUIT_STATE = Gauge('http_client_circuit_state', 'Circuit breaker state: 0 closed, 1 half-open, 2 open',
+                      ['service'])
+CIRCUIT_OPENED = Counter('http_client_circuit_opened_total', 'Times the circuit breaker opened', ['service'])
+REJECTED = Counter('http_client_rejected_total', 'Requests refused because the circuit was open', ['service'])
+RETRIES = Counter('http_client_retries_total', 'Request attempts that were retried', ['service', 'operation'])
+
+_random = random.Random()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """The service's circuit is open, so the request was not sent"""
+
+
+def parse_timeouts(spec: str) -> Dict[str, Timeout]:
+    """Parse "get_products=1:15,login=2" into {"get_products": (1.0, 15.0), "login": (2.0, 2.0)}"""
+    timeouts = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        operation, _, value = item.partition('=')
+        connect, _, read = value.partition(':')
+        if not operation.strip() or not connect.strip():
+            raise ValueError(f"Invalid timeout '{item}', expected operation=connect:read")
+        timeouts[operation.strip()] = (float(connect), float(read or connect))
+    return timeouts
+
+
+def backoff_delay(attempt: int, base: float = HTTP_BACKOFF_BASE, cap: float = HTTP_BACKOFF_MAX,
+                  rand: Optional[random.Random] = None) -> float:
+    """Seconds to wait before retry number `attempt` (from 0): full jitter over base * 2**attempt"""
+    return (rand or _random).uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """Closed, open or half-open state of one service, safe to share between threads"""
+
+    def __init__(self, service: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_TIMEOUT, clock: Callable[[], float] = time.monotonic):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(service).set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.labels(self.service).set(STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; every allowed request must end in success(), failure() or release()"""
+        with self._lock:
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+                self._trial_in_flight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        REJECTED.labels(self.service).inc()
+        return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self._set_state(CLOSED)
+
+    def release(self):
+        """End an allowed request that neither succeeded nor failed, e.g. interrupted, freeing the half-open trial"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+                CIRCUIT_OPENED.labels(self.service).inc()
+
+
+class HttpClient:
+    """Thread-safe client; `observer` gets record(operation, latency, status) for every attempt
+    and count(operation, "CircuitOpenError") for every refused request, like stats.RunStats"""
+
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, timeouts: Optional[Dict[str, Timeout]] = None,
+                 retries: int = HTTP_RETRIES, observer: Any = None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.timeouts = parse_timeouts(HTTP_TIMEOUTS) if timeouts is None else timeouts
+        self.retries = retries
+        self.observer = observer
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        parts = urlsplit(url)
+        service = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if service not in self._breakers:
+                self._breakers[service] = CircuitBreaker(service)
+            return self._breakers[service]
+
+    def timeout(self, operation: str) -> Timeout:
+        return self.timeouts.get(operation, (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+    def _observe(self, operation: str, start: float, status):
+        if self.observer is not None:
+            self.observer.record(operation, time.perf_counter() - start, status)
+
+    def request(self, operation: str, method: str, url: str, **kwargs) -> requests.Response:
+        """Send the request, retrying idempotent ones; raises CircuitOpenError when the circuit is open"""
+        breaker = self.breaker(url)
+        kwargs.setdefault('timeout', self.timeout(operation))
+        attempts = 1 + (self.retries if method.upper() in IDEMPOTENT_METHODS else 0)
+        for attempt in range(attempts):
+            if not breaker.allow():
+                if self.observer is not None:
+                    self.observer.count(operation, CircuitOpenError.__name__)
+                raise CircuitOpenError(f"Circuit for {breaker.service} is open")
+            start = time.perf_counter()
+            settled = False
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._observe(operation, start, type(e).__name__)
+                breaker.failure()
+                settled = True
+                retryable = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+                if not retryable or attempt + 1 == attempts:
+                    raise
+            else:
+                self._observe(operation, start, response.status_code)
+                if response.status_code >= 500:
+                    breaker.failure()
+                else:
+                    breaker.success()
+                settled = True
+                if response.status_code not in RETRY_STATUSES or attempt + 1 == attempts:
+                    return response
+            finally:
+                # Any other exception (a hook's ValueError, KeyboardInterrupt) must not leave the trial taken
+                if not settled:
+                    breaker.release()
+            RETRIES.labels(breaker.service, operation).inc()
+            time.sleep(backoff_delay(attempt))
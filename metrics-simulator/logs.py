@@ -0,0 +1,151 @@
+"""Structured JSON logging that never blocks the calling thread.
+
+configure() points the root logger at a queue: the calling thread only puts
+the record on it, and a QueueListener thread formats it and writes it to
+stdout. Each line is one JSON object,
+
+    {"@timestamp": "2024-05-01T12:00:00.123Z", "level": "INFO", "logger": "root",
+     "service": "metrics-simulator", "message": "User 42: Login successful",
+     "user_id": 42, "operation": "login", "sample_rate": 0.01}
+
+which Fluent Bit picks up from the container log and ships to Elasticsearch
+as is; Kibana index patterns use @timestamp as their time field. Fields
+passed in `extra` become top-level keys.
+
+High-volume success lines are logged with extra=sampled(...): only
+LOG_SAMPLE_RATE of them are kept, and each kept line carries its sample_rate
+so counts in Kibana can be scaled back up. Warnings and errors are never
+sampled. If the writer falls LOG_QUEUE_SIZE records behind, new records are
+dropped and counted in log_records_dropped_total instead of blocking.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from prometheus_client import Counter
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # "json" for the EFK stack, "text" to read locally
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.01'))  # Share of sampled() lines that are kept
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # Records waiting to be written
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+DROPPED = Counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+# Attributes of every LogRecord; anything else was passed in `extra`
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+_exception_formatter = logging.Formatter()
+_random = random.Random()
+
+_handler = None
+_listener = None
+
+
+def sampled(rate=None, **fields):
+    """`extra` for a high-volume line that is only kept for `rate` (default LOG_SAMPLE_RATE) of calls"""
+    fields['sample_rate'] = LOG_SAMPLE_RATE if rate is None else rate
+    return fields
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps sample_rate of the records logged with sampled(); never drops warnings or errors"""
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        return rate is None or record.levelno >= logging.WARNING or _random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the `extra` fields at the top level"""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            '@timestamp': datetime.fromtimestamp(record.created, timezone.utc)
+                                  .isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'level': record.levelname,
+            'logger': record.name,
+            'service': self.service,
+            'message': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingHandler(QueueHandler):
+    """Puts records on a bounded queue, dropping them when it is full instead of waiting"""
+
+    def __init__(self, log_queue, context=None):
+        super().__init__(log_queue)
+        self.context = context
+        self.addFilter(SamplingFilter())
+
+    def prepare(self, record):
+        # Resolve what depends on the calling thread here; the listener thread does the formatting
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        if self.context:
+            for key, value in self.context().items():
+                setattr(record, key, value)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+def _start_listener(output):
+    global _listener
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The listener thread does not survive fork(); the child gets its own queue and thread
+    output = _listener.handlers[0]
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _start_listener(output)
+
+
+def _stop():
+    try:
+        _listener.stop()
+    except queue.Full:
+        pass
+
+
+def configure(service, context=None):
+    """Route this process's logging through the queue; `context()` adds fields from the logging thread"""
+    global _handler
+    if _handler is not None:
+        return _handler
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter(service) if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+    _handler = NonBlockingHandler(queue.Queue(LOG_QUEUE_SIZE), context)
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(LOG_LEVEL)
+    _start_listener(output)
+    atexit.register(_stop)
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    return _handler
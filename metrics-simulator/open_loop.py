@@ -0,0 +1,296 @@
+"""Open-loop (constant arrival rate) mode for the metrics simulator.
+
+Closed-loop virtual users wait for each response before sending the next
+request, so a slow service quietly lowers the offered load. Here every
+endpoint gets its own schedule of intended send times at a fixed rate,
+requests are fired on that schedule whether or not earlier ones have
+returned, and latency is measured from the intended send time. A request
+that could not leave on time (because the client or the connection pool
+was backed up) is charged for the wait, which corrects for coordinated
+omission.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import aiohttp
+
+import recorder
+from engine import create_http_session, HTTP_POOL_SIZE
+from exporter import TARGET_RATE
+from stats import RunStats, RUN_STATS
+from workload import (
+    USER_SERVICE_URL, PRODUCT_SERVICE_URL, ERROR_PERCENTAGE,
+    choose_simulated_error, make_rng, rng, use_rng,
+    user_payload, login_payload, product_payload, product_update_payload
+)
+
+logger = logging.getLogger(__name__)
+
+# Target request rate per endpoint, in requests per second
+OPEN_LOOP_RATES = os.getenv(
+    'OPEN_LOOP_RATES',
+    'get_products=20,get_product=20,login=2,get_user_profile=5,'
+    'create_product=1,update_product=1,delete_product=0.5'
+)
+OPEN_LOOP_DURATION = float(os.getenv('OPEN_LOOP_DURATION', '0'))  # Seconds to run, 0 runs forever
+OPEN_LOOP_ARRIVALS = os.getenv('OPEN_LOOP_ARRIVALS', 'constant')  # "constant" or "poisson"
+OPEN_LOOP_MAX_IN_FLIGHT = int(os.getenv('OPEN_LOOP_MAX_IN_FLIGHT', '10000'))
+OPEN_LOOP_ACCOUNTS = int(os.getenv('OPEN_LOOP_ACCOUNTS', '20'))  # Users logged in up front for auth'd endpoints
+OPEN_LOOP_SUMMARY_INTERVAL = float(os.getenv('OPEN_LOOP_SUMMARY_INTERVAL', '30'))
+
+RequestSpec = Tuple[str, str, int, Dict[str, Any]]
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """Parse "get_products=20,login=2" into {"get_products": 20.0, "login": 2.0}"""
+    rates = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        operation, _, rate = item.partition('=')
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}', expected one of {sorted(OPERATIONS)}")
+        if float(rate) > 0:
+            rates[operation] = float(rate)
+    return rates
+
+
+REGISTER_FIRST_ID = 100000  # First user ID registered by the register_user schedule
+REGISTER_IDS_PER_SHARE = 10 ** 6  # User IDs reserved for each distributed worker's registrations
+
+
+class OpenLoopContext:
+    """State shared by all scheduled requests: auth tokens and known product IDs
+
+    `product_ids` holds every product reads and updates may pick, including
+    the ones that existed before the run; `created_ids` only the ones this
+    run created, which are the only ones it deletes.
+
+    `share` is the index of the distributed worker, which registers users
+    from its own range of IDs so workers don't collide on usernames.
+    """
+
+    def __init__(self, share: int = 0):
+        self.tokens: List[str] = []
+        self.product_ids: List[int] = []
+        self.created_ids: List[int] = []
+        self.next_user_id = REGISTER_FIRST_ID + share * REGISTER_IDS_PER_SHARE
+
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {rng().choice(self.tokens)}"} if self.tokens else {}
+
+
+def _register(ctx: OpenLoopContext) -> RequestSpec:
+    ctx.next_user_id += 1
+    return "POST", f"{USER_SERVICE_URL}/register", 201, {"json": user_payload(ctx.next_user_id)}
+
+
+def _login(ctx: OpenLoopContext) -> RequestSpec:
+    user_id = rng().randint(1, OPEN_LOOP_ACCOUNTS)
+    return "POST", f"{USER_SERVICE_URL}/login", 200, {"json": login_payload(user_id)}
+
+
+def _profile(ctx: OpenLoopContext) -> RequestSpec:
+    return "GET", f"{USER_SERVICE_URL}/profile", 200, {"headers": ctx.auth()}
+
+
+def _list_products(ctx: OpenLoopContext) -> RequestSpec:
+    return "GET", PRODUCT_SERVICE_URL, 200, {"headers": ctx.auth()}
+
+
+def _get_product(ctx: OpenLoopContext) -> Optional[RequestSpec]:
+    if not ctx.product_ids:
+        return None
+    return "GET", f"{PRODUCT_SERVICE_URL}/{rng().choice(ctx.product_ids)}", 200, {}
+
+
+def _create_product(ctx: OpenLoopContext) -> RequestSpec:
+    return "POST", PRODUCT_SERVICE_URL, 201, {"json": product_payload(), "headers": ctx.auth()}
+
+
+def _update_product(ctx: OpenLoopContext) -> Optional[RequestSpec]:
+    if not ctx.product_ids:
+        return None
+    product_id = rng().choice(ctx.product_ids)
+    return ("PUT", f"{PRODUCT_SERVICE_URL}/{product_id}", 200,
+            {"json": product_update_payload(product_id), "headers": ctx.auth()})
+
+
+def _delete_product(ctx: OpenLoopContext) -> Optional[RequestSpec]:
+    # Only delete products this run created, and keep a few around for reads
+    if not ctx.created_ids or len(ctx.product_ids) <= 1:
+        return None
+    product_id = ctx.created_ids.pop(rng().randrange(len(ctx.created_ids)))
+    ctx.product_ids.remove(product_id)
+    return "DELETE", f"{PRODUCT_SERVICE_URL}/{product_id}", 204, {"headers": ctx.auth()}
+
+
+OPERATIONS = {
+    "register_user": _register,
+    "login": _login,
+    "get_user_profile": _profile,
+    "get_products": _list_products,
+    "get_product": _get_product,
+    "create_product": _create_product,
+    "update_product": _update_product,
+    "delete_product": _delete_product,
+}
+
+
+async def prepare(http: aiohttp.ClientSession, ctx: OpenLoopContext, accounts: int = OPEN_LOOP_ACCOUNTS):
+    """Register and log in the accounts used by authenticated endpoints, and learn some product IDs"""
+    for user_id in range(1, accounts + 1):
+        try:
+            async with http.post(f"{USER_SERVICE_URL}/register", json=user_payload(user_id)):
+                pass
+            async with http.post(f"{USER_SERVICE_URL}/login", json=login_payload(user_id)) as response:
+                if response.status == 200:
+                    ctx.tokens.append((await response.json(content_type=None))["access_token"])
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Could not prepare account {user_id}: {str(e)}")
+
+    try:
+        async with http.get(PRODUCT_SERVICE_URL, headers=ctx.auth()) as response:
+            if response.status == 200:
+                ctx.product_ids.extend(p["id"] for p in await response.json(content_type=None))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Could not list existing products: {str(e)}")
+    logger.info(f"Open-loop run prepared with {len(ctx.tokens)} accounts and {len(ctx.product_ids)} known products")
+
+
+def plan_request(ctx: OpenLoopContext, operation: str) -> Union[str, RequestSpec]:
+    """Decide what the next `operation` request does: a RequestSpec to send, or the status to count instead
+
+    Called when the request is scheduled rather than when it is sent, so a
+    seeded run makes the same decisions in the same order however the
+    responses interleave.
+    """
+    error_type = choose_simulated_error()
+    if error_type is not None:
+        return f"simulated_{error_type}"
+    return OPERATIONS[operation](ctx) or "skipped"
+
+
+async def fire(http: aiohttp.ClientSession, ctx: OpenLoopContext, operation: str,
+               planned: Union[str, RequestSpec], intended: float, stats: RunStats,
+               in_flight: asyncio.Semaphore):
+    """Send one planned request and record its latency from the intended send time"""
+    if isinstance(planned, str):
+        stats.count(operation, planned)
+        return
+    method, url, expected_status, kwargs = planned
+
+    loop = asyncio.get_running_loop()
+    async with in_flight:
+        if recorder.RECORDER is not None:
+            recorder.RECORDER.record(operation, method, url, kwargs, at=intended)
+        sent = loop.time()
+        body = None
+        try:
+            async with http.request(method, url, **kwargs) as response:
+                status = response.status
+                if status == expected_status and operation == "create_product":
+                    body = await response.json(content_type=None)
+                else:
+                    await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # ValueError: a created product's body that isn't JSON
+            status = type(e).__name__
+        done = loop.time()
+        stats.record(operation, done - intended, status, service_time=done - sent)
+
+        if isinstance(body, dict) and "id" in body:
+            ctx.product_ids.append(body["id"])
+            ctx.created_ids.append(body["id"])
+
+
+async def schedule(http: aiohttp.ClientSession, ctx: OpenLoopContext, operation: str, rate: float,
+                   stats: RunStats, in_flight: asyncio.Semaphore, stop_at: Optional[float] = None,
+                   arrivals: str = OPEN_LOOP_ARRIVALS, share: int = 0):
+    """Fire `operation` at `rate` requests per second without waiting for responses"""
+    # Workers of a distributed run (`share`) each get their own stream of requests
+    use_rng(make_rng('open-loop', share, operation))
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    next_send = loop.time()
+    while stop_at is None or next_send < stop_at:
+        delay = next_send - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # If we are behind schedule the request still carries its original intended time
+        stats.offer(operation)
+        planned = plan_request(ctx, operation)
+        task = asyncio.create_task(fire(http, ctx, operation, planned, next_send, stats, in_flight))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        next_send += rng().expovariate(rate) if arrivals == "poisson" else 1.0 / rate
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def log_summary(stats: RunStats):
+    for operation, summary in sorted(stats.summary().items()):
+        latency = summary['latency_ms']
+        logger.info(
+            f"{operation}: {summary['count']} requests, {summary['throughput']:.1f} req/s, "
+            f"p50 {latency['p50']:.1f}ms, p99 {latency['p99']:.1f}ms, p99.9 {latency['p999']:.1f}ms "
+            f"(service time p99 {summary['service_time_ms']['p99']:.1f}ms), "
+            f"{summary['errors']} errors {summary['statuses']}"
+        )
+
+
+async def _summarize_periodically(stats: RunStats, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        log_summary(stats)
+
+
+async def run_open_loop(rates: Dict[str, float], duration: Optional[float] = None,
+                        stats: Optional[RunStats] = None, ctx: Optional[OpenLoopContext] = None,
+                        pool_size: int = HTTP_POOL_SIZE, max_in_flight: int = OPEN_LOOP_MAX_IN_FLIGHT,
+                        arrivals: str = OPEN_LOOP_ARRIVALS, accounts: int = OPEN_LOOP_ACCOUNTS,
+                        share: int = 0) -> RunStats:
+    """Drive every endpoint in `rates` at its target rate for `duration` seconds (forever if None)
+
+    `share` is the index of the distributed worker running it, see distributed.py.
+    """
+    stats = stats or RUN_STATS
+    ctx = ctx or OpenLoopContext(share)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    async with create_http_session(pool_size) as http:
+        if accounts:
+            await prepare(http, ctx, accounts)
+        stats.reset_clock()
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + duration if duration else None
+        for operation, rate in rates.items():
+            TARGET_RATE.labels(operation).set(rate)
+        await asyncio.gather(*(
+            schedule(http, ctx, operation, rate, stats, in_flight, stop_at, arrivals, share)
+            for operation, rate in rates.items()
+        ))
+    return stats
+
+
+def start_open_loop_simulation():
+    """Start the open-loop simulation with the configured per-endpoint rates"""
+    rates = parse_rates(OPEN_LOOP_RATES)
+    logger.info(f"Starting open-loop simulator ({OPEN_LOOP_ARRIVALS} arrivals) with {ERROR_PERCENTAGE}% error rate")
+    logger.info(f"Target rates (req/s): {rates}")
+
+    async def main():
+        stats = RUN_STATS
+        reporter = asyncio.create_task(_summarize_periodically(stats, OPEN_LOOP_SUMMARY_INTERVAL))
+        try:
+            await run_open_loop(rates, OPEN_LOOP_DURATION or None, stats=stats)
+        finally:
+            reporter.cancel()
+            log_summary(stats)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        logger.info("Simulation stopped by user")
@@ -0,0 +1,93 @@
+"""Record the request stream of a simulator run so it can be replayed.
+
+Recordings are gzip-compressed JSON lines. The first line is a header
+with the seed and start time; every following line is one request:
+
+    [offset_s, operation, method, service, path, json_body, needs_auth]
+
+`service` is "user" or "product" and `path` is relative to that service's
+base URL, so a recording can be replayed against a different deployment
+(see replay.py). Auth tokens are not stored; the replayer logs in its own
+accounts and attaches a token wherever `needs_auth` is set.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from workload import USER_SERVICE_URL, PRODUCT_SERVICE_URL, SIMULATOR_SEED
+
+RECORD_PATH = os.getenv('RECORD_PATH', '')  # Where to record the run's requests, empty disables recording
+
+RECORDING_VERSION = 1
+
+SERVICES = {"user": USER_SERVICE_URL, "product": PRODUCT_SERVICE_URL}
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Map a full URL to (service, path relative to the service base URL)"""
+    for service, base in SERVICES.items():
+        if url.startswith(base):
+            return service, url[len(base):]
+    raise ValueError(f"{url} does not belong to a known service")
+
+
+class RequestRecorder:
+    """Appends every request sent by the simulator to a recording file"""
+
+    def __init__(self, path: str, metadata: Optional[Dict[str, Any]] = None):
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self.started = time.monotonic()
+        header = {'version': RECORDING_VERSION, 'seed': SIMULATOR_SEED, 'started_at': time.time(),
+                  **(metadata or {})}
+        self._file.write(json.dumps(header) + '\n')
+
+    def record(self, operation: str, method: str, url: str, kwargs: Dict[str, Any],
+               at: Optional[float] = None):
+        """Record one request; `at` is a time.monotonic() timestamp (default: now)"""
+        offset = round((time.monotonic() if at is None else at) - self.started, 6)
+        service, path = split_url(url)
+        entry = [offset, operation, method, service, path, kwargs.get('json'),
+                 'Authorization' in (kwargs.get('headers') or {})]
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_recording(path: str) -> Tuple[Dict[str, Any], Iterator[List[Any]]]:
+    """Return the header and a lazy iterator over the recorded requests"""
+    f = gzip.open(path, 'rt', encoding='utf-8')
+    header = json.loads(f.readline())
+    if header.get('version') != RECORDING_VERSION:
+        f.close()
+        raise ValueError(f"Unsupported recording version {header.get('version')}")
+
+    def entries():
+        with f:
+            for line in f:
+                yield json.loads(line)
+
+    return header, entries()
+
+
+# Recorder shared by whichever engine is running in this process, if recording is enabled
+RECORDER: Optional[RequestRecorder] = None
+
+
+def start_recording(path: str = RECORD_PATH, metadata: Optional[Dict[str, Any]] = None):
+    global RECORDER
+    RECORDER = RequestRecorder(path, metadata)
+
+
+def stop_recording():
+    global RECORDER
+    if RECORDER is not None:
+        RECORDER.close()
+        RECORDER = None
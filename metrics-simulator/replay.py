@@ -0,0 +1,93 @@
+"""Replay a recorded simulator run against the services.
+
+Requests are sent open-loop at their recorded offsets (divided by
+--speed), with latency measured from the intended send time just like
+open_loop.py, so a recording of production-like traffic can be replayed
+at 1x for a faithful reproduction or at 5x to look for the breaking point:
+
+    RECORD_PATH=run.jsonl.gz SIMULATOR_SEED=42 python app.py   # record
+    python replay.py run.jsonl.gz --speed 5 --report replay.json
+
+Product IDs in the recorded paths only resolve if the target database was
+seeded the same way as the one the recording was made against.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import logs
+from engine import create_http_session, HTTP_POOL_SIZE
+from open_loop import OPEN_LOOP_ACCOUNTS, OPEN_LOOP_MAX_IN_FLIGHT, OpenLoopContext, fire, log_summary, prepare
+from recorder import SERVICES, read_recording
+from report import build_report, write_report
+from stats import RUN_STATS, RunStats
+
+logger = logging.getLogger(__name__)
+
+# Status each operation is expected to answer with when it succeeds
+EXPECTED_STATUS = {"register_user": 201, "create_product": 201, "delete_product": 204}
+
+
+async def replay(path: str, speed: float = 1.0, stats: Optional[RunStats] = None,
+                 ctx: Optional[OpenLoopContext] = None, pool_size: int = HTTP_POOL_SIZE,
+                 max_in_flight: int = OPEN_LOOP_MAX_IN_FLIGHT,
+                 accounts: int = OPEN_LOOP_ACCOUNTS) -> Tuple[Dict[str, Any], RunStats]:
+    """Send every request in the recording at `path` at its offset / `speed`"""
+    if speed <= 0:
+        raise ValueError("speed must be greater than zero")
+    stats = stats or RUN_STATS
+    ctx = ctx or OpenLoopContext()
+    header, entries = read_recording(path)
+    in_flight = asyncio.Semaphore(max_in_flight)
+    tasks = set()
+    async with create_http_session(pool_size) as http:
+        if accounts:
+            await prepare(http, ctx, accounts)
+        stats.reset_clock()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for offset, operation, method, service, rel_path, body, needs_auth in entries:
+            intended = start + offset / speed
+            delay = intended - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kwargs = {}
+            if body is not None:
+                kwargs["json"] = body
+            if needs_auth:
+                kwargs["headers"] = ctx.auth()
+            spec = (method, SERVICES[service] + rel_path, EXPECTED_STATUS.get(operation, 200), kwargs)
+            stats.offer(operation)
+            task = asyncio.create_task(fire(http, ctx, operation, spec, intended, stats, in_flight))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+    return header, stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay a recorded simulator run')
+    parser.add_argument('recording', help='Recording written with RECORD_PATH')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay speed multiplier (default: 1)')
+    parser.add_argument('--accounts', type=int, default=OPEN_LOOP_ACCOUNTS,
+                        help='Accounts to log in for authenticated requests')
+    parser.add_argument('--report', default=None, help='Write the report here (.json or .csv)')
+    args = parser.parse_args(argv)
+    logs.configure('metrics-simulator')
+
+    header, stats = asyncio.run(replay(args.recording, args.speed, accounts=args.accounts))
+    log_summary(stats)
+    if args.report:
+        write_report(build_report(stats, {'engine': 'replay', 'recording': args.recording,
+                                          'recorded_engine': header.get('engine'),
+                                          'seed': header.get('seed'), 'speed': args.speed}),
+                     args.report)
+        logger.info(f"Replay report written to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
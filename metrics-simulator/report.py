@@ -0,0 +1,162 @@
+"""Machine-readable run reports for the metrics simulator.
+
+Reports are written as JSON (or CSV when the path ends in .csv) with one
+entry per operation, and two JSON reports can be compared for latency,
+error-rate and throughput regressions:
+
+    python report.py baseline.json current.json --threshold 10
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from stats import RunStats, PERCENTILES
+
+logger = logging.getLogger(__name__)
+
+REPORT_PATH = os.getenv('REPORT_PATH', '')  # Where to write the run report, empty disables it
+REPORT_INTERVAL = float(os.getenv('REPORT_INTERVAL', '60'))  # Seconds between report rewrites
+RUN_LABEL = os.getenv('RUN_LABEL', '')  # Free-form name to tell runs apart, e.g. a build or commit
+
+REPORT_VERSION = 1
+LATENCY_KEYS = [f"p{q:g}".replace('.', '') for q in PERCENTILES] + ['mean', 'max']
+
+
+def build_report(stats: RunStats, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    operations = stats.summary()
+    count = sum(op['count'] for op in operations.values())
+    errors = sum(op['errors'] for op in operations.values())
+    return {
+        'version': REPORT_VERSION,
+        'run': {
+            'label': RUN_LABEL,
+            'started_at': datetime.fromtimestamp(stats.started_at, timezone.utc).isoformat(),
+            'written_at': datetime.now(timezone.utc).isoformat(),
+            'duration_s': stats.elapsed(),
+            'peak_active_users': stats.peak_active_users,
+            **(metadata or {}),
+        },
+        'totals': {
+            'count': count,
+            'throughput': count / stats.elapsed(),
+            'errors': errors,
+            'error_rate': errors / count if count else 0.0,
+        },
+        'operations': operations,
+    }
+
+
+def _csv_rows(report: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for operation, summary in sorted(report['operations'].items()):
+        row = {
+            'operation': operation,
+            'offered': summary['offered'],
+            'count': summary['count'],
+            'throughput': round(summary['throughput'], 3),
+            'errors': summary['errors'],
+            'error_rate': round(summary['error_rate'], 5),
+        }
+        for key in LATENCY_KEYS:
+            row[f'latency_{key}_ms'] = summary['latency_ms'][key]
+            row[f'service_time_{key}_ms'] = summary['service_time_ms'][key]
+        row['statuses'] = json.dumps(summary['statuses'], sort_keys=True)
+        rows.append(row)
+    return rows
+
+
+def write_report(report: Dict[str, Any], path: str):
+    """Write the report atomically so readers never see a half-written file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        if path.endswith('.csv'):
+            rows = _csv_rows(report)
+            if rows:
+                writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            json.dump(report, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class ReportWriter(threading.Thread):
+    """Rewrites the report every `interval` seconds, and once more on stop()"""
+
+    def __init__(self, stats: RunStats, path: str, interval: float = REPORT_INTERVAL,
+                 metadata: Optional[Dict[str, Any]] = None):
+        super().__init__(name='report-writer', daemon=True)
+        self.stats = stats
+        self.path = path
+        self.interval = interval
+        self.metadata = metadata
+        self._stopped = threading.Event()
+
+    def write(self):
+        try:
+            write_report(build_report(self.stats, self.metadata), self.path)
+        except OSError as e:
+            logger.error(f"Failed to write report to {self.path}: {str(e)}")
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self._stopped.set()
+        self.write()
+        logger.info(f"Run report written to {self.path}")
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold_pct: float = 10.0) -> List[str]:
+    """Return a description of every metric in `current` that regressed beyond `threshold_pct`"""
+    regressions = []
+    factor = 1 + threshold_pct / 100
+    for operation, base in sorted(baseline['operations'].items()):
+        cur = current['operations'].get(operation)
+        if cur is None:
+            regressions.append(f"{operation}: missing from current run")
+            continue
+        for key in ('p50', 'p99', 'p999'):
+            before, after = base['latency_ms'][key], cur['latency_ms'][key]
+            if before > 0 and after > before * factor:
+                regressions.append(f"{operation}: latency {key} {before:.2f}ms -> {after:.2f}ms")
+        if cur['error_rate'] > base['error_rate'] * factor and cur['error_rate'] - base['error_rate'] > 0.001:
+            regressions.append(
+                f"{operation}: error rate {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+        if base['throughput'] > 0 and cur['throughput'] < base['throughput'] / factor:
+            regressions.append(
+                f"{operation}: throughput {base['throughput']:.1f} -> {cur['throughput']:.1f} req/s")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compare two simulator JSON reports')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Allowed regression in percent (default: 10)')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = compare_reports(baseline, current, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:g}%")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
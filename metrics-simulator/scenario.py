@@ -0,0 +1,282 @@
+"""Declarative load scenarios for the metrics simulator.
+
+A scenario file (YAML or JSON) replaces the hard-coded user_session flow
+with a weighted operation mix, a think-time distribution and a ramp
+profile, and sets the latency/error thresholds that define saturation:
+
+    name: browse-heavy
+    load: rps                  # "rps" drives the mix open-loop at a total request rate,
+                               # "users" runs closed-loop virtual users with think time
+    mix:                       # relative weights, any scale
+      get_products: 90
+      get_product: 8
+      create_product: 1
+      update_product: 1
+    think_time:                # only used with load: users
+      distribution: exponential   # constant, uniform, exponential or lognormal
+      mean: 2.0
+    profile:
+      type: step               # step, spike or soak
+      start: 50
+      step: 50
+      steps: 8
+      step_duration: 60
+    thresholds:
+      p99_ms: 500
+      error_rate: 0.01
+
+Each stage of the profile runs at one load level. After every stage the
+worst per-operation p99 and the overall error rate are checked against the
+thresholds, and the report names the last level that stayed within them
+and the first that did not.
+
+    python scenario.py scenarios/browse_heavy.yaml --report browse_heavy.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+
+import logs
+from engine import create_http_session, HTTP_POOL_SIZE
+from open_loop import (
+    OPERATIONS, OPEN_LOOP_ACCOUNTS, OPEN_LOOP_MAX_IN_FLIGHT, OpenLoopContext, fire, plan_request, prepare,
+    run_open_loop
+)
+from report import build_report, write_report
+from stats import RUN_STATS, RunStats
+from workload import make_rng, rng, use_rng
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_FILE = os.getenv('SCENARIO_FILE', '')  # Used when SIMULATOR_ENGINE=scenario
+
+LOAD_TYPES = ('rps', 'users')
+THINK_TIME_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+PROFILE_TYPES = ('step', 'spike', 'soak')
+
+Stage = Tuple[float, float]  # (load level, duration in seconds)
+
+
+def load_scenario(path: str) -> Dict[str, Any]:
+    """Read and validate a scenario file"""
+    with open(path) as f:
+        scenario = json.load(f) if path.endswith('.json') else yaml.safe_load(f)
+    validate_scenario(scenario)
+    scenario.setdefault('name', os.path.splitext(os.path.basename(path))[0])
+    return scenario
+
+
+def validate_scenario(scenario: Dict[str, Any]):
+    if scenario.get('load', 'rps') not in LOAD_TYPES:
+        raise ValueError(f"load must be one of {LOAD_TYPES}")
+
+    mix = scenario.get('mix')
+    if not mix:
+        raise ValueError("Scenario needs a non-empty 'mix' of operation weights")
+    for operation, weight in mix.items():
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}' in mix, expected one of {sorted(OPERATIONS)}")
+        if weight < 0:
+            raise ValueError(f"Weight for '{operation}' must not be negative")
+    if sum(mix.values()) <= 0:
+        raise ValueError("Mix weights must add up to more than zero")
+
+    think_time = scenario.get('think_time', {'distribution': 'constant', 'mean': 0})
+    if think_time.get('distribution') not in THINK_TIME_DISTRIBUTIONS:
+        raise ValueError(f"think_time.distribution must be one of {THINK_TIME_DISTRIBUTIONS}")
+
+    profile_stages(scenario.get('profile', {}))
+
+
+def normalized_mix(mix: Dict[str, float]) -> Dict[str, float]:
+    total = sum(mix.values())
+    return {operation: weight / total for operation, weight in mix.items() if weight > 0}
+
+
+def sample_think_time(spec: Dict[str, Any], rng: random.Random) -> float:
+    """Draw one think time in seconds from the scenario's distribution"""
+    distribution = spec.get('distribution', 'constant')
+    mean = float(spec.get('mean', 0))
+    if distribution == 'uniform':
+        return rng.uniform(float(spec.get('min', 0)), float(spec.get('max', 2 * mean)))
+    if distribution == 'exponential':
+        return rng.expovariate(1 / mean) if mean > 0 else 0.0
+    if distribution == 'lognormal':
+        # Parameterized by the mean of the distribution itself, not of the underlying normal
+        sigma = float(spec.get('sigma', 0.5))
+        return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0.0
+    return mean
+
+
+def profile_stages(profile: Dict[str, Any]) -> List[Stage]:
+    """Expand a ramp profile into (load level, duration) stages"""
+    profile_type = profile.get('type')
+    try:
+        if profile_type == 'step':
+            return [(profile['start'] + i * profile['step'], profile['step_duration'])
+                    for i in range(profile['steps'])]
+        if profile_type == 'spike':
+            base = (profile['base'], profile['base_duration'])
+            spike = (profile['peak'], profile['spike_duration'])
+            return [base] + [spike, base] * profile.get('repeat', 1)
+        if profile_type == 'soak':
+            return [(profile['level'], profile['duration'])]
+    except KeyError as e:
+        raise ValueError(f"{profile_type} profile is missing '{e.args[0]}'")
+    raise ValueError(f"profile.type must be one of {PROFILE_TYPES}")
+
+
+def evaluate_stage(level: float, summary: Dict[str, Dict], elapsed: float,
+                   thresholds: Dict[str, float]) -> Dict[str, Any]:
+    """Condense one stage's stats and check them against the thresholds"""
+    count = sum(op['count'] for op in summary.values())
+    errors = sum(op['errors'] for op in summary.values())
+    p99 = max((op['latency_ms']['p99'] for op in summary.values()), default=0.0)
+    error_rate = errors / count if count else 0.0
+
+    breaches = []
+    if 'p99_ms' in thresholds and p99 > thresholds['p99_ms']:
+        breaches.append(f"p99 {p99:.1f}ms > {thresholds['p99_ms']}ms")
+    if 'error_rate' in thresholds and error_rate > thresholds['error_rate']:
+        breaches.append(f"error rate {error_rate:.2%} > {thresholds['error_rate']:.2%}")
+    return {
+        'level': level,
+        'duration_s': elapsed,
+        'count': count,
+        'throughput': count / elapsed if elapsed else 0.0,
+        'p99_ms': p99,
+        'error_rate': error_rate,
+        'breaches': breaches,
+    }
+
+
+def find_saturation(stages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The last level within thresholds before the first one that breached them"""
+    last_ok = None
+    for stage in stages:
+        if stage['breaches']:
+            return {'saturated': True, 'last_ok_level': last_ok, 'first_breach_level': stage['level'],
+                    'breaches': stage['breaches']}
+        last_ok = stage['level']
+    return {'saturated': False, 'last_ok_level': last_ok, 'first_breach_level': None, 'breaches': []}
+
+
+async def _virtual_user(http, ctx: OpenLoopContext, index: int, mix: Dict[str, float],
+                        think_time: Dict[str, Any], stats: RunStats, in_flight: asyncio.Semaphore,
+                        stop: asyncio.Event):
+    operations, weights = list(mix), list(mix.values())
+    loop = asyncio.get_running_loop()
+    use_rng(make_rng('scenario-user', index))
+    stats.user_started()
+    try:
+        while not stop.is_set():
+            operation = rng().choices(operations, weights)[0]
+            stats.offer(operation)
+            await fire(http, ctx, operation, plan_request(ctx, operation), loop.time(), stats, in_flight)
+            await asyncio.sleep(sample_think_time(think_time, rng()))
+    finally:
+        stats.user_finished()
+
+
+async def run_users_stage(users: int, mix: Dict[str, float], think_time: Dict[str, Any], duration: float,
+                          stats: RunStats, ctx: OpenLoopContext, pool_size: int = HTTP_POOL_SIZE):
+    """Closed loop: `users` virtual users pick operations from the mix and pause between them"""
+    stop = asyncio.Event()
+    in_flight = asyncio.Semaphore(OPEN_LOOP_MAX_IN_FLIGHT)
+    async with create_http_session(pool_size) as http:
+        tasks = [asyncio.create_task(_virtual_user(http, ctx, index, mix, think_time, stats, in_flight, stop))
+                 for index in range(int(users))]
+        await asyncio.sleep(duration)
+        stop.set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_scenario(scenario: Dict[str, Any], stats: Optional[RunStats] = None,
+                       ctx: Optional[OpenLoopContext] = None,
+                       accounts: int = OPEN_LOOP_ACCOUNTS) -> Dict[str, Any]:
+    """Run every stage of the scenario and return the per-stage results and saturation point"""
+    stats = stats or RUN_STATS
+    ctx = ctx or OpenLoopContext()
+    mix = normalized_mix(scenario['mix'])
+    thresholds = scenario.get('thresholds', {})
+    think_time = scenario.get('think_time', {'distribution': 'constant', 'mean': 0})
+    load = scenario.get('load', 'rps')
+
+    if accounts:
+        async with create_http_session() as http:
+            await prepare(http, ctx, accounts)
+
+    results = []
+    for level, duration in profile_stages(scenario['profile']):
+        logger.info(f"Scenario {scenario.get('name', '')}: stage at {level:g} {load} for {duration:g}s")
+        stage_stats = stats.fresh()
+        if load == 'rps':
+            rates = {operation: level * share for operation, share in mix.items()}
+            await run_open_loop(rates, duration, stats=stage_stats, ctx=ctx, accounts=0)
+        else:
+            await run_users_stage(level, mix, think_time, duration, stage_stats, ctx)
+
+        # Stages run one after another: their durations add up
+        stats.append(stage_stats.snapshot())
+        result = evaluate_stage(level, stage_stats.summary(), stage_stats.elapsed(), thresholds)
+        results.append(result)
+        breaches = f" - {', '.join(result['breaches'])}" if result['breaches'] else ""
+        logger.info(
+            f"Stage {level:g} {load}: {result['throughput']:.1f} req/s, p99 {result['p99_ms']:.1f}ms, "
+            f"error rate {result['error_rate']:.2%}{breaches}"
+        )
+
+    saturation = find_saturation(results)
+    if saturation['saturated']:
+        logger.info(f"Saturation: thresholds first breached at {saturation['first_breach_level']:g} {load} "
+                    f"(last good level: {saturation['last_ok_level']})")
+    else:
+        logger.info("Thresholds were not breached at any stage")
+    return {'stages': results, 'saturation': saturation}
+
+
+def scenario_report(scenario: Dict[str, Any], outcome: Dict[str, Any], stats: RunStats,
+                    metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    report = build_report(stats, dict(metadata or {}, engine='scenario', scenario=scenario['name'],
+                                      load=scenario.get('load', 'rps')))
+    report['scenario'] = scenario
+    report.update(outcome)
+    return report
+
+
+def start_scenario_simulation(path: str = SCENARIO_FILE, report_path: Optional[str] = None,
+                              metadata: Optional[Dict[str, Any]] = None):
+    """Run the scenario in `path`, optionally writing the full report, with `metadata`, to `report_path`"""
+    if not path:
+        raise ValueError("Set SCENARIO_FILE to the scenario to run")
+    scenario = load_scenario(path)
+    outcome = asyncio.run(run_scenario(scenario))
+    if report_path:
+        write_report(scenario_report(scenario, outcome, RUN_STATS, metadata), report_path)
+        logger.info(f"Scenario report written to {report_path}")
+    return outcome
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Run a declarative load scenario')
+    parser.add_argument('scenario', help='Scenario file (.yaml, .yml or .json)')
+    parser.add_argument('--report', default=None, help='Write the JSON report here')
+    args = parser.parse_args(argv)
+    logs.configure('metrics-simulator')
+
+    start_scenario_simulation(args.scenario, args.report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
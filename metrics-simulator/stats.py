@@ -0,0 +1,224 @@
+"""Latency and status bookkeeping for simulator runs.
+
+Every request is recorded into per-operation HDR histograms (microsecond
+resolution, 3 significant digits), so recording costs a lock and an array
+increment and memory stays fixed no matter how long the run is.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Union
+
+from hdrh.histogram import HdrHistogram
+
+Status = Union[int, str]
+
+# Histogram range in microseconds: 1us up to 10 minutes
+LOWEST_TRACKABLE_US = 1
+HIGHEST_TRACKABLE_US = 10 * 60 * 1000 * 1000
+SIGNIFICANT_DIGITS = 3
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Outcomes that are not failures of the request itself
+NON_ERROR_STATUSES = {"skipped"}
+
+
+def new_histogram() -> HdrHistogram:
+    return HdrHistogram(LOWEST_TRACKABLE_US, HIGHEST_TRACKABLE_US, SIGNIFICANT_DIGITS)
+
+
+def is_error(status: Status) -> bool:
+    if isinstance(status, int):
+        return status >= 400
+    return status not in NON_ERROR_STATUSES
+
+
+def _to_us(seconds: float) -> int:
+    return min(max(int(seconds * 1000000), LOWEST_TRACKABLE_US), HIGHEST_TRACKABLE_US)
+
+
+def latency_summary(histogram: HdrHistogram) -> Dict[str, float]:
+    """Percentiles, mean and max of a histogram, in milliseconds"""
+    if histogram.get_total_count() == 0:
+        summary = {f"p{q:g}".replace('.', ''): 0.0 for q in PERCENTILES}
+        summary.update(mean=0.0, max=0.0)
+        return summary
+    summary = {
+        f"p{q:g}".replace('.', ''): histogram.get_value_at_percentile(q) / 1000
+        for q in PERCENTILES
+    }
+    summary['mean'] = histogram.get_mean_value() / 1000
+    summary['max'] = histogram.get_max_value() / 1000
+    return summary
+
+
+class StatsListener:
+    """Receives every event RunStats records; override the ones you need"""
+
+    def offer(self, operation: str):
+        pass
+
+    def record(self, operation: str, latency: float, status: Status):
+        pass
+
+    def count(self, operation: str, status: Status):
+        pass
+
+    def active_users(self, active: int):
+        pass
+
+
+class RunStats:
+    """Per-operation latency histograms and status counts for one run
+
+    `latency` is measured from when a request was meant to be sent and
+    `service_time` from when it actually left, so the two only differ
+    when the simulator fell behind its schedule.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency: Dict[str, HdrHistogram] = defaultdict(new_histogram)
+        self._service_time: Dict[str, HdrHistogram] = defaultdict(new_histogram)
+        self._statuses: Dict[str, Counter] = defaultdict(Counter)
+        self._offered: Counter = Counter()
+        self._listeners: List[StatsListener] = []
+        self.active_users = 0
+        self.peak_active_users = 0
+        self.started = time.monotonic()
+        self.started_at = time.time()
+        self.duration: Optional[float] = None  # Fixed run length, e.g. for stats merged from workers
+
+    def reset_clock(self):
+        """Start measuring throughput from now, e.g. after setup requests"""
+        self.started = time.monotonic()
+        self.started_at = time.time()
+
+    def add_listener(self, listener: StatsListener):
+        self._listeners.append(listener)
+
+    def fresh(self) -> 'RunStats':
+        """Empty stats that report to the same listeners, e.g. for one stage of a run"""
+        stats = RunStats()
+        for listener in self._listeners:
+            stats.add_listener(listener)
+        return stats
+
+    def offer(self, operation: str):
+        """Count a request the simulator meant to send, before it is sent or simulated"""
+        with self._lock:
+            self._offered[operation] += 1
+        for listener in self._listeners:
+            listener.offer(operation)
+
+    def record(self, operation: str, latency: float, status: Status,
+               service_time: Optional[float] = None):
+        latency_us = _to_us(latency)
+        service_us = latency_us if service_time is None else _to_us(service_time)
+        with self._lock:
+            self._latency[operation].record_value(latency_us)
+            self._service_time[operation].record_value(service_us)
+            self._statuses[operation][status] += 1
+        for listener in self._listeners:
+            listener.record(operation, latency, status)
+
+    def count(self, operation: str, status: Status):
+        """Count an outcome that never reached the network, without a latency sample"""
+        with self._lock:
+            self._statuses[operation][status] += 1
+        for listener in self._listeners:
+            listener.count(operation, status)
+
+    def user_started(self):
+        self._change_active_users(1)
+
+    def user_finished(self):
+        self._change_active_users(-1)
+
+    def _change_active_users(self, delta: int):
+        with self._lock:
+            self.active_users += delta
+            self.peak_active_users = max(self.peak_active_users, self.active_users)
+            active = self.active_users
+        for listener in self._listeners:
+            listener.active_users(active)
+
+    def elapsed(self) -> float:
+        if self.duration is not None:
+            return max(self.duration, 1e-9)
+        return max(time.monotonic() - self.started, 1e-9)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything needed to rebuild these stats in another process; see merge()"""
+        with self._lock:
+            return {
+                'latency': {op: h.encode() for op, h in self._latency.items()},
+                'service_time': {op: h.encode() for op, h in self._service_time.items()},
+                'statuses': {op: dict(counts) for op, counts in self._statuses.items()},
+                'offered': dict(self._offered),
+                'peak_active_users': self.peak_active_users,
+                'started_at': self.started_at,
+                'elapsed': self.elapsed(),
+            }
+
+    def merge(self, snapshot: Dict[str, Any]):
+        """Add another run's snapshot into these stats
+
+        Histograms and counters are summed. Runs are assumed to have been
+        concurrent, so the earliest start and the longest duration are kept
+        and peak active users are added up.
+        """
+        with self._lock:
+            self._add_counts(snapshot)
+            self.peak_active_users += snapshot['peak_active_users']
+            self.started_at = min(self.started_at, snapshot['started_at'])
+            self.duration = max(self.duration or 0.0, snapshot['elapsed'])
+
+    def append(self, snapshot: Dict[str, Any]):
+        """Add the snapshot of a run that followed the ones already in these stats, e.g. a scenario stage
+
+        Histograms and counters are summed like in merge(), but durations
+        add up and the peak active users is the highest of any run.
+        """
+        with self._lock:
+            self._add_counts(snapshot)
+            self.peak_active_users = max(self.peak_active_users, snapshot['peak_active_users'])
+            self.started_at = min(self.started_at, snapshot['started_at'])
+            self.duration = (self.duration or 0.0) + snapshot['elapsed']
+
+    def _add_counts(self, snapshot: Dict[str, Any]):
+        for op, encoded in snapshot['latency'].items():
+            self._latency[op].add(HdrHistogram.decode(encoded))
+        for op, encoded in snapshot['service_time'].items():
+            self._service_time[op].add(HdrHistogram.decode(encoded))
+        for op, counts in snapshot['statuses'].items():
+            self._statuses[op].update(counts)
+        self._offered.update(snapshot['offered'])
+
+    def summary(self) -> Dict[str, Dict]:
+        """Throughput, error breakdown and latency percentiles (ms) per operation"""
+        elapsed = self.elapsed()
+        result = {}
+        with self._lock:
+            for op, op_statuses in self._statuses.items():
+                count = sum(op_statuses.values())
+                offered = max(self._offered[op], count)
+                errors = {str(status): n for status, n in op_statuses.items() if is_error(status)}
+                error_count = sum(errors.values())
+                result[op] = {
+                    'offered': offered,
+                    'offered_rate': offered / elapsed,
+                    'count': count,
+                    'throughput': count / elapsed,
+                    'errors': error_count,
+                    'error_rate': error_count / count if count else 0.0,
+                    'statuses': {str(status): n for status, n in op_statuses.items()},
+                    'latency_ms': latency_summary(self._latency[op]),
+                    'service_time_ms': latency_summary(self._service_time[op]),
+                }
+        return result
+
+
+# Stats shared by whichever engine is running in this process
+RUN_STATS = RunStats()
@@ -0,0 +1,35 @@
+import unittest
+from unittest.mock import patch
+import requests
+import app
+from stats import RunStats
+
+
+def response(status):
+    resp = requests.Response()
+    resp.status_code = status
+    return resp
+
+
+class TestRequestOutcomes(unittest.TestCase):
+    def setUp(self):
+        self.stats = RunStats()
+        patch.object(app, 'RUN_STATS', self.stats).start()
+        patch.object(app.HTTP_CLIENT, 'observer', self.stats).start()
+        self.send = patch.object(app.HTTP_CLIENT.session, 'request').start()
+        self.addCleanup(patch.stopall)
+
+    def test_failures_are_counted_not_logged(self):
+        self.send.return_value = response(401)
+        with patch('app.choose_simulated_error', return_value=None), self.assertNoLogs(level='INFO'):
+            self.assertIsNone(app.login_user(1))
+        with patch('app.choose_simulated_error', return_value='timeout'), patch('app.time.sleep'), \
+                self.assertNoLogs(level='INFO'):
+            self.assertIsNone(app.register_user(1))
+        statuses = self.stats.snapshot()['statuses']
+        self.assertEqual(statuses['login'], {401: 1})
+        self.assertEqual(statuses['register_user'], {'simulated_timeout': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
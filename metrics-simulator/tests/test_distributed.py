@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, patch
+import distributed
+from stats import RunStats
+
+
+class ProductsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps([{'id': 1}]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSplitAndMerge(unittest.TestCase):
+    def test_split_open_loop_rates(self):
+        shares = distributed.split_load({'mode': 'open_loop', 'rates': {'get_products': 30}}, 3)
+        self.assertEqual([s['rates'] for s in shares], [{'get_products': 10}] * 3)
+        self.assertEqual([s['index'] for s in shares], [0, 1, 2])
+
+    def test_split_virtual_users(self):
+        shares = distributed.split_load({'mode': 'async', 'num_users': 10}, 3)
+        self.assertEqual([s['num_users'] for s in shares], [4, 3, 3])
+
+    def test_workers_run_their_own_share(self):
+        for mode, runner in (('open_loop', 'run_open_loop'), ('async', 'run_simulation')):
+            share = {'mode': mode, 'rates': {}, 'num_users': 1, 'duration': 0, 'start_at': 0, 'index': 2}
+            with patch(f'distributed.{runner}', new_callable=AsyncMock) as run:
+                distributed.run_share(share)
+            # Seeded runs derive each worker's random choices from its index
+            self.assertEqual(run.await_args.kwargs['share'], 2)
+
+    def test_merge_snapshots(self):
+        first, second = RunStats(), RunStats()
+        for _ in range(90):
+            first.record('get_products', 0.010, 200)
+        for _ in range(10):
+            second.record('get_products', 0.100, 500)
+        second.count('get_products', 'simulated_timeout')
+
+        merged = RunStats()
+        merged.merge(first.snapshot())
+        merged.merge(second.snapshot())
+        summary = merged.summary()['get_products']
+        self.assertEqual(summary['count'], 101)
+        self.assertEqual(summary['statuses'], {'200': 90, '500': 10, 'simulated_timeout': 1})
+        self.assertAlmostEqual(summary['latency_ms']['p50'], 10, delta=0.1)
+        self.assertAlmostEqual(summary['latency_ms']['p99'], 100, delta=0.1)
+
+
+class TestLocalWorkers(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), ProductsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_two_local_workers_merge_into_one_report(self):
+        url = f'http://127.0.0.1:{self.server.server_address[1]}/api/products'
+        env = {'PRODUCT_SERVICE_URL': url, 'USER_SERVICE_URL': url, 'ERROR_PERCENTAGE': '0'}
+        with patch.dict(os.environ, env):
+            stats = distributed.run_coordinator(
+                {'mode': 'open_loop', 'rates': {'get_products': 40}, 'duration': 1.0, 'accounts': 0},
+                workers=2, local_workers=2, listen=('127.0.0.1', 0)
+            )
+        summary = stats.summary()['get_products']
+        self.assertEqual(summary['statuses'], {'200': 40})
+        self.assertAlmostEqual(summary['throughput'], 40, delta=5)
+
+
+    def test_coordinator_gives_up_on_missing_workers(self):
+        with self.assertRaises(TimeoutError):
+            distributed.run_coordinator({'mode': 'open_loop', 'rates': {'get_products': 1}, 'duration': 1.0},
+                                        workers=1, listen=('127.0.0.1', 0), wait_timeout=0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import patch
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import engine
+from stats import RunStats
+
+
+def make_service(connections):
+    app = web.Application()
+
+    async def track(request):
+        connections.add(id(request.transport))
+
+    async def login(request):
+        await track(request)
+        return web.json_response({'access_token': 'token'})
+
+    async def products(request):
+        await track(request)
+        return web.json_response([{'id': 1, 'name': 'Product 1'}])
+
+    async def delete(request):
+        await track(request)
+        return web.Response(status=204)
+
+    app.router.add_post('/api/users/login', login)
+    app.router.add_get('/api/products', products)
+    app.router.add_delete('/api/products/{id}', delete)
+    return app
+
+
+class TestAsyncEngine(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.connections = set()
+        self.server = TestServer(make_service(self.connections))
+        await self.server.start_server()
+        base = str(self.server.make_url(''))
+        self.patchers = [
+            patch('engine.USER_SERVICE_URL', f'{base}/api/users'),
+            patch('engine.PRODUCT_SERVICE_URL', f'{base}/api/products'),
+            patch('engine.choose_simulated_error', return_value=None),
+            patch('engine.RUN_STATS', RunStats()),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    async def asyncTearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        await self.server.close()
+
+    async def test_login_returns_token(self):
+        async with engine.create_http_session() as http:
+            token = await engine.login_user(http, 1)
+        self.assertEqual(token, 'token')
+
+    async def test_connections_are_reused(self):
+        async with engine.create_http_session(pool_size=5) as http:
+            for _ in range(20):
+                self.assertTrue(await engine.get_products(http, 'token'))
+        self.assertLessEqual(len(self.connections), 5)
+        self.assertEqual(engine.RUN_STATS.summary()['get_products']['statuses'], {'200': 20})
+
+    async def test_delete_returns_true_on_204(self):
+        async with engine.create_http_session() as http:
+            self.assertTrue(await engine.delete_product(http, 1, 'token'))
+
+    async def test_simulated_error_skips_network(self):
+        with patch('engine.choose_simulated_error', return_value='invalid_data'):
+            async with engine.create_http_session() as http:
+                self.assertEqual(await engine.get_products(http, 'token'), [])
+        self.assertEqual(len(self.connections), 0)
+        self.assertEqual(engine.RUN_STATS.summary()['get_products']['statuses'], {'simulated_invalid_data': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from prometheus_client import REGISTRY
+from exporter import PrometheusListener
+from stats import RunStats
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class TestPrometheusListener(unittest.TestCase):
+    def setUp(self):
+        self.stats = RunStats()
+        self.stats.add_listener(PrometheusListener())
+
+    def test_offered_and_completed(self):
+        offered = sample('simulator_requests_offered_total', operation='get_product')
+        completed = sample('simulator_requests_completed_total', operation='get_product', status='200')
+        latency_count = sample('simulator_request_duration_seconds_count', operation='get_product')
+
+        self.stats.offer('get_product')
+        self.stats.offer('get_product')
+        self.stats.record('get_product', 0.02, 200)
+
+        self.assertEqual(sample('simulator_requests_offered_total', operation='get_product'), offered + 2)
+        self.assertEqual(sample('simulator_requests_completed_total', operation='get_product', status='200'),
+                         completed + 1)
+        self.assertEqual(sample('simulator_request_duration_seconds_count', operation='get_product'),
+                         latency_count + 1)
+
+    def test_simulated_and_real_errors_are_separated(self):
+        simulated = sample('simulator_errors_total', operation='login', source='simulated', type='timeout')
+        real = sample('simulator_errors_total', operation='login', source='real', type='500')
+
+        self.stats.count('login', 'simulated_timeout')
+        self.stats.record('login', 0.1, 500)
+        self.stats.record('login', 0.1, 200)
+
+        self.assertEqual(sample('simulator_errors_total', operation='login', source='simulated', type='timeout'),
+                         simulated + 1)
+        self.assertEqual(sample('simulator_errors_total', operation='login', source='real', type='500'),
+                         real + 1)
+
+    def test_active_users(self):
+        self.stats.user_started()
+        self.stats.user_started()
+        self.stats.user_finished()
+        self.assertEqual(sample('simulator_active_virtual_users'), 1)
+        self.assertEqual(self.stats.peak_active_users, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
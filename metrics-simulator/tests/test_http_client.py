@@ -0,0 +1,145 @@
+import random
+import unittest
+from unittest.mock import patch
+
+import requests
+
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError, HttpClient, backoff_delay, parse_timeouts
+from stats import RunStats
+
+URL = 'http://product-service:5002/api/products'
+
+
+def response(status):
+    resp = requests.Response()
+    resp.status_code = status
+    return resp
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.stats = RunStats()
+        self.client = HttpClient(timeouts={'login': (1.0, 5.0)}, retries=2, observer=self.stats)
+        self.send = patch.object(self.client.session, 'request').start()
+        self.sleep = patch('http_client.time.sleep').start()
+        self.addCleanup(patch.stopall)
+
+    def test_timeouts_per_operation(self):
+        self.send.return_value = response(200)
+        self.client.request('login', 'POST', URL)
+        self.client.request('get_products', 'GET', URL)
+        self.client.request('get_products', 'GET', URL, timeout=30)
+        timeouts = [call.kwargs['timeout'] for call in self.send.call_args_list]
+        self.assertEqual(timeouts, [(1.0, 5.0), (http_client.HTTP_CONNECT_TIMEOUT, http_client.HTTP_READ_TIMEOUT), 30])
+
+    def test_idempotent_requests_are_retried_with_backoff(self):
+        self.send.side_effect = [requests.exceptions.ConnectionError(), response(503), response(200)]
+        self.assertEqual(self.client.request('get_products', 'GET', URL).status_code, 200)
+        self.assertEqual(self.send.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+        self.assertEqual(self.stats.snapshot()['statuses']['get_products'],
+                         {'ConnectionError': 1, 503: 1, 200: 1})
+
+    def test_posts_and_client_errors_are_not_retried(self):
+        self.send.side_effect = requests.exceptions.ConnectionError()
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            self.client.request('create_product', 'POST', URL)
+        self.send.side_effect = None
+        self.send.return_value = response(404)
+        self.assertEqual(self.client.request('get_products', 'GET', URL).status_code, 404)
+        self.assertEqual(self.send.call_count, 2)
+        self.sleep.assert_not_called()
+
+    def test_open_circuit_fails_fast(self):
+        self.client.retries = 0
+        self.send.return_value = response(500)
+        for _ in range(http_client.CIRCUIT_FAILURE_THRESHOLD):
+            self.client.request('get_products', 'GET', URL)
+        with self.assertRaises(CircuitOpenError):
+            self.client.request('get_products', 'GET', URL)
+        self.assertEqual(self.send.call_count, http_client.CIRCUIT_FAILURE_THRESHOLD)
+        self.assertEqual(self.stats.snapshot()['statuses']['get_products']['CircuitOpenError'], 1)
+        # Other services keep their own circuit
+        self.client.request('login', 'POST', 'http://user-service:5001/api/users/login')
+
+
+    def test_interrupted_trial_frees_the_half_open_circuit(self):
+        breaker = self.client.breaker(URL)
+        breaker.clock = FakeClock()
+        breaker.failure_threshold = 1
+        breaker.failure()
+        breaker.clock.now = breaker.reset_timeout
+        self.send.side_effect = ValueError('Bad response hook')
+        with self.assertRaises(ValueError):
+            self.client.request('get_products', 'GET', URL)
+        self.assertEqual(breaker.state, http_client.HALF_OPEN)
+        self.send.side_effect = None
+        self.send.return_value = response(200)
+        self.assertEqual(self.client.request('get_products', 'GET', URL).status_code, 200)
+        self.assertEqual(breaker.state, http_client.CLOSED)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker('http://test-service:1', failure_threshold=2, reset_timeout=10,
+                                      clock=self.clock)
+
+    def state_metric(self):
+        return http_client.CIRCUIT_STATE.labels('http://test-service:1')._value.get()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.failure()
+        self.breaker.success()
+        self.breaker.failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failure()
+        self.assertEqual(self.breaker.state, http_client.OPEN)
+        self.assertEqual(self.state_metric(), 2)
+        self.assertFalse(self.breaker.allow())
+
+    def test_half_open_lets_one_trial_through(self):
+        self.breaker.failure()
+        self.breaker.failure()
+        self.clock.now = 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.state_metric(), 1)
+        self.assertFalse(self.breaker.allow())
+        # A failed trial opens the circuit for another reset_timeout
+        self.breaker.failure()
+        self.assertFalse(self.breaker.allow())
+        self.clock.now = 20
+        self.assertTrue(self.breaker.allow())
+        self.breaker.success()
+        self.assertEqual(self.breaker.state, http_client.CLOSED)
+        self.assertEqual(self.state_metric(), 0)
+        self.assertTrue(self.breaker.allow())
+
+
+class TestBackoff(unittest.TestCase):
+    def test_jittered_delay_is_capped(self):
+        rand = random.Random(1)
+        delays = [backoff_delay(attempt, 2, 10, rand) for attempt in range(5) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 10 for delay in delays))
+        self.assertLessEqual(max(delays[:100]), 2)
+        self.assertGreater(len(set(delays)), 400)
+
+    def test_parse_timeouts(self):
+        self.assertEqual(parse_timeouts('get_products=1:15, login=2'),
+                         {'get_products': (1.0, 15.0), 'login': (2.0, 2.0)})
+        self.assertEqual(parse_timeouts(''), {})
+        with self.assertRaises(ValueError):
+            parse_timeouts('get_products')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import io
+import json
+import logging
+import queue
+import unittest
+from logging.handlers import QueueListener
+
+import logs
+
+
+def make_record(level=logging.INFO, msg='User %d: Login successful', args=(7,), **extra):
+    record = logging.LogRecord('root', level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class TestLogs(unittest.TestCase):
+    def test_sampled_lines_reach_the_output_as_json(self):
+        handler = logs.NonBlockingHandler(queue.Queue())
+        stream = io.StringIO()
+        output = logging.StreamHandler(stream)
+        output.setFormatter(logs.JsonFormatter('metrics-simulator'))
+        listener = QueueListener(handler.queue, output)
+        listener.start()
+        handler.handle(make_record(**logs.sampled(rate=1, user_id=7)))
+        handler.handle(make_record(**logs.sampled(rate=0, user_id=8)))
+        handler.handle(make_record(logging.ERROR, 'User %d: Login failed', **logs.sampled(rate=0, user_id=9)))
+        listener.stop()
+
+        entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([entry['user_id'] for entry in entries], [7, 9])
+        self.assertEqual(entries[0]['message'], 'User 7: Login successful')
+        self.assertEqual(entries[0]['service'], 'metrics-simulator')
+        self.assertEqual(entries[0]['sample_rate'], 1)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = logs.NonBlockingHandler(queue.Queue(2))
+        for _ in range(5):
+            handler.handle(make_record())
+        self.assertEqual(handler.queue.qsize(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import open_loop
+from stats import RunStats
+
+
+def make_service(delay):
+    app = web.Application()
+
+    async def products(request):
+        await asyncio.sleep(delay)
+        return web.json_response([{'id': 1}])
+
+    async def create(request):
+        return web.Response(status=201, text='Created')
+
+    app.router.add_get('/api/products', products)
+    app.router.add_post('/api/products', create)
+    return app
+
+
+class TestOpenLoop(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = None
+        self.patchers = []
+
+    async def start_service(self, delay):
+        self.server = TestServer(make_service(delay))
+        await self.server.start_server()
+        base = str(self.server.make_url(''))
+        self.patchers = [
+            patch('open_loop.USER_SERVICE_URL', f'{base}/api/users'),
+            patch('open_loop.PRODUCT_SERVICE_URL', f'{base}/api/products'),
+            patch('open_loop.choose_simulated_error', return_value=None),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+
+    async def asyncTearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        if self.server:
+            await self.server.close()
+
+    def test_parse_rates(self):
+        self.assertEqual(open_loop.parse_rates('get_products=20, login=2,delete_product=0'),
+                         {'get_products': 20.0, 'login': 2.0})
+        with self.assertRaises(ValueError):
+            open_loop.parse_rates('checkout=5')
+
+    def test_workers_register_disjoint_users(self):
+        def usernames(share):
+            ctx = open_loop.OpenLoopContext(share)
+            return {open_loop._register(ctx)[3]['json']['username'] for _ in range(1000)}
+        self.assertFalse(usernames(0) & usernames(1))
+
+    def test_only_created_products_are_deleted(self):
+        ctx = open_loop.OpenLoopContext()
+        ctx.product_ids = [1, 2, 3]  # Listed by prepare(), not ours to delete
+        self.assertIsNone(open_loop._delete_product(ctx))
+        ctx.product_ids.append(10)
+        ctx.created_ids.append(10)
+        self.assertTrue(open_loop._delete_product(ctx)[1].endswith('/10'))
+        self.assertEqual((ctx.product_ids, ctx.created_ids), ([1, 2, 3], []))
+
+    async def test_unreadable_created_product_is_still_recorded(self):
+        await self.start_service(delay=0)
+        stats, ctx = RunStats(), open_loop.OpenLoopContext()
+        loop = asyncio.get_running_loop()
+        async with open_loop.create_http_session(1) as http:
+            await open_loop.fire(http, ctx, 'create_product', open_loop._create_product(ctx), loop.time(),
+                                 stats, asyncio.Semaphore(1))
+        self.assertEqual(stats.summary()['create_product']['statuses'], {'JSONDecodeError': 1})
+        self.assertEqual(ctx.created_ids, [])
+
+    async def test_offered_load_is_independent_of_response_time(self):
+        await self.start_service(delay=0.05)
+        stats = await open_loop.run_open_loop({"get_products": 40}, duration=0.5, accounts=0,
+                                              stats=RunStats())
+        summary = stats.summary()['get_products']
+        # A closed loop with one connection would manage ~10 requests in 0.5s
+        self.assertEqual(summary['count'], 20)
+        self.assertEqual(summary['statuses'], {'200': 20})
+
+    async def test_latency_includes_time_spent_behind_schedule(self):
+        await self.start_service(delay=0.05)
+        stats = await open_loop.run_open_loop({'get_products': 40}, duration=0.5, accounts=0,
+                                              pool_size=1, stats=RunStats())
+        summary = stats.summary()['get_products']
+        # Requests queue behind a single connection, so latency from the intended
+        # send time must grow well past the service time of a single request
+        self.assertGreater(summary['latency_ms']['p99'], 500)
+        self.assertLess(summary['service_time_ms']['p99'], summary['latency_ms']['p99'])
+
+
+if __name__ == '__main__':
+    unittest.main()
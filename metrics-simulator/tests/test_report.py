@@ -0,0 +1,73 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from stats import RunStats
+from report import build_report, write_report, compare_reports
+
+
+def make_stats(latency=0.010, errors=0):
+    stats = RunStats()
+    for _ in range(100):
+        stats.record('get_products', latency, 200)
+    for _ in range(errors):
+        stats.record('get_products', latency, 500)
+    stats.count('get_products', 'simulated_timeout')
+    stats.count('get_product', 'skipped')
+    stats.duration = 10.0
+    return stats
+
+
+class TestRunStats(unittest.TestCase):
+    def test_summary_percentiles_and_errors(self):
+        stats = RunStats()
+        for ms in range(1, 1001):
+            stats.record('login', ms / 1000, 200)
+        stats.record('login', 0.5, 'ClientConnectorError')
+        stats.count('login', 'simulated_rate_limit')
+
+        summary = stats.summary()['login']
+        self.assertEqual(summary['count'], 1002)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(summary['statuses'], {'200': 1000, 'ClientConnectorError': 1, 'simulated_rate_limit': 1})
+        self.assertAlmostEqual(summary['latency_ms']['p50'], 500, delta=1)
+        self.assertAlmostEqual(summary['latency_ms']['p99'], 990, delta=1)
+        self.assertAlmostEqual(summary['latency_ms']['p999'], 999, delta=1)
+        self.assertAlmostEqual(summary['latency_ms']['max'], 1000, delta=1)
+
+    def test_skipped_is_not_an_error(self):
+        summary = make_stats().summary()
+        self.assertEqual(summary['get_product']['errors'], 0)
+        self.assertEqual(summary['get_products']['errors'], 1)
+
+
+class TestReport(unittest.TestCase):
+    def test_write_json_and_csv(self):
+        report = build_report(make_stats(), {'engine': 'async'})
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, 'run.json')
+            csv_path = os.path.join(tmp, 'run.csv')
+            write_report(report, json_path)
+            write_report(report, csv_path)
+
+            with open(json_path) as f:
+                loaded = json.load(f)
+            self.assertEqual(loaded['run']['engine'], 'async')
+            self.assertEqual(loaded['totals']['count'], 102)
+            with open(csv_path) as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual([row['operation'] for row in rows], ['get_product', 'get_products'])
+            self.assertIn('latency_p999_ms', rows[0])
+
+    def test_compare_reports(self):
+        baseline = build_report(make_stats(latency=0.010))
+        self.assertEqual(compare_reports(baseline, build_report(make_stats(latency=0.0105))), [])
+
+        regressions = compare_reports(baseline, build_report(make_stats(latency=0.020, errors=10)))
+        self.assertTrue(any('latency p99' in r for r in regressions))
+        self.assertTrue(any('error rate' in r for r in regressions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import scenario
+from stats import RunStats
+
+
+class TestScenarioDefinition(unittest.TestCase):
+    def test_profiles(self):
+        self.assertEqual(scenario.profile_stages({'type': 'step', 'start': 10, 'step': 5, 'steps': 3,
+                                                  'step_duration': 30}),
+                         [(10, 30), (15, 30), (20, 30)])
+        self.assertEqual(scenario.profile_stages({'type': 'spike', 'base': 10, 'base_duration': 60,
+                                                  'peak': 100, 'spike_duration': 5}),
+                         [(10, 60), (100, 5), (10, 60)])
+        self.assertEqual(scenario.profile_stages({'type': 'soak', 'level': 10, 'duration': 600}), [(10, 600)])
+        with self.assertRaises(ValueError):
+            scenario.profile_stages({'type': 'step', 'start': 10})
+
+    def test_validation(self):
+        valid = {'mix': {'get_products': 1}, 'profile': {'type': 'soak', 'level': 1, 'duration': 1}}
+        scenario.validate_scenario(valid)
+        with self.assertRaises(ValueError):
+            scenario.validate_scenario(dict(valid, mix={'checkout': 1}))
+        with self.assertRaises(ValueError):
+            scenario.validate_scenario(dict(valid, think_time={'distribution': 'pareto'}))
+
+    def test_bundled_scenarios_load(self):
+        directory = os.path.join(os.path.dirname(__file__), '..', 'scenarios')
+        for name in os.listdir(directory):
+            self.assertTrue(scenario.load_scenario(os.path.join(directory, name))['mix'])
+
+    def test_think_time_means(self):
+        rng = random.Random(1)
+        for distribution in ('constant', 'uniform', 'exponential', 'lognormal'):
+            samples = [scenario.sample_think_time({'distribution': distribution, 'mean': 2.0}, rng)
+                       for _ in range(20000)]
+            self.assertAlmostEqual(sum(samples) / len(samples), 2.0, delta=0.1, msg=distribution)
+
+    def test_find_saturation(self):
+        stages = [scenario.evaluate_stage(level, {'op': {'count': 100, 'errors': errors,
+                                                         'latency_ms': {'p99': p99}}}, 10, {'p99_ms': 100})
+                  for level, errors, p99 in [(10, 0, 50), (20, 0, 90), (30, 0, 150), (40, 0, 50)]]
+        saturation = scenario.find_saturation(stages)
+        self.assertTrue(saturation['saturated'])
+        self.assertEqual(saturation['last_ok_level'], 20)
+        self.assertEqual(saturation['first_breach_level'], 30)
+
+
+    def test_simulation_writes_the_report_with_its_saturation(self):
+        definition = {'name': 'test', 'mix': {'get_products': 1}}
+        outcome = {'stages': [], 'saturation': {'last_ok_level': 10, 'first_breach_level': 40}}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            with patch('scenario.load_scenario', return_value=definition), \
+                    patch('scenario.run_scenario', new_callable=AsyncMock, return_value=outcome):
+                scenario.start_scenario_simulation('test.yaml', report_path=path, metadata={'seed': '42'})
+            with open(path) as f:
+                report = json.load(f)
+        self.assertEqual(report['saturation'], outcome['saturation'])
+        self.assertEqual(report['run']['seed'], '42')
+        self.assertEqual(report['run']['engine'], 'scenario')
+
+
+class TestScenarioRun(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        app = web.Application()
+        self.served = 0
+
+        async def products(request):
+            # Falls over after the first handful of requests
+            self.served += 1
+            if self.served > 6:
+                return web.Response(status=503)
+            return web.json_response([])
+
+        app.router.add_get('/api/products', products)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        url = str(self.server.make_url('/api/products'))
+        self.patchers = [patch('open_loop.PRODUCT_SERVICE_URL', url),
+                         patch('open_loop.choose_simulated_error', return_value=None)]
+        for patcher in self.patchers:
+            patcher.start()
+
+    async def asyncTearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        await self.server.close()
+
+    async def test_step_ramp_reports_saturation(self):
+        definition = {'name': 'test', 'mix': {'get_products': 1},
+                      'profile': {'type': 'step', 'start': 10, 'step': 30, 'steps': 2, 'step_duration': 0.5},
+                      'thresholds': {'error_rate': 0.1}}
+        stats = RunStats()
+        outcome = await scenario.run_scenario(definition, stats=stats, accounts=0)
+
+        self.assertEqual([stage['level'] for stage in outcome['stages']], [10, 40])
+        self.assertEqual(outcome['saturation']['last_ok_level'], 10)
+        self.assertEqual(outcome['saturation']['first_breach_level'], 40)
+        self.assertEqual(stats.summary()['get_products']['count'], 25)
+        # The stages ran one after the other: 25 requests over both 0.5s stages
+        self.assertAlmostEqual(stats.elapsed(), 1.0, delta=0.15)
+        self.assertAlmostEqual(stats.summary()['get_products']['throughput'], 25, delta=4)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            scenario.write_report(scenario.scenario_report(definition, outcome, stats), path)
+            self.assertTrue(os.path.getsize(path) > 0)
+
+    async def test_user_stages_keep_the_highest_peak(self):
+        definition = {'name': 'test', 'load': 'users', 'mix': {'get_products': 1},
+                      'think_time': {'distribution': 'constant', 'mean': 0.05},
+                      'profile': {'type': 'step', 'start': 2, 'step': 1, 'steps': 2, 'step_duration': 0.3}}
+        stats = RunStats()
+        await scenario.run_scenario(definition, stats=stats, accounts=0)
+        self.assertEqual(stats.peak_active_users, 3)
+        self.assertAlmostEqual(stats.elapsed(), 0.6, delta=0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
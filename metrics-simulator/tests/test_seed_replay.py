@@ -0,0 +1,115 @@
+import contextvars
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import open_loop
+import recorder
+import replay
+import workload
+from stats import RunStats
+
+
+def payloads(scope, count=5):
+    def draw():
+        workload.use_rng(workload.make_rng(*scope))
+        return [workload.product_payload() for _ in range(count)]
+    return contextvars.copy_context().run(draw)
+
+
+class TestSeed(unittest.TestCase):
+    def test_same_seed_and_scope_repeat_the_same_choices(self):
+        with patch('workload.SIMULATOR_SEED', '42'):
+            self.assertEqual(payloads(('async-user', 3)), payloads(('async-user', 3)))
+            self.assertNotEqual(payloads(('async-user', 3)), payloads(('async-user', 4)))
+        with patch('workload.SIMULATOR_SEED', '43'):
+            other_seed = payloads(('async-user', 3))
+        with patch('workload.SIMULATOR_SEED', '42'):
+            self.assertNotEqual(payloads(('async-user', 3)), other_seed)
+
+    def test_plan_request_is_reproducible(self):
+        def plan():
+            workload.use_rng(workload.make_rng('open-loop', 0, 'update_product'))
+            ctx = open_loop.OpenLoopContext()
+            ctx.tokens = ['a', 'b', 'c']
+            ctx.product_ids = list(range(1, 50))
+            return [open_loop.plan_request(ctx, 'update_product') for _ in range(20)]
+
+        with patch('workload.SIMULATOR_SEED', '7'):
+            self.assertEqual(contextvars.copy_context().run(plan), contextvars.copy_context().run(plan))
+
+
+class TestRecordReplay(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.received = []
+        app = web.Application()
+
+        async def handle(request):
+            self.received.append((request.method, request.path, request.headers.get('Authorization')))
+            if request.path.endswith('/login'):
+                return web.json_response({'access_token': 'token'})
+            if request.method == 'GET' and request.path == '/api/products':
+                return web.json_response([{'id': 7}])
+            return web.json_response({'id': 7})
+
+        app.router.add_route('*', '/{tail:.*}', handle)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        base = str(self.server.make_url(''))
+        services = {'user': f'{base}/api/users', 'product': f'{base}/api/products'}
+        self.patchers = [
+            patch.dict('recorder.SERVICES', services),
+            patch('open_loop.USER_SERVICE_URL', services['user']),
+            patch('open_loop.PRODUCT_SERVICE_URL', services['product']),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'run.jsonl.gz')
+
+    async def asyncTearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        await self.server.close()
+        self.tmp.cleanup()
+
+    def record(self):
+        products = recorder.SERVICES['product']
+        rec = recorder.RequestRecorder(self.path, {'engine': 'test'})
+        rec.record('get_products', 'GET', products, {'headers': {'Authorization': 'Bearer x'}},
+                   at=rec.started)
+        rec.record('update_product', 'PUT', f'{products}/7', {'json': {'price': 1.5}},
+                   at=rec.started + 0.5)
+        rec.record('get_product', 'GET', f'{products}/7', {}, at=rec.started + 1.0)
+        rec.close()
+
+    async def test_recording_round_trip(self):
+        self.record()
+        header, entries = recorder.read_recording(self.path)
+        self.assertEqual(header['engine'], 'test')
+        self.assertEqual(list(entries), [
+            [0.0, 'get_products', 'GET', 'product', '', None, True],
+            [0.5, 'update_product', 'PUT', 'product', '/7', {'price': 1.5}, False],
+            [1.0, 'get_product', 'GET', 'product', '/7', None, False],
+        ])
+
+    async def test_replay_at_higher_speed(self):
+        self.record()
+        start = time.monotonic()
+        header, stats = await replay.replay(self.path, speed=4.0, stats=RunStats(), accounts=1)
+        self.assertLess(time.monotonic() - start, 0.9)
+
+        summary = stats.summary()
+        self.assertEqual({op: s['count'] for op, s in summary.items()},
+                         {'get_products': 1, 'update_product': 1, 'get_product': 1})
+        replayed = [r for r in self.received if r[1].startswith('/api/products')][1:]
+        self.assertEqual(replayed, [('GET', '/api/products', 'Bearer token'),
+                                    ('PUT', '/api/products/7', None),
+                                    ('GET', '/api/products/7', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
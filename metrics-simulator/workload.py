@@ -0,0 +1,143 @@
+import random
+import os
+from contextvars import ContextVar
+from typing import Dict, Optional, Any
+
+from http_client import backoff_delay
+
+# Service URLs
+USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', "http://user-service:5001/api/users")
+PRODUCT_SERVICE_URL = os.getenv('PRODUCT_SERVICE_URL', "http://product-service:5002/api/products")
+
+# Load configuration
+MAX_USERS = int(os.getenv('MAX_USERS', '100'))  # Maximum number of concurrent users at 100% load
+LOAD_PERCENTAGE = int(os.getenv('LOAD_PERCENTAGE', '50'))  # Default to 50% load
+ERROR_PERCENTAGE = int(os.getenv('ERROR_PERCENTAGE', '2'))  # Default to 2% error rate
+
+# Calculate actual values
+NUM_USERS = int((MAX_USERS * LOAD_PERCENTAGE) / 100)
+ERROR_RATE = ERROR_PERCENTAGE / 100  # Convert percentage to decimal
+
+# Seed for reproducible runs; unset means a different random run every time
+SIMULATOR_SEED = os.getenv('SIMULATOR_SEED', '')
+
+
+def make_rng(*scope: Any) -> random.Random:
+    """Random generator for one independent stream of decisions
+
+    With SIMULATOR_SEED set, the stream is derived from the seed and
+    `scope` (e.g. ("user", 7)), so each virtual user or schedule makes the
+    same choices in every run no matter how its requests interleave with
+    everyone else's.
+    """
+    if not SIMULATOR_SEED:
+        return random.Random()
+    return random.Random(':'.join(str(part) for part in (SIMULATOR_SEED,) + scope))
+
+
+_default_rng = make_rng('default')
+_current_rng: ContextVar[random.Random] = ContextVar('simulator_rng')
+
+
+def rng() -> random.Random:
+    """The generator of the current virtual user or schedule (thread or asyncio task)"""
+    return _current_rng.get(_default_rng)
+
+
+def use_rng(generator: random.Random):
+    """Bind `generator` to the current thread or asyncio task for rng()"""
+    _current_rng.set(generator)
+
+
+PRODUCT_CATEGORIES = ["Electronics", "Clothing", "Books", "Home", "Sports", "Toys"]
+
+# Sample data
+SAMPLE_USERS = [
+    {"username": f"user{i}", "email": f"user{i}@example.com", "password": "password123"}
+    for i in range(1, 101)  # Increased to 100 users
+]
+
+_sample_rng = make_rng('sample-products')
+SAMPLE_PRODUCTS = [
+    {
+        "name": f"Product {i}",
+        "description": f"Description for product {i}",
+        "price": round(_sample_rng.uniform(10.0, 1000.0), 2),
+        "stock": _sample_rng.randint(0, 100),
+        "category": _sample_rng.choice(PRODUCT_CATEGORIES)
+    }
+    for i in range(1, 51)  # Increased to 50 products
+]
+
+ERROR_SCENARIOS = [
+    (0.4, "rate_limit"),      # 40% of errors are rate limits
+    (0.3, "invalid_data"),    # 30% of errors are invalid data
+    (0.2, "server_error"),    # 20% of errors are server errors
+    (0.1, "timeout")          # 10% of errors are timeouts
+]
+
+# Time (in seconds) each simulated error type holds the virtual user
+SIMULATED_ERROR_DELAYS = {
+    "rate_limit": 0.1,    # Simulate rate limiting
+    "invalid_data": 0.0,
+    "server_error": 0.2,  # Simulate server processing
+    "timeout": 2.0        # Simulate timeout
+}
+
+
+def choose_simulated_error() -> Optional[str]:
+    """Pick a simulated error type for the next call, or None to send it for real"""
+    # Only simulate errors if random number is below the error rate
+    if rng().random() > ERROR_RATE:
+        return None
+
+    for probability, error_type in ERROR_SCENARIOS:
+        if rng().random() < probability:
+            return error_type
+    return None
+
+
+# Waits between failed session attempts: the n-th retry waits a random 0 to
+# min(SESSION_RETRY_MAX, SESSION_RETRY_BASE * 2**(n-1)) seconds, so users that
+# failed together do not all come back at the same moment
+SESSION_RETRY_BASE = 2.0
+SESSION_RETRY_MAX = 10.0
+
+
+def session_retry_delay(retry_count: int) -> float:
+    """Seconds a virtual user waits before retrying its session after `retry_count` failures"""
+    return backoff_delay(max(retry_count - 1, 0), SESSION_RETRY_BASE, SESSION_RETRY_MAX, rng())
+
+
+def user_payload(user_id: int) -> Dict[str, Any]:
+    return {
+        "username": f"user{user_id}",
+        "email": f"user{user_id}@example.com",
+        "password": f"password{user_id}"
+    }
+
+
+def login_payload(user_id: int) -> Dict[str, Any]:
+    return {
+        "username": f"user{user_id}",
+        "password": f"password{user_id}"
+    }
+
+
+def product_payload() -> Dict[str, Any]:
+    return {
+        "name": f"Product {rng().randint(1, 1000)}",
+        "description": f"Description for product {rng().randint(1, 1000)}",
+        "price": round(rng().uniform(10.0, 1000.0), 2),
+        "stock": rng().randint(0, 100),
+        "category": rng().choice(["Electronics", "Clothing", "Books", "Home", "Sports"])
+    }
+
+
+def product_update_payload(product_id: int) -> Dict[str, Any]:
+    return {
+        "name": f"Updated Product {product_id}",
+        "price": round(rng().uniform(10.0, 1000.0), 2),
+        "stock": rng().randint(0, 100),
+        "description": f"Updated description for product {product_id}"
+    }
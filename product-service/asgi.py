@@ -0,0 +1,9 @@
+"""ASGI entry point: SERVER_MODE=asgi gunicorn -c gunicorn.conf.py
+
+Product reads run asynchronously (see async_reads.py), every other route is
+the Flask app from wsgi.py, which also creates the tables before forking.
+"""
+from async_reads import create_asgi_app
+from wsgi import app as flask_app
+
+app = create_asgi_app(flask_app)
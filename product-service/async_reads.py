@@ -0,0 +1,300 @@
+"""Async product reads for the ASGI serving mode (SERVER_MODE=asgi, see asgi.py).
+
+GET /api/products and GET /api/products/<id> run as coroutines on asyncio
+drivers: SQLAlchemy's asyncio engine (asyncpg for Postgres, aiosqlite for
+SQLite) and redis.asyncio. While a read waits for Postgres or Redis the worker
+serves other requests on the same thread, so one process holds thousands of
+in-flight reads instead of one per WSGI thread.
+
+The reads use the same Product model, to_dict() serialization and
+"product:<id>" cache entries as the Flask views, so both modes can serve
+from the same cache side by side. With CACHE_WRITE_THROUGH on, cache fills
+check the product's version like write_through.fill() does. Filtered listings
+(see catalog.py) are served here too: the page of ids comes from the Flask
+app's catalog index, queried on a thread since the index is synchronous, and
+the products from the cache and the async engine; without the index the page
+is one async SQL query. Every other route (writes, /metrics, the probes, the
+profiler) is passed to the Flask app, which runs in a thread pool.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from functools import wraps
+
+from a2wsgi import WSGIMiddleware
+from prometheus_client import Histogram
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+from sqlalchemy import select, text
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import QueuePool
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+from app import CORS_ORIGINS, Product, decode_cached, product_filters, warm_up
+from catalog import QUERY_ARGS, parse_query
+import logs
+import pools
+import readiness
+from write_through import CACHE_TTL, FILLS_SKIPPED
+
+logger = logging.getLogger(__name__)
+
+WSGI_THREADS = int(os.getenv('WEB_THREADS', '4'))  # Threads running the Flask routes per worker
+
+# asyncio driver for each database backend
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+REQUEST_SECONDS = Histogram(
+    'asgi_http_request_duration_seconds',
+    'Latency of the async product reads',
+    ['method', 'endpoint', 'status']
+)
+
+
+def async_database_url(url):
+    """The same database, reached through its asyncio driver"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def create_async_db_engine(url):
+    url = async_database_url(url)
+    options = {}
+    # Same pool sizing as the Flask side, see pools.py
+    if url.get_backend_name() != 'sqlite':
+        options.update(pool_size=pools.DB_POOL_SIZE, max_overflow=pools.DB_MAX_OVERFLOW,
+                       pool_timeout=pools.DB_POOL_TIMEOUT, pool_recycle=pools.DB_POOL_RECYCLE,
+                       pool_pre_ping=True)
+    return create_async_engine(url, **options)
+
+
+def async_redis(url):
+    pool = aioredis.BlockingConnectionPool.from_url(url, max_connections=pools.REDIS_MAX_CONNECTIONS,
+                                                    timeout=pools.REDIS_POOL_TIMEOUT)
+    return aioredis.Redis(connection_pool=pool)
+
+
+def _respond(request, body, status=200):
+    response = JSONResponse(body, status_code=status)
+    # Flask-CORS answers the preflight requests; simple GETs only need the origin echoed back
+    origin = request.headers.get('origin')
+    if origin in CORS_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Vary'] = 'Origin'
+    return response
+
+
+def _timed(endpoint):
+    def decorator(view):
+        @wraps(view)
+        async def timed_view(request):
+            start = time.perf_counter()
+            response = await view(request)
+            REQUEST_SECONDS.labels(request.method, endpoint, str(response.status_code)).observe(
+                time.perf_counter() - start)
+            return response
+        return timed_view
+    return decorator
+
+
+async def _fill(cache, product_dict, version):
+    """write_through.fill() of one product: cache it unless a newer version was written since `version`"""
+    key = f"product:{product_dict['id']}"
+    async with cache.pipeline() as pipe:
+        try:
+            await pipe.watch(f'{key}:version')
+            if await pipe.get(f'{key}:version') != version:
+                FILLS_SKIPPED.inc()
+                return
+            pipe.multi()
+            pipe.setex(key, CACHE_TTL, str(product_dict))
+            await pipe.execute()
+        except WatchError:
+            FILLS_SKIPPED.inc()
+
+
+async def _fill_products(cache, products, versions):
+    """write_through.fill() of a page of products, on the async Redis client"""
+    keys = [f"product:{product['id']}:version" for product in products]
+    if not keys:
+        return
+    async with cache.pipeline() as pipe:
+        try:
+            await pipe.watch(*keys)
+            current = await pipe.mget(keys)
+            fresh = [product for product, version in zip(products, current)
+                     if version == versions.get(product['id'])]
+            pipe.multi()
+            for product in fresh:
+                pipe.setex(f"product:{product['id']}", CACHE_TTL, str(product))
+            await pipe.execute()
+        except WatchError:
+            fresh = []
+    FILLS_SKIPPED.inc(len(products) - len(fresh))
+
+
+async def products_by_id(request, ids):
+    """app.products_by_id(): the given products in order, from the product:<id> cache where possible"""
+    if not ids:
+        return []
+    cache = request.app.state.redis
+    found = {product_id: decode_cached(cached)
+             for product_id, cached in zip(ids, await cache.mget([f'product:{i}' for i in ids])) if cached}
+    missing = [product_id for product_id in ids if product_id not in found]
+    if missing:
+        write_through = request.app.state.write_through
+        if write_through:
+            versions = dict(zip(missing, await cache.mget([f'product:{i}:version' for i in missing])))
+        async with AsyncSession(request.app.state.engine) as session:
+            result = await session.execute(select(Product).where(Product.id.in_(missing)))
+            loaded = [product.to_dict() for product in result.scalars()]
+        found.update((product['id'], product) for product in loaded)
+        if write_through:
+            await _fill_products(cache, loaded, versions)
+        elif loaded:
+            async with cache.pipeline(transaction=False) as pipe:
+                for product in loaded:
+                    pipe.setex(f"product:{product['id']}", 3600, str(product))
+                await pipe.execute()
+    return [found[product_id] for product_id in ids if product_id in found]
+
+
+def _query_index(flask_app, options):
+    """One page of ids from the Flask app's catalog index, or None when it's off or unavailable"""
+    index = flask_app.extensions.get('catalog')
+    if index is None:
+        return None
+    # The index loads its rows through the Flask app's session
+    with flask_app.app_context():
+        try:
+            return index.query(**options)
+        except Exception as e:
+            logger.warning(f"Catalog index unavailable, querying the database: {str(e)}")
+            return None
+
+
+@_timed('async.query_products')
+async def query_products(request):
+    """app.query_products(): one page of filtered, sorted products"""
+    try:
+        options = parse_query(request.query_params)
+    except ValueError as e:
+        return _respond(request, {'error': str(e)}, 400)
+    try:
+        ids = await asyncio.to_thread(_query_index, request.app.state.flask_app, options)
+        if ids is not None:
+            return _respond(request, await products_by_id(request, ids))
+        limit, offset = options.pop('limit'), options.pop('offset')
+        filters, order = product_filters(**options)
+        async with AsyncSession(request.app.state.engine) as session:
+            result = await session.execute(
+                select(Product).where(*filters).order_by(*order).offset(offset).limit(limit))
+            return _respond(request, [product.to_dict() for product in result.scalars()])
+    except Exception as e:
+        logger.error(f"Error querying products: {str(e)}")
+        return _respond(request, [], 500)
+
+
+@_timed('async.get_products')
+async def get_products(request):
+    try:
+        async with AsyncSession(request.app.state.engine) as session:
+            products = (await session.execute(select(Product))).scalars().all()
+        logger.info(f"Found {len(products)} products", extra=logs.sampled(count=len(products)))
+        return _respond(request, [product.to_dict() for product in products])
+    except Exception as e:
+        logger.error(f"Error fetching products: {str(e)}")
+        return _respond(request, [], 500)
+
+
+@_timed('async.get_product')
+async def get_product(request):
+    product_id = request.path_params['product_id']
+    cache = request.app.state.redis
+    try:
+        # Try to get from cache first
+        cached_product = await cache.get(f'product:{product_id}')
+        if cached_product:
+            return _respond(request, decode_cached(cached_product))
+
+        write_through = request.app.state.write_through
+        if write_through:
+            version = await cache.get(f'product:{product_id}:version')
+        async with AsyncSession(request.app.state.engine) as session:
+            product = await session.get(Product, product_id)
+        if product is None:
+            return _respond(request, {'error': 'Product not found'}, 404)
+        product_dict = product.to_dict()
+
+        # Cache the product
+        if write_through:
+            await _fill(cache, product_dict, version)
+        else:
+            await cache.setex(f'product:{product_id}', 3600, str(product_dict))
+        return _respond(request, product_dict)
+    except Exception as e:
+        logger.error(f"Error fetching product {product_id}: {str(e)}", extra={'product_id': product_id})
+        return _respond(request, {'error': 'Product not found'}, 404)
+
+
+async def list_products(request):
+    """GET /api/products, filtered (see catalog.py) or not, like the Flask view"""
+    if any(arg in request.query_params for arg in QUERY_ARGS):
+        return await query_products(request)
+    return await get_products(request)
+
+
+async def _fill_pool(engine):
+    pool = engine.sync_engine.pool
+    connections = [await engine.connect() for _ in range(pool.size() if isinstance(pool, QueuePool) else 1)]
+    for connection in connections:
+        await connection.close()
+
+
+async def warm_up_async(app, flask_app):
+    """Warm the async pools, then the Flask side, and mark the app ready; retried until it succeeds"""
+    for delay in readiness.backoff_delays(None, readiness.DB_WAIT_BASE_DELAY, readiness.DB_WAIT_MAX_DELAY):
+        try:
+            async with app.state.engine.connect() as connection:
+                await connection.execute(text('SELECT 1'))
+            await _fill_pool(app.state.engine)
+            await app.state.redis.ping()
+            await asyncio.to_thread(warm_up, flask_app)
+            readiness.mark_ready(flask_app)
+            return
+        except Exception as e:
+            logger.warning(f"Async warm-up failed, retrying in {delay:.2f}s: {str(e)}")
+            await asyncio.sleep(delay)
+
+
+def create_asgi_app(flask_app, redis_client=None):
+    """Serve the product reads asynchronously and everything else through `flask_app`
+
+    The database and Redis settings come from the Flask app's config. The
+    connections are opened per worker when the ASGI lifespan starts, and
+    /readyz answers 503 until warm_up_async() is done.
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.engine = create_async_db_engine(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+        app.state.redis = redis_client or async_redis(flask_app.config['REDIS_URL'])
+        app.state.write_through = flask_app.config['CACHE_WRITE_THROUGH']
+        app.state.flask_app = flask_app
+        warming = asyncio.create_task(warm_up_async(app, flask_app))
+        try:
+            yield
+        finally:
+            warming.cancel()
+            await app.state.redis.connection_pool.disconnect()
+            await app.state.engine.dispose()
+
+    return Starlette(routes=[
+        Route('/api/products', list_products, methods=['GET']),
+        Route('/api/products/{product_id:int}', get_product, methods=['GET']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ], lifespan=lifespan)
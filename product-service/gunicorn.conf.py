@@ -0,0 +1,55 @@
+"""Gunicorn settings for running product-service in production.
+
+    gunicorn -c gunicorn.conf.py                    # SERVER_MODE=wsgi: wsgi:app on threaded workers
+    SERVER_MODE=asgi gunicorn -c gunicorn.conf.py   # asgi:app on uvicorn workers, async product reads
+
+Every setting can be overridden from the environment. Each worker process has
+its own database and Redis pools (see pools.py), so size DB_POOL_SIZE to about
+WEB_THREADS.
+"""
+import multiprocessing
+import os
+import shutil
+
+# "wsgi" serves everything from Flask; "asgi" serves the product reads asynchronously (see async_reads.py)
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+wsgi_app = 'asgi:app' if SERVER_MODE == 'asgi' else 'wsgi:app'
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5002')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() + 1)))
+threads = int(os.getenv('WEB_THREADS', '4'))
+if SERVER_MODE == 'asgi':
+    # One event loop per worker; WEB_THREADS only sizes the thread pool running the Flask routes
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+# Restart workers after this many requests (plus jitter) to contain slow leaks, 0 disables it
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '0'))
+# Import the app once before forking; wsgi.py closes the connections it opened
+preload_app = True
+
+# Workers write their metrics to files here so /metrics can add up all of them.
+# This has to be set before the app (and prometheus_client) is imported.
+multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/product-service-metrics')
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # /readyz answers 503 until this worker's pools and the hot products are warm.
+    # ASGI workers warm up in their lifespan instead, once the event loop runs.
+    if SERVER_MODE == 'asgi':
+        return
+    import readiness
+    from app import warm_up
+    from wsgi import app
+    readiness.start_warm_up(app, warm_up)
@@ -0,0 +1,96 @@
+"""On-demand sampling profiler for the running service.
+
+GET /admin/profile?seconds=10 samples the stack of every thread in this
+process every `interval` seconds (default 0.01) for `seconds` seconds and
+returns the samples as collapsed stacks, one line per distinct stack:
+
+    run (threading.py:982);handle (gthread.py:281);get_product (app.py:287) 42
+
+That is the input format of flamegraph.pl and speedscope:
+
+    curl -H "X-Admin-Token: $ADMIN_TOKEN" "http://localhost:5002/admin/profile?seconds=20" > out.folded
+    flamegraph.pl out.folded > flamegraph.svg
+
+Sampling only reads sys._current_frames() from the request's own thread,
+so the profiled code is neither slowed down nor restarted. Only one profile
+can run at a time. The endpoint is disabled unless ADMIN_TOKEN is set. With
+several worker processes, the profile covers the worker that handled the
+request. A profile is capped below gunicorn's worker timeout (WEB_TIMEOUT),
+which would otherwise kill a sync worker in the middle of it.
+
+The user service has the same module; only the examples above differ.
+"""
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, jsonify, request
+
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')  # Required in the X-Admin-Token header, empty disables the endpoint
+MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '60'))
+WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '30'))  # gunicorn's worker timeout, see gunicorn.conf.py
+TIMEOUT_MARGIN = 5  # Seconds left to send the profile before the worker timeout
+if WEB_TIMEOUT > 0:
+    MAX_SECONDS = max(1.0, min(MAX_SECONDS, WEB_TIMEOUT - TIMEOUT_MARGIN))
+MIN_INTERVAL = 0.001
+
+blueprint = Blueprint('profiler', __name__)
+_running = threading.Lock()
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def sample(seconds, interval, ignore=()):
+    """Count the collapsed stacks of all threads except `ignore`, sampled every `interval` seconds"""
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id not in ignore:
+                stacks[_collapse(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+@blueprint.route('/admin/profile', methods=['GET'])
+def profile():
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid admin token'}), 401
+
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval = float(request.args.get('interval', 0.01))
+    except ValueError:
+        return jsonify({'error': 'seconds and interval must be numbers'}), 400
+    if not 0 < seconds <= MAX_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {MAX_SECONDS:g}'}), 400
+    interval = max(interval, MIN_INTERVAL)
+
+    if not _running.acquire(blocking=False):
+        return jsonify({'error': 'A profile is already running'}), 409
+    try:
+        # Sample from this request's thread, leaving it out of the profile
+        stacks = sample(seconds, interval, ignore={threading.get_ident()})
+    finally:
+        _running.release()
+
+    body = ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    response = Response(body, mimetype='text/plain')
+    response.headers['X-Profile-Samples'] = str(sum(stacks.values()))
+    return response
@@ -0,0 +1,134 @@
+"""Query counting, slow-query logging and N+1 detection.
+
+Every SQL statement executed while handling a request is counted, and when
+the request finishes:
+
+- the count is observed in the http_request_db_queries histogram
+- statements with the same shape (the parameterized SQL) that ran at least
+  N_PLUS_ONE_THRESHOLD times are logged as a likely N+1 query pattern and
+  counted in db_repeated_queries_total
+
+Statements slower than SLOW_QUERY_MS are logged with their parameters and
+the endpoint that ran them, and counted in db_slow_queries_total.
+
+Tests can pin the number of queries an endpoint makes:
+
+    with querylog.assert_max_queries(1):
+        self.client.get('/api/products')
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from prometheus_client import Counter as MetricCounter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '100'))  # Log statements that take longer than this
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '5'))  # Repeats of one statement per request
+MAX_LOGGED_PARAMETER_LENGTH = 200
+
+QUERIES_PER_REQUEST = Histogram(
+    'http_request_db_queries',
+    'SQL statements executed per request',
+    ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+)
+SLOW_QUERIES = MetricCounter('db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS', ['endpoint'])
+REPEATED_QUERIES = MetricCounter(
+    'db_repeated_queries_total',
+    'Statement shapes repeated at least N_PLUS_ONE_THRESHOLD times in one request',
+    ['endpoint']
+)
+
+_local = threading.local()
+
+
+class QueryCounter:
+    """Statements executed on this thread while the counter is active"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries():
+    counter = QueryCounter()
+    collectors = _local.__dict__.setdefault('collectors', [])
+    collectors.append(counter)
+    try:
+        yield counter
+    finally:
+        collectors.remove(counter)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block runs more than `limit` statements"""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(f"{counter.count} queries executed, expected at most {limit}:\n"
+                             + '\n'.join(counter.statements))
+
+
+def _endpoint():
+    return (request.endpoint or 'unknown') if has_request_context() else 'none'
+
+
+def _format_parameters(parameters):
+    text = repr(parameters)
+    if len(text) > MAX_LOGGED_PARAMETER_LENGTH:
+        text = text[:MAX_LOGGED_PARAMETER_LENGTH] + '...'
+    return text
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('querylog_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['querylog_start'].pop()) * 1000
+    for counter in getattr(_local, 'collectors', ()):
+        counter.statements.append(statement)
+    if has_request_context():
+        g.setdefault('query_shapes', Counter())[statement] += 1
+    if elapsed_ms >= SLOW_QUERY_MS:
+        endpoint = _endpoint()
+        SLOW_QUERIES.labels(endpoint).inc()
+        logger.warning(f"Slow query ({elapsed_ms:.1f}ms) in {endpoint}: {statement} "
+                       f"parameters={_format_parameters(parameters)}")
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    starts = context.connection.info.get('querylog_start') if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _check_request(response):
+    shapes = g.pop('query_shapes', Counter())
+    endpoint = _endpoint()
+    QUERIES_PER_REQUEST.labels(endpoint).observe(sum(shapes.values()))
+    for statement, count in shapes.items():
+        if count >= N_PLUS_ONE_THRESHOLD:
+            REPEATED_QUERIES.labels(endpoint).inc()
+            logger.warning(f"Possible N+1 query in {endpoint}: statement ran {count} times: {statement}")
+    return response
+
+
+def init_app(app):
+    app.after_request(_check_request)
@@ -0,0 +1,107 @@
+"""Startup sequencing and the health probes.
+
+- /healthz (liveness) answers 200 as soon as the process serves requests.
+- /readyz (readiness) answers 503 until the app has been warmed up (database
+  reachable, connection pool filled, hot products cached) and whenever the
+  database or Redis stops answering, so the orchestrator only routes traffic
+  to an instance that can serve it quickly.
+
+The database is waited for with exponential backoff instead of fixed sleeps,
+so a fast database costs a fast start.
+"""
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+from flask import Blueprint, current_app, jsonify
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+DB_WAIT_ATTEMPTS = int(os.getenv('DB_WAIT_ATTEMPTS', '10'))
+DB_WAIT_BASE_DELAY = float(os.getenv('DB_WAIT_BASE_DELAY', '0.1'))  # Seconds before the first retry
+DB_WAIT_MAX_DELAY = float(os.getenv('DB_WAIT_MAX_DELAY', '5'))  # Longest pause between retries
+
+blueprint = Blueprint('probes', __name__)
+
+
+def backoff_delays(attempts, base_delay, max_delay):
+    """Jittered exponential delays to sleep between `attempts` tries, endless when attempts is None"""
+    for attempt in itertools.count() if attempts is None else range(attempts - 1):
+        yield min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def wait_for_db(db, attempts=None, base_delay=None, max_delay=None):
+    """Block until the database answers, retrying with exponential backoff (needs an app context)"""
+    attempts = attempts or DB_WAIT_ATTEMPTS
+    delays = backoff_delays(attempts, base_delay or DB_WAIT_BASE_DELAY, max_delay or DB_WAIT_MAX_DELAY)
+    for attempt in range(1, attempts + 1):
+        try:
+            db.session.execute(text('SELECT 1'))
+            return
+        except OperationalError:
+            if attempt == attempts:
+                logger.error(f"Database still unreachable after {attempts} attempts")
+                raise
+            delay = next(delays)
+            logger.warning(f"Database not reachable yet, retrying in {delay:.2f}s (attempt {attempt}/{attempts})")
+            time.sleep(delay)
+        finally:
+            db.session.remove()
+
+
+def mark_ready(app, ready=True):
+    app.extensions['ready'] = ready
+
+
+def start_warm_up(app, warm_up):
+    """Run warm_up(app) in the background until it succeeds, then mark the app ready; /readyz answers 503 until then"""
+    def run():
+        for delay in backoff_delays(None, DB_WAIT_BASE_DELAY, DB_WAIT_MAX_DELAY):
+            try:
+                warm_up(app)
+                mark_ready(app)
+                return
+            except Exception as e:
+                logger.warning(f"Warm-up failed, retrying in {delay:.2f}s: {str(e)}")
+                time.sleep(delay)
+
+    thread = threading.Thread(target=run, name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def check_dependencies():
+    """Names of the dependencies that do not answer right now"""
+    failing = []
+    db = current_app.extensions['sqlalchemy'].db
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception:
+        failing.append('database')
+    finally:
+        db.session.remove()
+    try:
+        current_app.extensions['redis'].ping()
+    except Exception:
+        failing.append('redis')
+    return failing
+
+
+@blueprint.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'})
+
+
+@blueprint.route('/readyz', methods=['GET'])
+def readyz():
+    if not current_app.extensions.get('ready'):
+        return jsonify({'status': 'starting'}), 503
+    failing = check_dependencies()
+    if failing:
+        return jsonify({'status': 'unavailable', 'failing': failing}), 503
+    return jsonify({'status': 'ready'})
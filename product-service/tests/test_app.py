@@ -1,31 +1,28 @@
 import unittest
 import json
 from unittest.mock import patch, MagicMock
-from app import app, db, Product, create_access_token
+from app import create_app, db, Product, create_access_token
 import os
 
 class TestProductService(unittest.TestCase):
     def setUp(self):
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['JWT_SECRET_KEY'] = 'test-secret-key'
-        self.client = app.test_client()
-        with app.app_context():
+        self.mock_redis = MagicMock()
+        self.mock_redis.get.return_value = None
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'JWT_SECRET_KEY': 'test-secret-key'
+        }, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
+        with self.app.app_context():
             db.create_all()
-            # Mock Redis client
-            self.redis_patcher = patch('app.redis_client')
-            self.mock_redis = self.redis_patcher.start()
-            self.mock_redis.get.return_value = None
-            self.mock_redis.setex = MagicMock()
-            self.mock_redis.delete = MagicMock()
             # Create test token
             self.test_token = create_access_token(identity='test-user')
 
     def tearDown(self):
-        with app.app_context():
+        with self.app.app_context():
             db.session.remove()
             db.drop_all()
-        self.redis_patcher.stop()
 
     def test_create_product(self):
         response = self.client.post('/api/products',
@@ -1,14 +1,15 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from app import app, redis_client
+from app import create_app
 
 class TestProductCache(unittest.TestCase):
     def setUp(self):
-        app.config['TESTING'] = True
-        self.client = app.test_client()
+        self.mock_redis = MagicMock()
+        self.app = create_app({'TESTING': True}, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
 
-    @patch('app.redis_client')
-    def test_product_caching(self, mock_redis):
+    def test_product_caching(self):
+        mock_redis = self.mock_redis
         # Mock Redis get to return None (cache miss)
         mock_redis.get.return_value = None
         
@@ -29,8 +30,8 @@ class TestProductCache(unittest.TestCase):
         self.assertEqual(args[0], 'product:1')
         self.assertEqual(args[1], 3600)  # 1 hour expiration
 
-    @patch('app.redis_client')
-    def test_cache_hit(self, mock_redis):
+    def test_cache_hit(self):
+        mock_redis = self.mock_redis
         # Mock Redis to return cached data
         cached_data = str({
             'id': 1,
@@ -51,8 +52,8 @@ class TestProductCache(unittest.TestCase):
         # Verify Redis set was not called (cache hit)
         mock_redis.setex.assert_not_called()
 
-    @patch('app.redis_client')
-    def test_cache_invalidation(self, mock_redis):
+    def test_cache_invalidation(self):
+        mock_redis = self.mock_redis
         # Mock Redis delete
         mock_redis.delete = MagicMock()
         
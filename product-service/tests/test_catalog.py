@@ -0,0 +1,232 @@
+import random
+import threading
+import unittest
+from unittest.mock import MagicMock
+from flask import request
+from app import create_app, db, Product, create_access_token, product_query
+from catalog import Catalog, CatalogIndex, parse_query, publish_change
+
+CATEGORIES = ['Books', 'Home', 'Toys', None]
+
+
+def sequence(entry_id):
+    entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+    return int(entry_id.split('-')[0])
+
+
+class FakeStreamRedis:
+    """The stream commands Catalog uses, on a single in-memory stream"""
+
+    def __init__(self):
+        self.entries = []
+        self.next_id = 1
+
+    def xadd(self, key, fields, maxlen=None, approximate=True):
+        self.entries.append((f'{self.next_id}-0'.encode(),
+                             {name.encode(): str(value).encode() for name, value in fields.items()}))
+        self.next_id += 1
+        if maxlen is not None:
+            self.entries = self.entries[-maxlen:]
+
+    def xread(self, streams, count=None):
+        (key, last), = streams.items()
+        entries = [entry for entry in self.entries if sequence(entry[0]) > sequence(last)][:count]
+        return [[key.encode(), entries]] if entries else []
+
+    def xrevrange(self, key, count=None):
+        return self.entries[::-1][:count]
+
+    def xlen(self, key):
+        return len(self.entries)
+
+    def xrange(self, key, min='-', max='+'):
+        return [entry for entry in self.entries if sequence(min) <= sequence(entry[0]) <= sequence(max)]
+
+
+def random_rows(count, rng):
+    return [(product_id, round(rng.uniform(1, 100), 2), rng.randint(0, 5), rng.choice(CATEGORIES))
+            for product_id in range(1, count + 1)]
+
+
+def brute_force(rows, category=None, min_price=None, max_price=None, in_stock=False,
+                sort='id', descending=False, limit=50, offset=0):
+    column = {'id': 0, 'price': 1, 'stock': 2}[sort]
+    matching = [row for row in rows
+                if (category is None or row[3] == category)
+                and (min_price is None or row[1] >= min_price)
+                and (max_price is None or row[1] <= max_price)
+                and (not in_stock or row[2] > 0)]
+    matching.sort(key=lambda row: (row[column], row[0]), reverse=descending)
+    return [row[0] for row in matching[offset:offset + limit]]
+
+
+class TestCatalogIndex(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(7)
+        self.rows = random_rows(500, self.rng)
+        self.index = CatalogIndex.build(self.rows)
+
+    def random_query(self):
+        low = self.rng.choice([None, self.rng.uniform(1, 60)])
+        return {
+            'category': self.rng.choice(CATEGORIES + ['Missing']),
+            'min_price': low,
+            'max_price': self.rng.choice([None, (low or 1) + self.rng.uniform(0, 50)]),
+            'in_stock': self.rng.random() < 0.5,
+            'sort': self.rng.choice(['id', 'price', 'stock']),
+            'descending': self.rng.random() < 0.5,
+            'limit': self.rng.choice([1, 10, 200]),
+            'offset': self.rng.choice([0, 5]),
+        }
+
+    def test_queries_match_a_full_scan(self):
+        for _ in range(300):
+            options = self.random_query()
+            self.assertEqual(self.index.query(**options), brute_force(self.rows, **options), options)
+
+    def test_updates_keep_queries_in_step(self):
+        rows = {row[0]: row for row in self.rows}
+        for _ in range(300):
+            product_id = self.rng.randint(1, 520)
+            if self.rng.random() < 0.2:
+                rows.pop(product_id, None)
+                self.index.delete(product_id)
+            elif product_id in rows or product_id > max(rows):
+                row = (product_id,) + random_rows(1, self.rng)[0][1:]
+                rows[product_id] = row
+                self.index.upsert(*row)
+        self.assertEqual(len(self.index), len(rows))
+        for _ in range(100):
+            options = self.random_query()
+            self.assertEqual(self.index.query(**options), brute_force(sorted(rows.values()), **options), options)
+
+    def test_memory_per_product(self):
+        self.assertLess(self.index.memory_bytes() / len(self.rows), 48)
+
+    def test_parse_query(self):
+        options = parse_query({'category': 'Books', 'sort': '-price', 'limit': '10', 'in_stock': 'true'})
+        self.assertEqual((options['sort'], options['descending'], options['limit']), ('price', True, 10))
+        self.assertTrue(options['in_stock'])
+        for args in ({'sort': 'name'}, {'limit': '0'}, {'min_price': 'cheap'}, {'offset': '-1'}):
+            with self.assertRaises(ValueError):
+                parse_query(args)
+
+
+class TestCatalog(unittest.TestCase):
+    def setUp(self):
+        self.redis = FakeStreamRedis()
+        self.rows = {row[0]: row for row in random_rows(50, random.Random(3))}
+        self.loads = []
+        self.catalog = Catalog(self.redis, self.load_rows, changelog_size=5)
+
+    def load_rows(self, ids=None):
+        self.loads.append(ids)
+        return [self.rows[product_id] for product_id in sorted(self.rows)
+                if ids is None or product_id in ids]
+
+    def write(self, row=None, delete=None):
+        if delete is not None:
+            del self.rows[delete]
+        else:
+            self.rows[row[0]] = row
+        publish_change(self.redis, delete if delete is not None else row[0])
+
+    def test_writes_are_applied_before_the_next_query(self):
+        self.assertEqual(self.catalog.query(sort='price', limit=1),
+                         brute_force(sorted(self.rows.values()), sort='price', limit=1))
+        self.write((51, 0.5, 3, 'Books'))
+        self.write((7, 200.0, 1, 'Toys'))
+        self.write(delete=8)
+        self.assertEqual(self.catalog.query(sort='price', limit=1), [51])
+        self.assertEqual(self.catalog.query(sort='price', descending=True, limit=1), [7])
+        self.assertNotIn(8, self.catalog.query(limit=100))
+        self.assertEqual(self.loads, [None, [7, 8, 51]])
+
+    def test_queries_do_not_wait_for_a_refresh(self):
+        self.catalog.query()
+        loading, release = threading.Event(), threading.Event()
+        load_rows = self.load_rows
+
+        def slow_load_rows(ids=None):
+            loading.set()
+            release.wait(5)
+            return load_rows(ids)
+        self.catalog.load_rows = slow_load_rows
+        self.write((51, 0.5, 3, 'Books'))
+        results = []
+        refreshing = threading.Thread(target=lambda: results.append(self.catalog.query(sort='price', limit=1)))
+        refreshing.start()
+        loading.wait(5)
+        # Answered from the current snapshot while the other thread loads the change
+        self.assertNotEqual(self.catalog.query(sort='price', limit=1), [51])
+        release.set()
+        refreshing.join(5)
+        self.assertEqual(results, [[51]])
+
+    def test_trimmed_log_rebuilds(self):
+        self.catalog.query()
+        for price in range(5, -1, -1):
+            self.write((9, float(price), 1, 'Home'))
+        self.assertEqual(self.catalog.query(category='Home', sort='price', limit=1), [9])
+        self.assertEqual(self.loads, [None, None])
+
+
+class TestCatalogEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.mock_redis = MagicMock()
+        self.mock_redis.mget.side_effect = lambda keys: [None] * len(keys)
+        self.mock_redis.xrevrange.return_value = []
+        self.mock_redis.xread.return_value = []
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'JWT_SECRET_KEY': 'test-secret-key',
+            'CATALOG_INDEX': True
+        }, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
+        rng = random.Random(5)
+        with self.app.app_context():
+            db.create_all()
+            db.session.add_all([Product(name=f'Product {i}', price=price, stock=stock, category=category)
+                                for i, price, stock, category in random_rows(40, rng)])
+            db.session.commit()
+            self.test_token = create_access_token(identity='test-user')
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_index_and_database_agree(self):
+        for query in ('category=Books&sort=-price&limit=5', 'in_stock=1&sort=stock&offset=3&limit=10',
+                      'min_price=20&max_price=60&sort=price', 'category=Toys'):
+            response = self.client.get(f'/api/products?{query}')
+            self.assertEqual(response.status_code, 200)
+            with self.app.test_request_context(f'/api/products?{query}'):
+                expected = [product.to_dict() for product in product_query(**parse_query(request.args))]
+            self.assertEqual(response.get_json(), expected, query)
+
+    def test_cached_products_skip_the_database(self):
+        self.mock_redis.mget.side_effect = lambda keys: [str({'id': 1, 'name': 'Cached'}).encode()] * len(keys)
+        response = self.client.get('/api/products?sort=id&limit=1')
+        self.assertEqual(response.get_json(), [{'id': 1, 'name': 'Cached'}])
+        self.mock_redis.pipeline.return_value.setex.assert_not_called()
+
+    def test_writes_are_published(self):
+        self.client.delete('/api/products/1', headers={'Authorization': f'Bearer {self.test_token}'})
+        self.mock_redis.xadd.assert_called_once()
+        self.assertEqual(self.mock_redis.xadd.call_args[0][1], {'id': 1})
+
+    def test_unavailable_index_falls_back_to_the_database(self):
+        self.mock_redis.xrevrange.side_effect = ConnectionError('Redis is down')
+        response = self.client.get('/api/products?sort=-price&limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.get_json()), 3)
+
+    def test_invalid_query(self):
+        response = self.client.get('/api/products?sort=name')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Invalid sort', response.get_json()['error'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import logging
+import queue
+import sys
+import unittest
+from unittest.mock import MagicMock
+from prometheus_client import REGISTRY
+from app import create_app, request_log_fields
+import logs
+
+def make_record(level=logging.INFO, msg='Found %d products', args=(3,), **extra):
+    record = logging.LogRecord('app', level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+class TestLogs(unittest.TestCase):
+    def test_json_lines_carry_extra_fields(self):
+        formatter = logs.JsonFormatter('product-service')
+        entry = json.loads(formatter.format(make_record(count=3, path='/api/products')))
+        self.assertEqual(entry['message'], 'Found 3 products')
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['service'], 'product-service')
+        self.assertEqual(entry['count'], 3)
+        self.assertEqual(entry['path'], '/api/products')
+        self.assertTrue(entry['@timestamp'].endswith('Z'))
+
+    def test_sampling_keeps_warnings_and_unsampled_lines(self):
+        sampling = logs.SamplingFilter()
+        self.assertTrue(sampling.filter(make_record()))
+        self.assertFalse(sampling.filter(make_record(**logs.sampled(rate=0))))
+        self.assertTrue(sampling.filter(make_record(**logs.sampled(rate=1))))
+        self.assertTrue(sampling.filter(make_record(logging.WARNING, **logs.sampled(rate=0))))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = logs.NonBlockingHandler(queue.Queue(1))
+        before = REGISTRY.get_sample_value('log_records_dropped_total') or 0
+        handler.handle(make_record())
+        handler.handle(make_record())
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(REGISTRY.get_sample_value('log_records_dropped_total'), before + 1)
+
+    def test_request_fields_are_captured_on_the_calling_thread(self):
+        app = create_app({'TESTING': True}, redis_client=MagicMock())
+        handler = logs.NonBlockingHandler(queue.Queue(), context=request_log_fields)
+        with app.test_request_context('/api/products', method='GET'):
+            handler.handle(make_record())
+        record = handler.queue.get_nowait()
+        self.assertEqual((record.method, record.path), ('GET', '/api/products'))
+        self.assertEqual((record.msg, record.args), ('Found 3 products', None))
+
+    def test_exceptions_are_kept_as_text(self):
+        handler = logs.NonBlockingHandler(queue.Queue())
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            handler.handle(logging.LogRecord('app', logging.ERROR, __file__, 1, 'failed', (), sys.exc_info()))
+        entry = json.loads(logs.JsonFormatter('product-service').format(handler.queue.get_nowait()))
+        self.assertIn('ValueError: boom', entry['exception'])
+
+if __name__ == '__main__':
+    unittest.main()
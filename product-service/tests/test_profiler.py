@@ -0,0 +1,65 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+from app import create_app
+import profiler
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.client = create_app({'TESTING': True}, redis_client=MagicMock()).test_client()
+        self.token_patcher = patch('profiler.ADMIN_TOKEN', 'admin-secret')
+        self.token_patcher.start()
+
+    def tearDown(self):
+        self.token_patcher.stop()
+
+    def test_disabled_without_admin_token(self):
+        with patch('profiler.ADMIN_TOKEN', ''):
+            response = self.client.get('/admin/profile', headers={'X-Admin-Token': ''})
+        self.assertEqual(response.status_code, 404)
+
+    def test_requires_admin_token(self):
+        response = self.client.get('/admin/profile?seconds=0.1', headers={'X-Admin-Token': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_rejects_long_profiles(self):
+        response = self.client.get('/admin/profile?seconds=3600', headers={'X-Admin-Token': 'admin-secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profiles_end_before_the_worker_timeout(self):
+        self.assertLessEqual(profiler.MAX_SECONDS, profiler.WEB_TIMEOUT - profiler.TIMEOUT_MARGIN)
+        response = self.client.get(f'/admin/profile?seconds={profiler.WEB_TIMEOUT}',
+                                   headers={'X-Admin-Token': 'admin-secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_collapsed_stacks_of_other_threads(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,))
+        worker.start()
+        try:
+            response = self.client.get('/admin/profile?seconds=0.3&interval=0.005',
+                                       headers={'X-Admin-Token': 'admin-secret'})
+        finally:
+            stop.set()
+            worker.join()
+        self.assertEqual(response.status_code, 200)
+        lines = response.get_data(as_text=True).splitlines()
+        busy = [line for line in lines if 'busy_loop (test_profiler.py:' in line]
+        self.assertTrue(busy)
+        stack, count = busy[0].rsplit(' ', 1)
+        self.assertTrue(stack.startswith('_bootstrap (threading.py:'))
+        self.assertGreater(int(count), 10)
+        self.assertFalse(any(' profile (profiler.py:' in line for line in lines))
+
+    def test_one_profile_at_a_time(self):
+        with profiler._running:
+            response = self.client.get('/admin/profile?seconds=0.1', headers={'X-Admin-Token': 'admin-secret'})
+        self.assertEqual(response.status_code, 409)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from prometheus_client import REGISTRY
+from app import create_app, db, Product, create_access_token
+import querylog
+
+class TestQueryLog(unittest.TestCase):
+    def setUp(self):
+        self.mock_redis = MagicMock()
+        self.mock_redis.get.return_value = None
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'JWT_SECRET_KEY': 'test-secret-key'
+        }, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add_all([Product(name=f'Product {i}', price=9.99, stock=i) for i in range(1, 11)])
+            db.session.commit()
+            self.test_token = create_access_token(identity='test-user')
+        self.headers = {'Authorization': f'Bearer {self.test_token}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_query_budget_per_endpoint(self):
+        with querylog.assert_max_queries(1):
+            self.assertEqual(self.client.get('/api/products').status_code, 200)
+        with querylog.assert_max_queries(1):
+            self.assertEqual(self.client.get('/api/products/1').status_code, 200)
+        with querylog.assert_max_queries(2):
+            self.assertEqual(self.client.post('/api/products', json={'name': 'New', 'price': 1.0, 'stock': 1},
+                                              headers=self.headers).status_code, 201)
+        with querylog.assert_max_queries(3):
+            self.assertEqual(self.client.put('/api/products/1', json={'price': 2.0},
+                                             headers=self.headers).status_code, 200)
+        with querylog.assert_max_queries(2):
+            self.assertEqual(self.client.delete('/api/products/2', headers=self.headers).status_code, 204)
+
+    def test_assert_max_queries_fails_when_exceeded(self):
+        with self.assertRaises(AssertionError) as raised:
+            with querylog.assert_max_queries(0):
+                self.client.get('/api/products')
+        self.assertIn('1 queries executed, expected at most 0', str(raised.exception))
+
+    def test_slow_query_is_logged_with_endpoint(self):
+        with patch('querylog.SLOW_QUERY_MS', 0), self.assertLogs('querylog', 'WARNING') as logs:
+            self.client.get('/api/products/3')
+        self.assertIn('Slow query', logs.output[0])
+        self.assertIn('in products.get_product', logs.output[0])
+        self.assertIn('parameters=(3,)', logs.output[0])
+
+    def test_repeated_statements_are_flagged(self):
+        before = REGISTRY.get_sample_value('db_repeated_queries_total', {'endpoint': 'n_plus_one'}) or 0
+
+        @self.app.route('/test/n-plus-one', endpoint='n_plus_one')
+        def n_plus_one():
+            return {'names': [Product.query.get(i).name for i in range(1, 7)]}
+
+        with patch('querylog.N_PLUS_ONE_THRESHOLD', 5), self.assertLogs('querylog', 'WARNING') as logs:
+            self.client.get('/test/n-plus-one')
+        self.assertIn('Possible N+1 query in n_plus_one: statement ran 6 times', logs.output[0])
+        self.assertEqual(REGISTRY.get_sample_value('db_repeated_queries_total', {'endpoint': 'n_plus_one'}),
+                         before + 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from sqlalchemy.exc import OperationalError
+from app import create_app, db, Product, warm_up
+import readiness
+
+class TestReadiness(unittest.TestCase):
+    def setUp(self):
+        self.mock_redis = MagicMock()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'JWT_SECRET_KEY': 'test-secret-key'
+        }, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add_all([Product(name=f'Product {i}', price=9.99, stock=i) for i in range(1, 4)])
+            db.session.commit()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_healthz_answers_while_starting(self):
+        response = self.client.get('/healthz')
+        self.assertEqual(response.status_code, 200)
+
+    def test_readyz_waits_for_warm_up(self):
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['status'], 'starting')
+
+        readiness.start_warm_up(self.app, warm_up).join()
+
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.mock_redis.pipeline.return_value.setex.call_count, 3)
+
+    def test_warm_up_is_retried(self):
+        self.mock_redis.ping.side_effect = [ConnectionError('redis is starting'), True, True]
+        with patch('time.sleep') as sleep:
+            readiness.start_warm_up(self.app, warm_up).join()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(self.client.get('/readyz').status_code, 200)
+
+    def test_readyz_reports_failing_dependencies(self):
+        readiness.mark_ready(self.app)
+        self.mock_redis.ping.side_effect = ConnectionError('redis is down')
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()['failing'], ['redis'])
+
+    def test_backoff_delays_grow_and_are_capped(self):
+        with patch('random.uniform', return_value=1.0):
+            delays = list(readiness.backoff_delays(6, base_delay=0.1, max_delay=1))
+        for delay, expected in zip(delays, [0.1, 0.2, 0.4, 0.8, 1]):
+            self.assertAlmostEqual(delay, expected)
+        self.assertEqual(len(delays), 5)
+
+    def test_wait_for_db_retries_until_the_database_answers(self):
+        failure = OperationalError('SELECT 1', {}, Exception('connection refused'))
+        session = MagicMock()
+        session.execute.side_effect = [failure, failure, None]
+        with patch('time.sleep') as sleep:
+            readiness.wait_for_db(MagicMock(session=session), attempts=5, base_delay=0.01)
+        self.assertEqual(session.execute.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_wait_for_db_gives_up(self):
+        session = MagicMock()
+        session.execute.side_effect = OperationalError('SELECT 1', {}, Exception('connection refused'))
+        with patch('time.sleep'), self.assertRaises(OperationalError):
+            readiness.wait_for_db(MagicMock(session=session), attempts=3, base_delay=0.01)
+        self.assertEqual(session.execute.call_count, 3)
+
+if __name__ == '__main__':
+    unittest.main()
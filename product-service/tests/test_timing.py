@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from flask import g
+from prometheus_client import REGISTRY
+from app import create_app, db, create_access_token
+import timing
+
+class TestPhaseTiming(unittest.TestCase):
+    def setUp(self):
+        self.mock_redis = MagicMock()
+        self.mock_redis.get.return_value = None
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'JWT_SECRET_KEY': 'test-secret-key'
+        }, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            self.test_token = create_access_token(identity='test-user')
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def create_product(self):
+        response = self.client.post('/api/products',
+            json={'name': 'Test Product', 'price': 9.99, 'stock': 1},
+            headers={'Authorization': f'Bearer {self.test_token}'}
+        )
+        return response.get_json()['id']
+
+    def test_phases_are_observed_per_endpoint(self):
+        product_id = self.create_product()
+        labels = {'phase': 'db', 'endpoint': 'products.get_product'}
+        before = REGISTRY.get_sample_value('http_request_phase_duration_seconds_count', labels) or 0
+
+        self.client.get(f'/api/products/{product_id}')
+
+        self.assertEqual(REGISTRY.get_sample_value('http_request_phase_duration_seconds_count', labels),
+                         before + 1)
+        self.assertIsNotNone(REGISTRY.get_sample_value(
+            'http_request_phase_duration_seconds_count', {'phase': 'serialize', 'endpoint': 'products.get_product'}))
+
+    def test_server_timing_header(self):
+        product_id = self.create_product()
+        response = self.client.get(f'/api/products/{product_id}')
+        self.assertNotIn('Server-Timing', response.headers)
+
+        with patch('timing.SERVER_TIMING', True):
+            response = self.client.get(f'/api/products/{product_id}')
+        phases = dict(entry.split(';dur=') for entry in response.headers['Server-Timing'].split(', '))
+        self.assertEqual(set(phases), {'db', 'serialize'})
+        self.assertGreater(float(phases['db']), 0)
+
+    def test_redis_commands_are_charged_to_cache(self):
+        client = timing.TimedRedis()
+        with patch('redis.Redis.execute_command', return_value=b'cached'):
+            with self.app.test_request_context('/api/products/1'):
+                self.assertEqual(client.get('product:1'), b'cached')
+                self.assertGreater(g.phase_timings['cache'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
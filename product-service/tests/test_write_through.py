@@ -0,0 +1,155 @@
+import ast
+import threading
+import unittest
+from unittest.mock import MagicMock, call
+from redis.exceptions import ConnectionError, WatchError
+from app import create_app, db, Product, create_access_token
+from write_through import CACHE_TTL, CacheWriter, fill
+
+PRODUCT = {'id': 1, 'name': 'Test Product', 'price': 5.0}
+
+
+class TestCacheWriter(unittest.TestCase):
+    def setUp(self):
+        self.redis = MagicMock()
+        self.pipe = self.redis.pipeline.return_value.__enter__.return_value
+        self.pipe.get.return_value = None
+        self.writer = CacheWriter(self.redis, publish_changes=True)
+
+    def test_newer_version_is_stored_with_its_catalog_change(self):
+        self.pipe.get.return_value = b'2'
+        self.writer.write(1, 3, PRODUCT)
+        self.pipe.watch.assert_called_once_with('product:1:version')
+        self.pipe.setex.assert_has_calls([call('product:1', CACHE_TTL, str(PRODUCT)),
+                                          call('product:1:version', CACHE_TTL, 3)])
+        self.pipe.xadd.assert_called_once()
+        self.pipe.execute.assert_called_once()
+
+    def test_older_version_is_dropped(self):
+        self.pipe.get.return_value = b'4'
+        self.writer.write(1, 3, PRODUCT)
+        self.pipe.setex.assert_not_called()
+        self.pipe.execute.assert_not_called()
+
+    def test_delete_keeps_its_version(self):
+        self.writer.write(1, 3, None)
+        self.pipe.delete.assert_called_once_with('product:1')
+        self.pipe.setex.assert_called_once_with('product:1:version', CACHE_TTL, 3)
+
+    def test_concurrent_change_is_retried(self):
+        self.pipe.execute.side_effect = [WatchError(), []]
+        self.writer.write(1, 3, PRODUCT)
+        self.assertEqual(self.pipe.execute.call_count, 2)
+
+    def test_burst_of_writes_is_coalesced(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_get(key):
+            started.set()
+            release.wait(5)
+            return None
+        self.pipe.get.side_effect = slow_get
+        first = threading.Thread(target=self.writer.write, args=(1, 1, dict(PRODUCT, price=1.0)))
+        first.start()
+        started.wait(5)
+        # Recorded while the first write is in flight, and written once by that thread
+        self.writer.write(1, 3, dict(PRODUCT, price=3.0))
+        self.writer.write(1, 2, dict(PRODUCT, price=2.0))
+        release.set()
+        first.join(5)
+        stored = [args[2] for args, _ in self.pipe.setex.call_args_list if args[0] == 'product:1']
+        self.assertEqual(stored, [str(dict(PRODUCT, price=1.0)), str(dict(PRODUCT, price=3.0))])
+
+    def test_failed_write_invalidates_instead_of_dropping_a_coalesced_one(self):
+        started, release = threading.Event(), threading.Event()
+
+        def failing_get(key):
+            started.set()
+            release.wait(5)
+            raise ConnectionError('Redis is down')
+        self.pipe.get.side_effect = failing_get
+        first = threading.Thread(target=self.writer.write, args=(1, 1, dict(PRODUCT, price=1.0)))
+        first.start()
+        started.wait(5)
+        self.writer.write(1, 2, dict(PRODUCT, price=2.0))  # Coalesced into the failing write
+        release.set()
+        first.join(5)
+        self.redis.delete.assert_called_once_with('product:1')
+        self.redis.xadd.assert_called_once()
+        self.assertEqual(self.writer._pending, {})
+        self.assertEqual(self.writer._writing, set())
+
+    def test_fill_skips_products_written_meanwhile(self):
+        self.pipe.mget.return_value = [b'3', None]
+        other = dict(PRODUCT, id=2)
+        self.assertEqual(fill(self.redis, [PRODUCT, other], {1: b'2', 2: None}), 1)
+        self.pipe.watch.assert_called_once_with('product:1:version', 'product:2:version')
+        self.pipe.setex.assert_called_once_with('product:2', CACHE_TTL, str(other))
+
+
+class TestWriteThroughEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.mock_redis = MagicMock()
+        self.mock_redis.pipeline.return_value.execute.return_value = [7]
+        self.pipe = self.mock_redis.pipeline.return_value.__enter__.return_value
+        self.pipe.get.return_value = None
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'JWT_SECRET_KEY': 'test-secret-key',
+            'CACHE_WRITE_THROUGH': True
+        }, redis_client=self.mock_redis)
+        self.client = self.app.test_client()
+        with self.app.app_context():
+            db.create_all()
+            db.session.add(Product(name='Test Product', price=99.99, stock=10, category='Test Category'))
+            db.session.commit()
+            self.headers = {'Authorization': f'Bearer {create_access_token(identity="test-user")}'}
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def cached(self, key):
+        return [ast.literal_eval(args[2]) for args, _ in self.pipe.setex.call_args_list if args[0] == key]
+
+    def test_update_stores_the_fresh_product(self):
+        response = self.client.put('/api/products/1', json={'price': 149.99}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.mock_redis.delete.assert_not_called()
+        self.mock_redis.pipeline.return_value.incr.assert_called_once_with('product:1:writes')
+        self.assertEqual(self.cached('product:1'), [response.get_json()])
+        self.pipe.setex.assert_any_call('product:1:version', CACHE_TTL, 7)
+
+    def test_read_fill_yields_to_a_newer_write(self):
+        self.mock_redis.get.return_value = None
+        # The reader saw version 7, and version 8 was written while it loaded the product
+        self.mock_redis.mget.return_value = [b'7']
+        self.pipe.mget.return_value = [b'8']
+        response = self.client.get('/api/products/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.cached('product:1'), [])
+        self.pipe.mget.return_value = [b'7']
+        self.client.get('/api/products/1')
+        self.assertEqual(self.cached('product:1'), [response.get_json()])
+
+    def test_writes_without_redis_fall_back_to_invalidation(self):
+        self.mock_redis.pipeline.return_value.execute.side_effect = ConnectionError('Redis is down')
+        self.mock_redis.delete.side_effect = ConnectionError('Redis is down')
+        response = self.client.put('/api/products/1', json={'price': 149.99}, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.mock_redis.delete.assert_called_once_with('product:1')
+        self.pipe.setex.assert_not_called()
+
+    def test_create_and_delete_are_versioned(self):
+        response = self.client.post('/api/products', json={'name': 'New', 'price': 1.0, 'stock': 1},
+                                    headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.cached('product:2'), [response.get_json()])
+        response = self.client.delete('/api/products/2', headers=self.headers)
+        self.assertEqual(response.status_code, 204)
+        self.pipe.delete.assert_called_once_with('product:2')
+
+if __name__ == '__main__':
+    unittest.main()
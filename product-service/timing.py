@@ -0,0 +1,94 @@
+"""Per-request timing of the database, cache and serialization phases.
+
+Every request accumulates the time it spends in each phase:
+
+- db: SQLAlchemy statement execution, timed through engine events
+- cache: Redis commands, timed by TimedRedis
+- serialize: to_dict(), jsonify() and decoding cached entries, timed with phase()
+
+When the request finishes the totals are observed in the
+http_request_phase_duration_seconds histogram, and with SERVER_TIMING=1 they
+are also sent to the client in a Server-Timing header (shown in the browser's
+network panel). The cost is a few perf_counter() calls per phase and one
+histogram observation per phase that ran, so it is meant to stay on.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import redis
+from flask import g, has_request_context, request
+from prometheus_client import Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'  # Add a Server-Timing header to every response
+
+PHASE_SECONDS = Histogram(
+    'http_request_phase_duration_seconds',
+    'Time one request spent in each phase (db, cache, serialize)',
+    ['phase', 'endpoint'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+def add(phase_name, seconds):
+    """Charge `seconds` to `phase_name` for the current request, if there is one"""
+    if has_request_context():
+        phases = g.setdefault('phase_timings', {})
+        phases[phase_name] = phases.get(phase_name, 0.0) + seconds
+
+
+@contextmanager
+def phase(phase_name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(phase_name, time.perf_counter() - start)
+
+
+class TimedRedis(redis.Redis):
+    """Redis client that charges every command to the cache phase"""
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            add('cache', time.perf_counter() - start)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('phase_timing_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    add('db', time.perf_counter() - conn.info['phase_timing_start'].pop())
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(context):
+    starts = context.connection.info.get('phase_timing_start') if context.connection else None
+    if starts:
+        add('db', time.perf_counter() - starts.pop())
+
+
+def _record_phases(response):
+    phases = g.pop('phase_timings', None)
+    if not phases:
+        return response
+    endpoint = request.endpoint or 'unknown'
+    for phase_name, seconds in phases.items():
+        PHASE_SECONDS.labels(phase_name, endpoint).observe(seconds)
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = ', '.join(
+            f'{phase_name};dur={seconds * 1000:.3f}' for phase_name, seconds in phases.items()
+        )
+    return response
+
+
+def init_app(app):
+    app.after_request(_record_phases)
@@ -0,0 +1,159 @@
+"""Write-through product cache (CACHE_WRITE_THROUGH=1).
+
+By default a product write deletes product:<id>, so the next read misses
+and goes to the database. In write-through mode the write stores the fresh
+product instead, so readers of a hot product keep hitting the cache while
+it is being updated.
+
+- Versions: every write takes the next number from the product:<id>:writes
+  counter (next_version()) while it holds the product's row lock, so
+  versions follow commit order. The version of the cached entry is kept in
+  product:<id>:version, and a cache write only lands if its version is
+  newer (checked under WATCH), so a slow older write can't overwrite a
+  newer cached product. A delete stores its version with no entry, so a
+  late update can't bring the product back either.
+- Coalescing: while one thread of a worker writes a product to the cache,
+  other writes of the same product only record their result; the writing
+  thread then stores just the newest one. A burst of updates to a hot
+  product costs a couple of cache writes instead of one per update.
+- The cache write, its version and the catalog change (see catalog.py) go
+  to Redis in one MULTI/EXEC transaction.
+- Read fills: a reader that misses the cache reads the product's cached
+  version before loading it from the database (read_versions()), and
+  fill() only caches it if no write has stored a newer version since. So
+  a reader that loaded the row before an update can't replace the
+  written product with the old one.
+- When Redis can't hand out a version, the write falls back to deleting
+  the cached product, like with CACHE_WRITE_THROUGH off. So does a cache
+  write that fails: it may have been carrying a newer write that another
+  thread left to it, so the entry can't be trusted anymore.
+
+Exported metrics:
+
+- cache_write_through_total{result}: "written", "stale" (a newer version was
+  cached already), "coalesced" (left to the thread already writing it) or
+  "invalidated" (the cache write failed and the entry was deleted instead)
+- cache_fill_skipped_total: read fills dropped because a write landed while
+  the product was loaded
+"""
+import logging
+import os
+import threading
+
+from prometheus_client import Counter
+from redis.exceptions import WatchError
+
+from catalog import publish_change
+
+logger = logging.getLogger(__name__)
+
+CACHE_WRITE_THROUGH = os.getenv('CACHE_WRITE_THROUGH', '0') == '1'  # Store products on write instead of deleting
+CACHE_TTL = 3600  # Seconds a cached product is kept, same as the read path
+VERSION_TTL = 24 * 3600  # Seconds the write counter outlives the last write; must exceed CACHE_TTL
+
+WRITES = Counter('cache_write_through_total', 'Product writes handled by the write-through cache', ['result'])
+FILLS_SKIPPED = Counter('cache_fill_skipped_total', 'Read fills dropped because a newer product was written')
+
+
+def next_version(redis_client, product_id):
+    """The version of a product write; call it while holding the product's row lock"""
+    key = f'product:{product_id}:writes'
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.incr(key)
+    pipe.expire(key, VERSION_TTL)
+    return pipe.execute()[0]
+
+
+def read_versions(redis_client, product_ids):
+    """The cached version of each product, read before loading the products for fill()"""
+    return dict(zip(product_ids, redis_client.mget([f'product:{i}:version' for i in product_ids])))
+
+
+def fill(redis_client, products, versions):
+    """Cache the to_dict() of products read from the database, unless a write stored a newer version
+    since `versions` (from read_versions()) were read; returns the number cached"""
+    keys = [f"product:{product['id']}:version" for product in products]
+    if not keys:
+        return 0
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(*keys)
+            current = pipe.mget(keys)
+            fresh = [product for product, version in zip(products, current)
+                     if version == versions.get(product['id'])]
+            pipe.multi()
+            for product in fresh:
+                pipe.setex(f"product:{product['id']}", CACHE_TTL, str(product))
+            pipe.execute()
+        except WatchError:
+            # A write landed in between; the next read fills the cache again
+            fresh = []
+    FILLS_SKIPPED.inc(len(products) - len(fresh))
+    return len(fresh)
+
+
+class CacheWriter:
+    """Stores written products in the cache, newest version wins; safe to share between threads"""
+
+    def __init__(self, redis_client, publish_changes=False):
+        self.redis = redis_client
+        self.publish_changes = publish_changes
+        self._pending = {}  # Product id -> (version, product dict or None for a delete)
+        self._writing = set()
+        self._lock = threading.Lock()
+
+    def write(self, product_id, version, product_dict):
+        """Cache `product_dict` (None after a delete) as `version` of the product"""
+        with self._lock:
+            pending = self._pending.get(product_id)
+            if pending is None or pending[0] < version:
+                self._pending[product_id] = (version, product_dict)
+            if product_id in self._writing:
+                WRITES.labels('coalesced').inc()
+                return
+            self._writing.add(product_id)
+        try:
+            while True:
+                with self._lock:
+                    pending = self._pending.pop(product_id, None)
+                    if pending is None:
+                        self._writing.discard(product_id)
+                        return
+                self._store(product_id, *pending)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(product_id, None)
+                self._writing.discard(product_id)
+            # The dropped pending write may be newer than the cached product; don't leave that one behind
+            logger.warning(f"Cache write of product {product_id} failed, invalidating it: {str(e)}",
+                           extra={'product_id': product_id})
+            self.redis.delete(f'product:{product_id}')
+            if self.publish_changes:
+                publish_change(self.redis, product_id)
+            WRITES.labels('invalidated').inc()
+
+    def _store(self, product_id, version, product_dict):
+        key = f'product:{product_id}'
+        version_key = f'{key}:version'
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(version_key)
+                    cached = pipe.get(version_key)
+                    if cached is not None and int(cached) >= version:
+                        WRITES.labels('stale').inc()
+                        return
+                    pipe.multi()
+                    if product_dict is None:
+                        pipe.delete(key)
+                    else:
+                        pipe.setex(key, CACHE_TTL, str(product_dict))
+                    pipe.setex(version_key, CACHE_TTL, version)
+                    if self.publish_changes:
+                        publish_change(pipe, product_id)
+                    pipe.execute()
+                    WRITES.labels('written').inc()
+                    return
+                except WatchError:
+                    # Another worker wrote the product in between; check its version again
+                    continue
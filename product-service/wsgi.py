@@ -0,0 +1,11 @@
+"""WSGI entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import create_app, db, init_db, request_log_fields
+import logs
+from pools import dispose_before_fork
+
+# gunicorn imports this once in the master (preload_app) and then forks the workers;
+# each worker warms up its own pools in post_fork (see gunicorn.conf.py)
+logs.configure('product-service', context=request_log_fields)
+app = create_app()
+init_db(app)
+dispose_before_fork(app, db, app.extensions['redis'])
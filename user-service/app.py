@@ -1,5 +1,4 @@
 from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
@@ -8,6 +7,9 @@ import os
 from datetime import timedelta
 import bcrypt
 from prometheus_flask_exporter import PrometheusMetrics
+import profiler
+from pools import PooledSQLAlchemy, redis_pool
+import querylog
 
 app = Flask(__name__)
 CORS(app)
@@ -18,6 +20,12 @@ metrics = PrometheusMetrics(app, path='/metrics')
 # Add default metrics
 metrics.info('app_info', 'Application info', version='1.0.0')
 
+# Sampling profiler for the live process, see profiler.py
+app.register_blueprint(profiler.blueprint)
+
+# Count queries per request, log slow ones and repeated statement shapes
+querylog.init_app(app)
+
 # Configure database
 is_production = os.getenv('FLASK_ENV') == 'production'
 if is_production:
@@ -33,10 +41,10 @@ app.config['JWT_HEADER_NAME'] = 'Authorization'
 app.config['JWT_HEADER_TYPE'] = 'Bearer'
 
 # Initialize extensions
-db = SQLAlchemy(app)
+db = PooledSQLAlchemy(app)
 migrate = Migrate(app, db)
 jwt = JWTManager(app)
-redis_client = redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+redis_client = redis.Redis(connection_pool=redis_pool(os.getenv('REDIS_URL', 'redis://localhost:6379/0')))
 
 # Models
 class User(db.Model):
@@ -0,0 +1,35 @@
+"""Gunicorn settings for running user-service in production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every setting can be overridden from the environment. Each worker process has
+its own database and Redis pools (see pools.py), so size DB_POOL_SIZE to about
+WEB_THREADS.
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5001')}"
+workers = int(os.getenv('WEB_CONCURRENCY', str(multiprocessing.cpu_count() + 1)))
+threads = int(os.getenv('WEB_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('WEB_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('WEB_KEEPALIVE', '5'))
+# Restart workers after this many requests (plus jitter) to contain slow leaks, 0 disables it
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', '0'))
+# Import the app once before forking; wsgi.py closes the connections it opened
+preload_app = True
+
+# Workers write their metrics to files here so /metrics can add up all of them.
+# This has to be set before the app (and prometheus_client) is imported.
+multiproc_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/user-service-metrics')
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
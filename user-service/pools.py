@@ -0,0 +1,122 @@
+"""Database and Redis connection pools, sized from the environment and instrumented.
+
+Each worker process gets its own pools, so with gunicorn the service can
+open up to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) database connections
+and workers * REDIS_MAX_CONNECTIONS Redis connections; keep those below the
+servers' connection limits.
+
+Exported metrics:
+
+- db_pool_connections_in_use / redis_pool_connections_in_use: connections checked out right now
+- db_pool_capacity / redis_pool_capacity: the most connections the pool will open
+- db_pool_wait_seconds / redis_pool_wait_seconds: time spent getting a connection from the pool
+"""
+import os
+import time
+
+import redis
+from flask_sqlalchemy import SQLAlchemy
+from prometheus_client import Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.pool import Pool, QueuePool
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))  # Connections kept open per worker process
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '5'))  # Extra connections opened under load
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Replace connections older than this
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', '20'))  # Per worker process
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', '5'))  # Seconds to wait for a free connection
+
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+# livesum adds up the worker processes when gunicorn runs with PROMETHEUS_MULTIPROC_DIR
+DB_IN_USE = Gauge('db_pool_connections_in_use', 'Database connections checked out of the pool',
+                  multiprocess_mode='livesum')
+DB_CAPACITY = Gauge('db_pool_capacity', 'Most database connections the pool will open',
+                    multiprocess_mode='livesum')
+DB_WAIT = Histogram('db_pool_wait_seconds', 'Time spent getting a database connection from the pool',
+                    buckets=WAIT_BUCKETS)
+REDIS_IN_USE = Gauge('redis_pool_connections_in_use', 'Redis connections checked out of the pool',
+                     multiprocess_mode='livesum')
+REDIS_CAPACITY = Gauge('redis_pool_capacity', 'Most Redis connections the pool will open',
+                       multiprocess_mode='livesum')
+REDIS_WAIT = Histogram('redis_pool_wait_seconds', 'Time spent getting a Redis connection from the pool',
+                       buckets=WAIT_BUCKETS)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def _do_get(self):
+        DB_CAPACITY.set(self.size() + self._max_overflow)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_WAIT.observe(time.perf_counter() - start)
+
+
+@event.listens_for(Pool, 'checkout')
+def _db_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_IN_USE.inc()
+
+
+@event.listens_for(Pool, 'checkin')
+def _db_checkin(dbapi_connection, connection_record):
+    DB_IN_USE.dec()
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+    """Flask-SQLAlchemy with a sized, pre-pinged and instrumented pool for server databases"""
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        # SQLite keeps Flask-SQLAlchemy's own pool choice, which tests rely on
+        if sa_url.get_backend_name() != 'sqlite':
+            options.setdefault('poolclass', TimedQueuePool)
+            options.setdefault('pool_size', DB_POOL_SIZE)
+            options.setdefault('max_overflow', DB_MAX_OVERFLOW)
+            options.setdefault('pool_timeout', DB_POOL_TIMEOUT)
+            options.setdefault('pool_recycle', DB_POOL_RECYCLE)
+            options.setdefault('pool_pre_ping', True)
+        return super().apply_driver_hacks(app, sa_url, options)
+
+
+class TimedConnectionPool(redis.BlockingConnectionPool):
+    """Redis pool that waits up to `timeout` for a free connection and records the wait"""
+
+    def reset(self):
+        super().reset()
+        self._checked_out = set()
+
+    def get_connection(self, *args, **kwargs):
+        REDIS_CAPACITY.set(self.max_connections)
+        start = time.perf_counter()
+        try:
+            connection = super().get_connection(*args, **kwargs)
+        finally:
+            REDIS_WAIT.observe(time.perf_counter() - start)
+        self._checked_out.add(connection)
+        REDIS_IN_USE.inc()
+        return connection
+
+    def release(self, connection):
+        # The base class also releases connections that failed to connect and were never handed out
+        if connection in self._checked_out:
+            self._checked_out.discard(connection)
+            REDIS_IN_USE.dec()
+        super().release(connection)
+
+
+def redis_pool(url):
+    """Connection pool shared by every Redis client in this process"""
+    return TimedConnectionPool.from_url(url, max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT)
+
+
+def dispose_before_fork(app, db, redis_client):
+    """Close the connections opened while starting up, so forked workers never share a socket"""
+    with app.app_context():
+        db.engine.dispose()
+    redis_client.connection_pool.disconnect()
+    # Workers report their own pools; the idle master must not add to the totals
+    DB_CAPACITY.set(0)
+    REDIS_CAPACITY.set(0)
@@ -0,0 +1,31 @@
+import unittest
+from prometheus_client import REGISTRY
+from sqlalchemy.engine.url import make_url
+from app import app, db
+import pools
+
+class TestPools(unittest.TestCase):
+    def test_server_database_gets_sized_instrumented_pool(self):
+        _, options = db.apply_driver_hacks(app, make_url('postgresql://postgres:postgres@db/users'), {})
+        self.assertIs(options['poolclass'], pools.TimedQueuePool)
+        self.assertEqual(options['pool_size'], pools.DB_POOL_SIZE)
+        self.assertEqual(options['max_overflow'], pools.DB_MAX_OVERFLOW)
+        self.assertTrue(options['pool_pre_ping'])
+
+    def test_sqlite_keeps_default_pool(self):
+        _, options = db.apply_driver_hacks(app, make_url('sqlite:///:memory:'), {})
+        self.assertNotIn('pool_size', options)
+        self.assertNotIn('pool_pre_ping', options)
+
+    def test_checked_out_connections_are_counted(self):
+        engine = db.create_engine(make_url('sqlite://'), {'poolclass': pools.TimedQueuePool, 'pool_size': 2})
+        waits = REGISTRY.get_sample_value('db_pool_wait_seconds_count')
+        with engine.connect():
+            self.assertEqual(REGISTRY.get_sample_value('db_pool_connections_in_use'), 1)
+            self.assertEqual(REGISTRY.get_sample_value('db_pool_capacity'), 2 + 10)
+        self.assertEqual(REGISTRY.get_sample_value('db_pool_connections_in_use'), 0)
+        self.assertEqual(REGISTRY.get_sample_value('db_pool_wait_seconds_count'), waits + 1)
+        engine.dispose()
+
+if __name__ == '__main__':
+    unittest.main()
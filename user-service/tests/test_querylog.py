@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import patch
+from app import app, db
+import querylog
+
+class TestQueryLog(unittest.TestCase):
+    def setUp(self):
+        app.config['TESTING'] = True
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        self.client = app.test_client()
+        self.redis_patcher = patch('app.redis_client')
+        self.redis_patcher.start()
+        with app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+        self.redis_patcher.stop()
+
+    def test_query_budget_per_endpoint(self):
+        user = {'username': 'testuser', 'email': 'test@example.com', 'password': 'testpass'}
+        with querylog.assert_max_queries(3):
+            self.assertEqual(self.client.post('/api/users/register', json=user).status_code, 201)
+        with querylog.assert_max_queries(1):
+            response = self.client.post('/api/users/login',
+                                        json={'username': 'testuser', 'password': 'testpass'})
+        token = response.get_json()['access_token']
+        with querylog.assert_max_queries(1):
+            self.assertEqual(self.client.get('/api/users/profile',
+                                             headers={'Authorization': f'Bearer {token}'}).status_code, 200)
+
+    def test_slow_query_is_logged_with_endpoint(self):
+        with patch('querylog.SLOW_QUERY_MS', 0), self.assertLogs('querylog', 'WARNING') as logs:
+            self.client.post('/api/users/login', json={'username': 'nobody', 'password': 'x'})
+        self.assertIn('Slow query', logs.output[0])
+        self.assertIn('in login', logs.output[0])
+        self.assertIn("'nobody'", logs.output[0])
+
+if __name__ == '__main__':
+    unittest.main()
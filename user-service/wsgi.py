@@ -0,0 +1,8 @@
+"""WSGI entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app"""
+from app import app, db, redis_client
+from pools import dispose_before_fork
+
+# gunicorn imports this once in the master (preload_app) and then forks the workers
+with app.app_context():
+    db.create_all()
+dispose_before_fork(app, db, redis_client)